@@ -0,0 +1,151 @@
+"""
+Load test for admission control.
+
+Flood threads hammer low-priority routes (leaderboard, admin donor list,
+admin stats) while one client keeps posting emergency blood requests. Like
+a well-behaved client, a flood thread that gets 503 waits for Retry-After
+before trying again (--no-backoff retries at once instead). It
+measures the emergency path in three phases: alone, under the flood with
+admission control off, and under the flood with it on. The run fails (exit
+code 1) if, with admission control on, the emergency p99 is more than
+--max-slowdown times the unloaded p99.
+
+Requests go through the full middleware stack in this process, as they
+would in one threaded gunicorn worker:
+
+    python benchmarks/admission_load.py --flooders 32 --seconds 5
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+FLOOD_URLS = ['/api/donors/leaderboard/?limit=50', '/api/admin/donors/', '/api/admin/stats/']
+
+
+def setup_django():
+    scratch = tempfile.mkdtemp(prefix='admission-load-')
+    os.environ.setdefault('DATABASE_URL', f"sqlite:///{Path(scratch) / 'load.sqlite3'}")
+    os.environ.setdefault('ALLOWED_HOSTS', 'testserver')
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+    import django
+    django.setup()
+    from django.core.management import call_command
+    call_command('migrate', verbosity=0)
+
+
+def seed(donors):
+    from blood_donation.models import Donor, User
+
+    users = User.objects.bulk_create([
+        User(username=f'load{i}', email=f'load{i}@example.com', first_name='Load', last_name=str(i))
+        for i in range(donors)
+    ], batch_size=1000)
+    Donor.objects.bulk_create([
+        Donor(user=user, blood_type='O+', total_donations=i % 40, lives_saved=i % 7)
+        for i, user in enumerate(users)
+    ], batch_size=1000)
+    admin = User.objects.create_user('load-admin', 'admin@example.com', 'unused-password', role='admin')
+    requester = User.objects.create_user('load-requester', 'req@example.com', 'unused-password')
+    return admin, requester
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))] if ordered else 0.0
+
+
+def run_phase(admin, requester, flooders, seconds, backoff):
+    """Returns (emergency latencies, flood status counts)"""
+    from django.db import connections
+    from rest_framework.test import APIClient
+
+    stop = threading.Event()
+    statuses = {}
+    lock = threading.Lock()
+
+    def flood(index):
+        client = APIClient(raise_request_exception=False)
+        client.force_authenticate(admin)
+        url = FLOOD_URLS[index % len(FLOOD_URLS)]
+        try:
+            while not stop.is_set():
+                response = client.get(url)
+                with lock:
+                    statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+                if backoff and response.has_header('Retry-After'):
+                    stop.wait(float(response['Retry-After']))
+        finally:
+            connections.close_all()
+
+    threads = [threading.Thread(target=flood, args=(i,)) for i in range(flooders)]
+    for thread in threads:
+        thread.start()
+
+    client = APIClient(raise_request_exception=False)
+    client.force_authenticate(requester)
+    latencies = []
+    ends_at = time.perf_counter() + seconds
+    while time.perf_counter() < ends_at:
+        started = time.perf_counter()
+        response = client.post('/api/emergency-requests/', {
+            'patient_name': 'Load Test', 'blood_type': 'O-', 'hospital_name': 'Bench',
+            'hospital_location': 'Bench', 'contact_phone': '0900000000', 'urgency': 'emergency',
+        }, format='json')
+        if response.status_code != 201:
+            raise SystemExit(f'emergency request failed with HTTP {response.status_code}')
+        latencies.append(time.perf_counter() - started)
+
+    stop.set()
+    for thread in threads:
+        thread.join()
+    return latencies, statuses
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--flooders', type=int, default=32, help='Threads flooding low-priority routes')
+    parser.add_argument('--seconds', type=float, default=5, help='Length of each phase')
+    parser.add_argument('--donors', type=int, default=20000, help='Donors seeded for the flooded routes')
+    parser.add_argument('--no-backoff', action='store_true', help='Flood threads ignore Retry-After')
+    parser.add_argument('--max-slowdown', type=float, default=4.0,
+                        help='Allowed emergency p99 under flood (admission on) as a multiple of unloaded p99')
+    args = parser.parse_args()
+
+    setup_django()
+
+    import logging
+    from django.conf import settings
+
+    # Failed emergency requests are reported by the script itself
+    logging.getLogger('django.request').setLevel(logging.CRITICAL)
+    admin, requester = seed(args.donors)
+
+    phases = [('unloaded', 0, True), ('flood, admission off', args.flooders, False),
+              ('flood, admission on', args.flooders, True)]
+    results = {}
+    print(f'{"phase":<24}{"requests":>9}{"p50 ms":>9}{"p99 ms":>9}   flood responses')
+    for name, flooders, enabled in phases:
+        settings.ADMISSION_CONTROL = enabled
+        latencies, statuses = run_phase(admin, requester, flooders, args.seconds, not args.no_backoff)
+        results[name] = percentile(latencies, 0.99)
+        flood = ', '.join(f'{code}: {count}' for code, count in sorted(statuses.items())) or '-'
+        print(f'{name:<24}{len(latencies):>9}{percentile(latencies, 0.5) * 1000:>9.1f}'
+              f'{results[name] * 1000:>9.1f}   {flood}')
+
+    limit = results['unloaded'] * args.max_slowdown
+    ok = results['flood, admission on'] <= limit
+    print(f'emergency p99 with admission on: {results["flood, admission on"] * 1000:.1f} ms '
+          f'(limit {limit * 1000:.1f} ms)')
+    print('PASS' if ok else 'FAIL')
+    return 0 if ok else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
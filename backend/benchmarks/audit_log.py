@@ -0,0 +1,172 @@
+"""
+Audit log cost: what recording adds to an admin request, and what a query costs at scale.
+
+First records --events events one by one, once per AUDIT_DURABILITY and
+once as a plain inline INSERT (what a synchronous audit trail would cost).
+Reports the latency of each call and the time until everything is in the
+table. Then seeds --rows events spread over a year, and times the first and
+a deep (--depth pages in) page of query() by actor, by object and by time
+range. Fails when a query's plan does not read one of the audit indexes in
+page order, or when a page is slower than --budget-ms.
+
+    python benchmarks/audit_log.py --events 2000 --rows 1000000
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+import uuid
+from datetime import timedelta
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+
+def setup_django():
+    scratch = Path(tempfile.mkdtemp(prefix='audit-bench-'))
+    os.environ['DATABASE_URL'] = f"sqlite:///{scratch / 'bench.sqlite3'}"
+    os.environ['AUDIT_SPILL_DIR'] = str(scratch / 'spill')
+    # Flushed explicitly below, so each run measures recording alone
+    os.environ['AUDIT_FLUSH_SECONDS'] = '3600'
+    os.environ['AUDIT_BATCH_SIZE'] = '1000000'
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+    import django
+    django.setup()
+    from django.core.management import call_command
+    call_command('migrate', verbosity=0)
+
+
+def record_latency(mode, events):
+    """(per-call latencies in µs, seconds until every event is in the table)"""
+    from django.conf import settings
+    from django.utils import timezone
+    from blood_donation import audit
+    from blood_donation.models import AuditEvent
+
+    latencies = []
+    started = time.perf_counter()
+    for i in range(events):
+        call_started = time.perf_counter()
+        if mode == 'inline':
+            AuditEvent.objects.create(
+                event_id=uuid.uuid4(), occurred_at=timezone.now(), actor_id=1,
+                action='bench.inline', object_type='hospital', object_id=i, details='{"units": 1}',
+            )
+        else:
+            settings.AUDIT_DURABILITY = mode
+            audit.record(None, f'bench.{mode}', 'hospital', i, units=1)
+        latencies.append((time.perf_counter() - call_started) * 1e6)
+    if mode != 'inline':
+        audit.writer().flush()
+    return latencies, time.perf_counter() - started
+
+
+def seed(rows, actors, objects):
+    from django.utils import timezone
+    from blood_donation.models import AuditEvent
+
+    now = timezone.now()
+    year = 365 * 24 * 3600
+    actions = ['schedule.done', 'schedule.cancel', 'hospital.update', 'hospital.dispense', 'blood_request.delete']
+    for start in range(0, rows, 20000):
+        AuditEvent.objects.bulk_create([
+            AuditEvent(
+                event_id=uuid.uuid4(), occurred_at=now - timedelta(seconds=random.randrange(year)),
+                actor_id=random.randrange(actors), action=random.choice(actions), object_type='hospital',
+                object_id=random.randrange(objects), details='{"units": 1}',
+            )
+            for _ in range(min(20000, rows - start))
+        ])
+    from django.db import connection
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE')
+    return now
+
+
+def plan(filters):
+    """The database's plan for the first page of query(**filters), as one string"""
+    from django.db import connection
+    from blood_donation.models import AuditEvent
+
+    events = AuditEvent.objects.all()
+    if 'actor_id' in filters:
+        events = events.filter(actor_id=filters['actor_id'])
+    if 'object_type' in filters:
+        events = events.filter(object_type=filters['object_type'], object_id=filters['object_id'])
+    if 'since' in filters:
+        events = events.filter(occurred_at__gte=filters['since'], occurred_at__lt=filters['until'])
+    sql, params = events.order_by('-occurred_at', '-id')[:100].query.sql_with_params()
+    prefix = 'EXPLAIN QUERY PLAN ' if connection.vendor == 'sqlite' else 'EXPLAIN '
+    with connection.cursor() as cursor:
+        cursor.execute(prefix + sql, params)
+        return ' | '.join(str(row[-1]) for row in cursor.fetchall())
+
+
+def time_pages(filters, depth):
+    """(ms for the first page, ms for the last page read, pages read) of query(**filters), up to ``depth`` pages"""
+    from blood_donation import audit
+
+    started = time.perf_counter()
+    page = audit.query(**filters)
+    first = (time.perf_counter() - started) * 1000
+    cursor, last, pages = page['next_cursor'], first, 1
+    while cursor and pages < depth:
+        started = time.perf_counter()
+        page = audit.query(cursor=cursor, **filters)
+        last = (time.perf_counter() - started) * 1000
+        cursor, pages = page['next_cursor'], pages + 1
+    return first, last, pages
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--events', type=int, default=2000, help='Events recorded per durability mode')
+    parser.add_argument('--rows', type=int, default=300000, help='Events seeded for the query timings')
+    parser.add_argument('--depth', type=int, default=20, help='Pages to follow; the last one read is reported')
+    parser.add_argument('--budget-ms', type=float, default=50, help='Maximum time for one page')
+    args = parser.parse_args()
+
+    setup_django()
+    print(f'{"mode":8}{"p50 µs":>10}{"p99 µs":>10}{"all in table":>15}')
+    for mode in ('inline', 'memory', 'spill', 'fsync'):
+        latencies, total = record_latency(mode, args.events)
+        p99 = statistics.quantiles(latencies, n=100)[98]
+        print(f'{mode:8}{statistics.median(latencies):10.1f}{p99:10.1f}{total:14.2f}s')
+
+    actors, objects = max(args.rows // 1000, 1), max(args.rows // 100, 1)
+    started = time.perf_counter()
+    now = seed(args.rows, actors, objects)
+    print(f'\nSeeded {args.rows} events in {time.perf_counter() - started:.1f}s')
+
+    failures = []
+    queries = {
+        'actor': {'actor_id': actors // 2},
+        'object': {'object_type': 'hospital', 'object_id': objects // 2},
+        'time range': {'since': now - timedelta(days=30), 'until': now - timedelta(days=29)},
+    }
+    for name, filters in queries.items():
+        query_plan = plan(filters)
+        first, last, pages = time_pages(filters, args.depth)
+        print(f'{name:12} first page {first:6.1f} ms  page {pages:<3} {last:6.1f} ms  plan: {query_plan}')
+        if 'audit_' not in query_plan:
+            failures.append(f'{name}: the plan uses no audit index')
+        if 'TEMP B-TREE' in query_plan:
+            failures.append(f'{name}: every matching row is sorted instead of read in index order')
+        if max(first, last) > args.budget_ms:
+            failures.append(f'{name}: a page took {max(first, last):.1f} ms, over the budget of {args.budget_ms:.0f} ms')
+
+    if failures:
+        print(f'\n{len(failures)} failure(s):')
+        for failure in failures:
+            print(f'  {failure}')
+        return 1
+    print('\nEvery query uses an audit index and stays within budget')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,110 @@
+"""
+Cold-start budget check.
+
+Boots the app in fresh interpreters, the way a spun-down instance wakes up,
+and times each from launch to the first response of an authenticated
+GET /api/hospitals/ on a seeded throwaway database (with DEBUG off, as in
+production). Fails when the median cold start exceeds the budget, when the
+request does not succeed, or, without --warm-up, when a module that should
+load lazily (see startup.LAZY_MODULES) was imported. On failure the slowest
+imports of the slowest run are listed.
+
+One untimed boot runs first, so bytecode compilation and a cold disk cache
+do not count; build.sh precompiles in production. The default budget suits a
+developer laptop; pass --budget-ms for slower machines.
+
+    python benchmarks/cold_start.py --runs 5 --budget-ms 800
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+from blood_donation import startup  # noqa: E402  (standard library only at import)
+
+PATH = '/api/hospitals/'
+
+
+def prepare(token_path):
+    """Migrate and seed the database in DATABASE_URL, then write a donor's JWT to ``token_path``"""
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+    import django
+    django.setup()
+    from django.core.management import call_command
+    from rest_framework_simplejwt.tokens import RefreshToken
+    from blood_donation.models import Donor, Hospital, User
+
+    call_command('migrate', verbosity=0)
+    user = User.objects.create_user('cold-start', 'cold-start@example.com', 'unused-password')
+    Donor.objects.create(user=user, blood_type='O+')
+    Hospital.objects.bulk_create([Hospital(name=f'Hospital {i}', location='Addis Ababa') for i in range(20)])
+    Path(token_path).write_text(json.dumps(str(RefreshToken.for_user(user).access_token)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5, help='Timed cold starts')
+    parser.add_argument('--budget-ms', type=float, default=800, help='Maximum median cold start in ms')
+    parser.add_argument('--warm-up', action='store_true', help='Run the warm-up hook before the first request')
+    parser.add_argument('--prepare', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.prepare:
+        prepare(args.prepare)
+        return 0
+
+    scratch = Path(tempfile.mkdtemp(prefix='cold-start-'))
+    env = dict(
+        os.environ, DATABASE_URL=f"sqlite:///{scratch / 'bench.sqlite3'}", DEBUG='False',
+        ALLOWED_HOSTS='localhost', DJANGO_SETTINGS_MODULE='config.settings',
+    )
+    env.pop('PROMETHEUS_MULTIPROC_DIR', None)
+    # Django settings can only be configured once per process, so prepare in a child
+    subprocess.run([sys.executable, __file__, '--prepare', str(scratch / 'token.json')], env=env, check=True)
+    token = json.loads((scratch / 'token.json').read_text())
+
+    startup.profile(PATH, token=token, warm_up=args.warm_up, env=env)
+    reports = []
+    for run in range(args.runs):
+        report = startup.profile(PATH, token=token, warm_up=args.warm_up, env=env)
+        reports.append(report)
+        phases = '  '.join(f'{phase} {elapsed:.0f}' for phase, elapsed in report['phases'].items())
+        print(f"run {run + 1}: {report['cold_start_ms']:6.0f} ms  (HTTP {report['status']}; {phases})")
+
+    median = statistics.median(report['cold_start_ms'] for report in reports)
+    failures = []
+    if median > args.budget_ms:
+        failures.append(f'median cold start of {median:.0f} ms exceeds the budget of {args.budget_ms:.0f} ms')
+    for report in reports:
+        if report['status'] != 200:
+            failures.append(f"GET {PATH} returned HTTP {report['status']}")
+            break
+    loaded = sorted({name for report in reports for name in report['loaded']})
+    if loaded and not args.warm_up:
+        failures.append(f"imported at start-up although they should load lazily: {', '.join(loaded)}")
+
+    if failures:
+        slowest = max(reports, key=lambda report: report['cold_start_ms'])
+        print(f'\n{len(failures)} cold start failure(s):')
+        for failure in failures:
+            print(f'  {failure}')
+        print('\nSlowest packages of the slowest run (ms):')
+        for package, elapsed in startup.by_package(slowest['imports'])[:10]:
+            print(f'  {package:<24}{elapsed:>8.1f}')
+        print('Slowest modules (ms, own / including their imports):')
+        for name, own, cumulative in sorted(slowest['imports'], key=lambda item: -item[1])[:10]:
+            print(f'  {name:<48}{own:>8.1f}{cumulative:>8.1f}')
+        return 1
+    print(f'Median cold start {median:.0f} ms, within the budget of {args.budget_ms:.0f} ms')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,105 @@
+"""
+Registration throughput: one-by-one sign-up versus bulk drive onboarding.
+
+Registers donors through POST /api/auth/register/ one at a time, then
+onboards the same number in batches the way POST /api/admin/donors/onboard/
+does (validate, create, issue JWTs) and hashing in-process, then the way
+onboard_donors does with a process pool. Reports registrations per second
+for each. Password hashing dominates, so the pool speed-up tracks the
+number of CPU cores.
+
+    python benchmarks/registration_throughput.py --donors 100 --batch-size 25
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+
+def setup_django():
+    os.environ['DATABASE_URL'] = f"sqlite:///{Path(tempfile.mkdtemp(prefix='registration-bench-')) / 'bench.sqlite3'}"
+    os.environ.setdefault('ALLOWED_HOSTS', 'testserver')
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+    # The per-IP registration throttle would stop the single-registration run almost at once
+    os.environ['REGISTER_THROTTLE_RATE'] = '1000000/min'
+    import django
+    django.setup()
+
+
+def entry(prefix, index):
+    return {
+        'username': f'{prefix}-{index}', 'email': f'{prefix}-{index}@example.com',
+        'first_name': 'Drive', 'last_name': f'Donor {index}', 'password': f'Drive-pass-{index}-x9',
+        'blood_type': 'O+',
+    }
+
+
+def register_one_by_one(count):
+    from rest_framework.test import APIClient
+
+    client = APIClient(raise_request_exception=False)
+    began = time.perf_counter()
+    failed = 0
+    for index in range(count):
+        data = dict(entry('single', index), role='donor')
+        data['password2'] = data['password']
+        if client.post('/api/auth/register/', data, format='json').status_code != 201:
+            failed += 1
+    return time.perf_counter() - began, failed
+
+
+def onboard(prefix, count, batch_size, workers):
+    """What OnboardDonorsView does per batch; with ``workers`` > 1, hashing in a pool like onboard_donors"""
+    from contextlib import nullcontext
+    from blood_donation import onboarding
+    from blood_donation.serializers import DonorOnboardingSerializer
+
+    began = time.perf_counter()
+    failed = 0
+    with nullcontext() if workers == 1 else onboarding.hashing_pool(workers) as pool:
+        for start in range(0, count, batch_size):
+            serializer = DonorOnboardingSerializer(
+                data=[entry(prefix, index) for index in range(start, min(count, start + batch_size))], many=True,
+            )
+            if not serializer.is_valid():
+                failed += len(serializer.initial_data)
+                continue
+            donors = onboarding.create_donors(serializer.validated_data, pool)
+            onboarding.issue_tokens([donor.user for donor in donors])
+    return time.perf_counter() - began, failed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--donors', type=int, default=100, help='Donors registered by each method')
+    parser.add_argument('--batch-size', type=int, default=25,
+                        help='Donors per onboarding batch (the endpoint takes at most 25, onboard_donors 500)')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='Hashing processes for the pooled run')
+    args = parser.parse_args()
+
+    setup_django()
+    import logging
+    from django.core.management import call_command
+
+    logging.getLogger('django.request').setLevel(logging.CRITICAL)
+    call_command('migrate', verbosity=0)
+
+    print(f'{args.donors} donors per method, onboarding batches of {args.batch_size}, {os.cpu_count()} CPUs')
+    runs = [
+        ('register endpoint', lambda: register_one_by_one(args.donors)),
+        ('onboard, 1 process', lambda: onboard('serial', args.donors, args.batch_size, 1)),
+        (f'onboard, {args.workers} workers', lambda: onboard('pooled', args.donors, args.batch_size, args.workers)),
+    ]
+    for label, run in runs:
+        elapsed, failed = run()
+        print(f'{label:>20}: {(args.donors - failed) / elapsed:8.1f} registrations/s, {failed} failed, {elapsed:.2f}s')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
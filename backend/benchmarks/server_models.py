@@ -0,0 +1,280 @@
+"""
+Compare gunicorn worker models on the API's endpoint mix.
+
+For each worker class, starts gunicorn with config/gunicorn_conf.py on a
+seeded throwaway SQLite database. Client threads then replay a weighted mix
+of donor, board and admin requests over keep-alive connections for a fixed
+time. The admin stats calls are the slow requests that hold up everything
+behind them when a worker can only serve one request at a time. The script
+reports throughput, overall and emergency-board latency, failures, shed
+requests (503) and the memory of all gunicorn processes (PSS, so pages the
+workers share copy-on-write are not counted twice).
+
+Workers are recycled during the run (--max-requests) so that restarts show
+up in the results. A kept-alive connection that the server closes is retried
+once on a new connection, as HTTP clients do; those retries are counted
+separately from failures.
+
+    python benchmarks/server_models.py --classes sync,gthread --workers 2 --clients 16 --seconds 10
+"""
+import argparse
+import http.client
+import json
+import os
+import random
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+# (weight, role, method, path, body)
+MIX = [
+    (25, 'donor', 'GET', '/api/emergency-requests/', None),
+    (20, 'donor', 'GET', '/api/hospitals/', None),
+    (20, 'donor', 'GET', '/api/donor/dashboard/', None),
+    (15, 'donor', 'GET', '/api/donors/leaderboard/?limit=20', None),
+    (8, 'admin', 'GET', '/api/admin/donors/', None),
+    (7, 'admin', 'GET', '/api/admin/stats/', None),
+    (5, 'donor', 'POST', '/api/emergency-requests/', {
+        'patient_name': 'Bench', 'blood_type': 'O-', 'hospital_name': 'Bench', 'hospital_location': 'Bench',
+        'contact_phone': '0900000000', 'urgency': 'urgent',
+    }),
+]
+BOARD = '/api/emergency-requests/'
+
+
+def prepare(db_path, donors, tokens_path):
+    """Migrate and seed the database, then write JWTs for a donor and an admin"""
+    os.environ['DATABASE_URL'] = f'sqlite:///{db_path}'
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+    import django
+    django.setup()
+    from django.core.management import call_command
+    from rest_framework_simplejwt.tokens import RefreshToken
+    from blood_donation.models import BloodRequest, Donor, Hospital, User
+
+    call_command('migrate', verbosity=0)
+    users = User.objects.bulk_create([
+        User(username=f'bench{i}', email=f'bench{i}@example.com', first_name='Bench', last_name=str(i))
+        for i in range(donors)
+    ], batch_size=1000)
+    Donor.objects.bulk_create([
+        Donor(user=user, blood_type='O+', total_donations=i % 40, lives_saved=i % 7)
+        for i, user in enumerate(users)
+    ], batch_size=1000)
+    Hospital.objects.bulk_create([Hospital(name=f'Hospital {i}', location='Addis Ababa') for i in range(30)])
+    BloodRequest.objects.bulk_create([
+        BloodRequest(requester=users[i], patient_name=f'Patient {i}', blood_type='O-', hospital_name='Bench',
+                     hospital_location='Bench', contact_phone='0900000000')
+        for i in range(min(100, donors))
+    ])
+    admin = User.objects.create_user('bench-admin', 'admin@example.com', 'unused-password', role='admin')
+    tokens = {
+        'donor': str(RefreshToken.for_user(users[0]).access_token),
+        'admin': str(RefreshToken.for_user(admin).access_token),
+    }
+    Path(tokens_path).write_text(json.dumps(tokens))
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def wait_until_up(port, server, seconds=30):
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise SystemExit('gunicorn exited during start-up')
+        try:
+            connection = http.client.HTTPConnection('127.0.0.1', port, timeout=2)
+            connection.request('GET', '/api/metrics/')
+            connection.getresponse().read()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise SystemExit('gunicorn did not start in time')
+
+
+def process_tree(root_pid):
+    """root_pid and its direct children (the gunicorn master and workers)"""
+    pids = [root_pid]
+    for stat in Path('/proc').glob('[0-9]*/stat'):
+        try:
+            fields = stat.read_text().rsplit(')', 1)[1].split()
+        except OSError:
+            continue
+        if int(fields[1]) == root_pid:
+            pids.append(int(stat.parent.name))
+    return pids
+
+
+def memory_mb(pids):
+    """Summed PSS of ``pids`` in MB, or None where /proc has no smaps_rollup"""
+    total = 0
+    for pid in pids:
+        try:
+            for line in Path(f'/proc/{pid}/smaps_rollup').read_text().splitlines():
+                if line.startswith('Pss:'):
+                    total += int(line.split()[1])
+        except (OSError, ValueError):
+            return None
+    return total / 1024
+
+
+def send(connection, method, path, body, headers):
+    connection.request(method, path, json.dumps(body) if body else None, headers)
+    response = connection.getresponse()
+    response.read()
+    return response
+
+
+def client(port, tokens, stop, results, seed):
+    rng = random.Random(seed)
+    weights = [entry[0] for entry in MIX]
+    connection = None
+    while not stop.is_set():
+        _weight, role, method, path, body = rng.choices(MIX, weights)[0]
+        headers = {'Authorization': f'Bearer {tokens[role]}', 'Content-Type': 'application/json'}
+        started = time.perf_counter()
+        retried = False
+        try:
+            if connection is None:
+                connection = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+                response = send(connection, method, path, body, headers)
+            else:
+                try:
+                    response = send(connection, method, path, body, headers)
+                except (ConnectionError, http.client.RemoteDisconnected):
+                    # A kept-alive connection the server closed meanwhile, e.g. when its
+                    # worker was recycled; HTTP clients retry these once on a new one
+                    retried = True
+                    connection.close()
+                    connection = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+                    response = send(connection, method, path, body, headers)
+            status = response.status
+            if response.will_close:
+                connection.close()
+                connection = None
+        except (OSError, http.client.HTTPException):
+            status = 'error'
+            if connection is not None:
+                connection.close()
+            connection = None
+        results.append((path, status, time.perf_counter() - started, retried))
+        if status == 503:
+            stop.wait(1)
+    if connection is not None:
+        connection.close()
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))] if ordered else 0.0
+
+
+def run(worker_class, args, db_path, tokens):
+    port = free_port()
+    env = dict(
+        os.environ, DATABASE_URL=f'sqlite:///{db_path}', PORT=str(port), DEBUG='False',
+        ALLOWED_HOSTS='127.0.0.1,localhost', GUNICORN_WORKER_CLASS=worker_class,
+        WEB_CONCURRENCY=str(args.workers), GUNICORN_MAX_REQUESTS=str(args.max_requests),
+        PROMETHEUS_MULTIPROC_DIR=tempfile.mkdtemp(prefix='server-models-metrics-'),
+    )
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', 'config/gunicorn_conf.py', 'config.wsgi:application'],
+        cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        wait_until_up(port, server)
+        stop = threading.Event()
+        results = []
+        threads = [
+            threading.Thread(target=client, args=(port, tokens, stop, results, seed))
+            for seed in range(args.clients)
+        ]
+        began = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        time.sleep(args.seconds * 0.8)
+        memory = memory_mb(process_tree(server.pid))
+        time.sleep(args.seconds * 0.2)
+        stop.set()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - began
+    finally:
+        server.send_signal(signal.SIGTERM)
+        server.wait(timeout=60)
+
+    ok = [latency for _path, status, latency, _retried in results if isinstance(status, int) and status < 500]
+    board = [latency for path, status, latency, _retried in results if path == BOARD and status == 200]
+    return {
+        'rps': len(ok) / elapsed,
+        'p50': percentile(ok, 0.5),
+        'p99': percentile(ok, 0.99),
+        'board_p99': percentile(board, 0.99),
+        'failed': sum(1 for _path, status, *_rest in results if status == 'error' or status in (500, 502, 504)),
+        'shed': sum(1 for _path, status, *_rest in results if status == 503),
+        'retried': sum(1 for *_rest, retried in results if retried),
+        'memory': memory,
+    }
+
+
+def available_classes():
+    classes = ['sync', 'gthread']
+    for name in ('gevent', 'eventlet'):
+        try:
+            __import__(name)
+            classes.append(name)
+        except ImportError:
+            pass
+    return ','.join(classes)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--classes', default=available_classes(), help='Comma-separated gunicorn worker classes')
+    parser.add_argument('--workers', type=int, default=2, help='gunicorn workers (WEB_CONCURRENCY)')
+    parser.add_argument('--clients', type=int, default=16, help='Concurrent client connections')
+    parser.add_argument('--seconds', type=float, default=10, help='Load duration per worker class')
+    parser.add_argument('--donors', type=int, default=5000, help='Donors seeded')
+    parser.add_argument('--max-requests', type=int, default=200,
+                        help='Recycle workers after about this many requests during the run (0 disables)')
+    parser.add_argument('--prepare', nargs=2, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.prepare:
+        prepare(args.prepare[0], args.donors, args.prepare[1])
+        return 0
+
+    scratch = Path(tempfile.mkdtemp(prefix='server-models-'))
+    db_path, tokens_path = scratch / 'bench.sqlite3', scratch / 'tokens.json'
+    # Django settings can only be configured once per process, so prepare in a child
+    subprocess.run(
+        [sys.executable, __file__, '--prepare', str(db_path), str(tokens_path), '--donors', str(args.donors)],
+        check=True,
+    )
+    tokens = json.loads(tokens_path.read_text())
+
+    print(f'{args.workers} workers, {args.clients} clients, {args.seconds:g}s per class, '
+          f'recycle every ~{args.max_requests or "-"} requests')
+    print(f'{"class":<10}{"req/s":>8}{"p50 ms":>9}{"p99 ms":>9}{"board p99":>11}{"failed":>8}{"retried":>9}{"shed":>6}{"PSS MB":>8}')
+    for worker_class in filter(None, args.classes.split(',')):
+        result = run(worker_class, args, db_path, tokens)
+        memory = f'{result["memory"]:.0f}' if result['memory'] is not None else '-'
+        print(f'{worker_class:<10}{result["rps"]:>8.1f}{result["p50"] * 1000:>9.1f}{result["p99"] * 1000:>9.1f}'
+              f'{result["board_p99"] * 1000:>11.1f}{result["failed"]:>8}{result["retried"]:>9}{result["shed"]:>6}{memory:>8}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
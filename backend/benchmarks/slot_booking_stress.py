@@ -0,0 +1,127 @@
+"""
+Stress test for capacity-aware booking.
+
+Many donors race through ScheduleDonationView for the same appointment slot.
+The run fails (exit code 1) if the slot ends up overbooked, if the number
+of successful bookings does not match the free seats, or if any booker gets
+a server error. Admission control is off, so every booker reaches the
+booking code instead of being shed with a 503.
+
+By default it runs against a throwaway SQLite file; point DATABASE_URL at a
+scratch Postgres database to exercise real row-level locking:
+
+    python benchmarks/slot_booking_stress.py --bookers 200 --seats 1
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+
+def setup_django():
+    scratch = tempfile.mkdtemp(prefix='slot-stress-')
+    os.environ.setdefault('DATABASE_URL', f"sqlite:///{Path(scratch) / 'stress.sqlite3'}")
+    os.environ.setdefault('ALLOWED_HOSTS', 'testserver')
+    os.environ['ADMISSION_CONTROL'] = 'False'
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+    import django
+    django.setup()
+    from django.core.management import call_command
+    call_command('migrate', verbosity=0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--bookers', type=int, default=50, help='Concurrent donors racing for the slot')
+    parser.add_argument('--seats', type=int, default=1, help='Free seats left in the slot')
+    args = parser.parse_args()
+
+    setup_django()
+
+    from datetime import datetime, time as dt_time, timedelta
+    from django.db import connections
+    from django.utils import timezone
+    from rest_framework.test import APIClient
+    from blood_donation.models import AppointmentSlot, DonationSchedule, Donor, Hospital, SlotCapacity, User
+
+    day = timezone.localdate() + timedelta(days=1)
+    hospital = Hospital.objects.create(name='Stress Test Hospital', location='Bench')
+    capacity = args.seats + 5
+    SlotCapacity.objects.create(
+        hospital=hospital, weekday=day.weekday(),
+        start_time=dt_time(9), end_time=dt_time(10), slot_minutes=60, capacity=capacity,
+    )
+    starts_at = timezone.make_aware(datetime.combine(day, dt_time(9)))
+    # Pre-fill the slot so only the requested number of seats remain
+    AppointmentSlot.objects.create(
+        hospital=hospital, starts_at=starts_at, ends_at=starts_at + timedelta(hours=1),
+        capacity=capacity, booked=capacity - args.seats,
+    )
+
+    users = []
+    for i in range(args.bookers):
+        user = User.objects.create_user(f'stress{i}', f'stress{i}@example.com', 'unused-password')
+        Donor.objects.create(user=user)
+        users.append(user)
+
+    barrier = threading.Barrier(args.bookers)
+    results = []
+    lock = threading.Lock()
+
+    def book(user):
+        # Server errors are counted as responses; the test client's exception
+        # capture is process-wide and would attribute them to the wrong thread
+        client = APIClient(raise_request_exception=False)
+        client.force_authenticate(user)
+        barrier.wait()
+        try:
+            response = client.post('/api/donations/schedule/', {
+                'scheduled_date': starts_at.isoformat(),
+                'donation_type': 'station',
+                'preferred_hospital_id': hospital.id,
+            }, format='json')
+        finally:
+            connections.close_all()
+        outcome = response.status_code
+        with lock:
+            results.append(outcome)
+
+    threads = [threading.Thread(target=book, args=(user,)) for user in users]
+    began = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - began
+
+    slot = AppointmentSlot.objects.get(hospital=hospital, starts_at=starts_at)
+    booked = DonationSchedule.objects.filter(slot=slot).count()
+    successes = results.count(201)
+    summary = {outcome: results.count(outcome) for outcome in set(results)}
+
+    print(f'{args.bookers} bookers for {args.seats} seat(s) in {elapsed:.2f}s')
+    print(f'outcomes: {summary}')
+    print(f'slot counter: {slot.booked}/{slot.capacity}, schedules in slot: {booked}')
+
+    # The counter and the schedules must agree, and every free seat goes to exactly one booker
+    server_errors = sum(1 for outcome in results if outcome >= 500)
+    ok = (
+        slot.booked <= slot.capacity
+        and slot.booked - (capacity - args.seats) == booked
+        and successes == booked == min(args.seats, args.bookers)
+        and not server_errors
+    )
+    if server_errors:
+        print(f'{server_errors} booker(s) got a server error')
+    print('PASS' if ok else 'FAIL')
+    return 0 if ok else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
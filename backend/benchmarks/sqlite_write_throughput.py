@@ -0,0 +1,133 @@
+"""
+Multi-process write benchmark for the SQLite profile.
+
+Several worker processes, like gunicorn workers sharing one SQLite file,
+each schedule donations through ScheduleDonationView and complete them
+through MarkScheduleDoneView. The same workload runs once on Django's stock
+SQLite backend and once on the tuned backend, and the script reports
+completed donations per second and failed requests for both.
+
+    python benchmarks/sqlite_write_throughput.py --workers 4 --donations 100
+"""
+import argparse
+import multiprocessing
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+
+def setup_django(db_path, tuned):
+    os.environ['DATABASE_URL'] = f'sqlite:///{db_path}'
+    os.environ['SQLITE_TUNING'] = 'True' if tuned else 'False'
+    os.environ.setdefault('ALLOWED_HOSTS', 'testserver')
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+    import django
+    django.setup()
+
+
+def prepare(db_path, workers, donations):
+    """Create the schema, one admin, one hospital and a fresh donor per donation"""
+    setup_django(db_path, tuned=False)
+    from django.core.management import call_command
+    from blood_donation.models import Donor, Hospital, User
+
+    call_command('migrate', verbosity=0)
+    User.objects.create_user('bench-admin', 'admin@example.com', 'unused-password', role='admin')
+    Hospital.objects.create(name='Bench Hospital', location='Bench')
+    users = User.objects.bulk_create([
+        User(username=f'bench-{worker}-{i}', email=f'{worker}-{i}@example.com')
+        for worker in range(workers) for i in range(donations)
+    ])
+    Donor.objects.bulk_create([Donor(user=user, blood_type='O+') for user in users])
+
+
+def worker(db_path, tuned, worker_id, donations, start_event, results):
+    setup_django(db_path, tuned)
+    from django.utils import timezone
+    from rest_framework.test import APIClient
+    from blood_donation.models import Hospital, User
+
+    admin_client = APIClient(raise_request_exception=False)
+    admin_client.force_authenticate(User.objects.get(username='bench-admin'))
+    hospital_id = Hospital.objects.get().id
+    donors = list(User.objects.filter(username__startswith=f'bench-{worker_id}-').order_by('id'))
+
+    start_event.wait()
+    completed = failed = 0
+    for user in donors[:donations]:
+        client = APIClient(raise_request_exception=False)
+        client.force_authenticate(user)
+        response = client.post('/api/donations/schedule/', {
+            'scheduled_date': timezone.now().isoformat(),
+            'donation_type': 'home',
+        }, format='json')
+        if response.status_code != 201:
+            failed += 1
+            continue
+        response = admin_client.patch(f"/api/admin/schedules/{response.data['id']}/done/", {
+            'hospital_id': hospital_id, 'blood_amount': 1,
+        }, format='json')
+        if response.status_code == 200:
+            completed += 1
+        else:
+            failed += 1
+    results.put((completed, failed))
+
+
+def run(tuned, workers, donations):
+    scratch = Path(tempfile.mkdtemp(prefix='sqlite-bench-'))
+    db_path = scratch / 'bench.sqlite3'
+    # Django settings can only be configured once per process, so prepare in a child
+    subprocess.run(
+        [sys.executable, __file__, '--prepare', str(db_path), '--workers', str(workers), '--donations', str(donations)],
+        check=True,
+    )
+
+    context = multiprocessing.get_context('spawn')
+    start_event = context.Event()
+    results = context.Queue()
+    processes = [
+        context.Process(target=worker, args=(str(db_path), tuned, worker_id, donations, start_event, results))
+        for worker_id in range(workers)
+    ]
+    for process in processes:
+        process.start()
+    time.sleep(2)  # let every worker finish django.setup()
+    began = time.perf_counter()
+    start_event.set()
+    outcomes = [results.get() for _ in processes]
+    elapsed = time.perf_counter() - began
+    for process in processes:
+        process.join()
+
+    completed = sum(done for done, _ in outcomes)
+    failed = sum(errors for _, errors in outcomes)
+    return completed, failed, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--workers', type=int, default=4, help='Concurrent worker processes')
+    parser.add_argument('--donations', type=int, default=50, help='Donations scheduled and completed per worker')
+    parser.add_argument('--prepare', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.prepare:
+        prepare(args.prepare, args.workers, args.donations)
+        return 0
+
+    print(f'{args.workers} workers x {args.donations} donations (schedule + mark done)')
+    for label, tuned in (('stock sqlite3', False), ('tuned sqlite', True)):
+        completed, failed, elapsed = run(tuned, args.workers, args.donations)
+        print(f'{label:>14}: {completed / elapsed:8.1f} donations/s, {completed} completed, {failed} failed, {elapsed:.2f}s')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
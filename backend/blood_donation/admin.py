@@ -1,10 +1,17 @@
-from django.contrib import admin
+from django.contrib import admin, messages
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
-from .models import User, Donor, Hospital, DonationSchedule, DonationRecord
+from django.db.models import Q
+from . import audit, duplicates, search
+from .changelists import ScalableAdminMixin
+from .models import (
+    User, Donor, Hospital, DonationSchedule, DonationRecord, DonationRollup, BloodRequest,
+    BloodUnitLot, InventoryTransaction, BloodStock, SlotCapacity, AppointmentSlot,
+    ArchivedDonationSchedule, ArchivedDonationRecord, ArchivedBloodRequest, DuplicateCandidate, AuditEvent,
+)
 
 
 @admin.register(User)
-class UserAdmin(BaseUserAdmin):
+class UserAdmin(ScalableAdminMixin, BaseUserAdmin):
     list_display = ['username', 'email', 'role', 'is_staff', 'date_joined']
     list_filter = ['role', 'is_staff', 'is_superuser']
     fieldsets = BaseUserAdmin.fieldsets + (
@@ -13,29 +20,219 @@ class UserAdmin(BaseUserAdmin):
 
 
 @admin.register(Donor)
-class DonorAdmin(admin.ModelAdmin):
-    list_display = ['user', 'age', 'phone', 'location', 'total_donations', 'lives_saved']
-    list_filter = ['created_at']
+class DonorAdmin(ScalableAdminMixin, admin.ModelAdmin):
+    list_display = ['user', 'age', 'phone', 'location', 'blood_type', 'total_donations', 'lives_saved']
+    list_filter = ['blood_type', 'created_at']
+    list_select_related = ['user']
     search_fields = ['user__username', 'user__email', 'phone', 'location']
+    autocomplete_fields = ['user']
+    
+    def get_queryset(self, request):
+        # __str__ reads the username, e.g. in autocomplete results. Setting
+        # select_related here means the changelist skips list_select_related.
+        return super().get_queryset(request).select_related(*self.list_select_related)
+    
+    def get_search_results(self, request, queryset, search_term):
+        # Use the full-text index instead of icontains joins
+        if not search_term:
+            return queryset, False
+        return queryset.filter(pk__in=search.matching_ids('donor', search_term)), False
 
 
 @admin.register(Hospital)
 class HospitalAdmin(admin.ModelAdmin):
     list_display = ['name', 'location', 'total_blood_received', 'total_lives_saved']
     search_fields = ['name', 'location']
+    
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term:
+            return queryset, False
+        return queryset.filter(pk__in=search.matching_ids('hospital', search_term)), False
 
 
 @admin.register(DonationSchedule)
-class DonationScheduleAdmin(admin.ModelAdmin):
-    list_display = ['donor', 'scheduled_date', 'donation_type', 'status', 'created_at']
+class DonationScheduleAdmin(ScalableAdminMixin, admin.ModelAdmin):
+    list_display = ['donor', 'preferred_hospital', 'scheduled_date', 'donation_type', 'status', 'created_at']
     list_filter = ['status', 'donation_type', 'scheduled_date']
+    list_select_related = ['donor__user', 'preferred_hospital']
     search_fields = ['donor__user__username']
+    autocomplete_fields = ['donor', 'preferred_hospital']
+    raw_id_fields = ['slot']
     date_hierarchy = 'scheduled_date'
+    
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related(*self.list_select_related)
+    
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term:
+            return queryset, False
+        return queryset.filter(donor_id__in=search.matching_ids('donor', search_term)), False
 
 
 @admin.register(DonationRecord)
-class DonationRecordAdmin(admin.ModelAdmin):
-    list_display = ['schedule', 'hospital', 'donation_date', 'blood_amount']
+class DonationRecordAdmin(ScalableAdminMixin, admin.ModelAdmin):
+    list_display = ['schedule', 'hospital', 'donation_date', 'blood_amount', 'lives_saved']
     list_filter = ['donation_date', 'hospital']
+    list_select_related = ['schedule__donor__user', 'hospital']
     search_fields = ['schedule__donor__user__username', 'hospital__name']
+    autocomplete_fields = ['schedule', 'hospital']
+    date_hierarchy = 'donation_date'
+    
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term:
+            return queryset, False
+        return queryset.filter(
+            Q(schedule__donor_id__in=search.matching_ids('donor', search_term))
+            | Q(hospital_id__in=search.matching_ids('hospital', search_term))
+        ), False
 
+
+@admin.register(BloodRequest)
+class BloodRequestAdmin(ScalableAdminMixin, admin.ModelAdmin):
+    list_display = ['patient_name', 'blood_type', 'urgency', 'hospital_name', 'requester', 'is_fulfilled', 'created_at']
+    list_filter = ['is_fulfilled', 'urgency', 'blood_type']
+    list_select_related = ['requester']
+    search_fields = ['patient_name', 'hospital_name']
+    autocomplete_fields = ['requester']
+    date_hierarchy = 'created_at'
+    
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term:
+            return queryset, False
+        return queryset.filter(pk__in=search.matching_ids('blood_request', search_term)), False
+
+
+@admin.register(DonationRollup)
+class DonationRollupAdmin(ScalableAdminMixin, admin.ModelAdmin):
+    list_display = ['granularity', 'period_start', 'hospital', 'blood_type', 'donation_type',
+                    'donation_count', 'blood_amount', 'lives_saved']
+    list_filter = ['granularity', 'blood_type', 'donation_type']
+    list_select_related = ['hospital']
+
+
+@admin.register(BloodStock)
+class BloodStockAdmin(admin.ModelAdmin):
+    list_display = ['hospital', 'blood_type', 'units', 'updated_at']
+    list_filter = ['blood_type']
+    list_select_related = ['hospital']
+    autocomplete_fields = ['hospital']
+
+
+@admin.register(BloodUnitLot)
+class BloodUnitLotAdmin(ScalableAdminMixin, admin.ModelAdmin):
+    list_display = ['hospital', 'blood_type', 'units_received', 'units_remaining', 'received_at', 'expires_at']
+    list_filter = ['blood_type']
+    list_select_related = ['hospital']
+    autocomplete_fields = ['hospital']
+    raw_id_fields = ['record']
+
+
+@admin.register(InventoryTransaction)
+class InventoryTransactionAdmin(ScalableAdminMixin, admin.ModelAdmin):
+    list_display = ['hospital', 'blood_type', 'kind', 'units', 'created_at', 'note']
+    list_filter = ['kind', 'blood_type']
+    list_select_related = ['hospital']
+    autocomplete_fields = ['hospital']
+    raw_id_fields = ['lot']
+
+
+@admin.register(SlotCapacity)
+class SlotCapacityAdmin(admin.ModelAdmin):
+    list_display = ['hospital', 'weekday', 'start_time', 'end_time', 'slot_minutes', 'capacity']
+    list_filter = ['weekday', 'hospital']
+    list_select_related = ['hospital']
+    autocomplete_fields = ['hospital']
+
+
+@admin.register(AppointmentSlot)
+class AppointmentSlotAdmin(ScalableAdminMixin, admin.ModelAdmin):
+    list_display = ['hospital', 'starts_at', 'ends_at', 'capacity', 'booked']
+    list_filter = ['hospital']
+    list_select_related = ['hospital']
+    autocomplete_fields = ['hospital']
+    date_hierarchy = 'starts_at'
+
+
+class ArchiveAdmin(ScalableAdminMixin, admin.ModelAdmin):
+    """Archived rows are kept for history only"""
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(ArchivedDonationSchedule)
+class ArchivedDonationScheduleAdmin(ArchiveAdmin):
+    list_display = ['id', 'donor', 'preferred_hospital', 'scheduled_date', 'donation_type', 'status', 'archived_at']
+    list_filter = ['status', 'donation_type']
+    list_select_related = ['donor__user', 'preferred_hospital']
+    date_hierarchy = 'scheduled_date'
+
+
+@admin.register(ArchivedDonationRecord)
+class ArchivedDonationRecordAdmin(ArchiveAdmin):
+    list_display = ['id', 'schedule', 'hospital', 'donation_date', 'blood_amount', 'lives_saved']
+    list_filter = ['hospital']
+    list_select_related = ['schedule__donor__user', 'hospital']
+    date_hierarchy = 'donation_date'
+
+
+@admin.register(ArchivedBloodRequest)
+class ArchivedBloodRequestAdmin(ArchiveAdmin):
+    list_display = ['id', 'patient_name', 'blood_type', 'urgency', 'hospital_name', 'requester', 'created_at']
+    list_filter = ['urgency', 'blood_type']
+    list_select_related = ['requester']
+    date_hierarchy = 'created_at'
+
+
+@admin.register(DuplicateCandidate)
+class DuplicateCandidateAdmin(ScalableAdminMixin, admin.ModelAdmin):
+    list_display = ['donor_a', 'donor_b', 'score', 'reasons', 'status', 'updated_at']
+    list_filter = ['status']
+    list_select_related = ['donor_a__user', 'donor_b__user']
+    raw_id_fields = ['donor_a', 'donor_b']
+    actions = ['merge_into_first', 'merge_into_second', 'dismiss']
+    
+    def _merge(self, request, queryset, keep_first):
+        merged = 0
+        for candidate in queryset.filter(status='open'):
+            if not DuplicateCandidate.objects.filter(pk=candidate.pk, status='open').exists():
+                continue  # Dropped by an earlier merge of this batch that took one of its donors
+            keep, duplicate = candidate.donor_a, candidate.donor_b
+            if not keep_first:
+                keep, duplicate = duplicate, keep
+            duplicates.merge(keep, duplicate)
+            audit.record(request.user, 'donor.merge', 'donor', keep.id, duplicate_id=duplicate.id)
+            merged += 1
+        self.message_user(request, f'Merged {merged} duplicate donor(s)', messages.SUCCESS)
+    
+    @admin.action(description='Merge: keep the first (older) donor')
+    def merge_into_first(self, request, queryset):
+        self._merge(request, queryset, keep_first=True)
+    
+    @admin.action(description='Merge: keep the second donor')
+    def merge_into_second(self, request, queryset):
+        self._merge(request, queryset, keep_first=False)
+    
+    @admin.action(description='Not a duplicate')
+    def dismiss(self, request, queryset):
+        dismissed = queryset.filter(status='open').update(status='dismissed')
+        self.message_user(request, f'Dismissed {dismissed} candidate(s)', messages.SUCCESS)
+
+
+@admin.register(AuditEvent)
+class AuditEventAdmin(ScalableAdminMixin, admin.ModelAdmin):
+    """The audit log is append-only; it is written by blood_donation/audit.py"""
+    list_display = ['occurred_at', 'actor_id', 'action', 'object_type', 'object_id', 'details']
+    date_hierarchy = 'occurred_at'
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+    
+    def has_delete_permission(self, request, obj=None):
+        return False
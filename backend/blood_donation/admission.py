@@ -0,0 +1,188 @@
+"""
+Admission control and login/registration throttling.
+
+AdmissionControlMiddleware sorts every request into a priority class before
+any other work is done for it:
+
+* ``critical``: emergency blood requests, marking donations done, dispensing
+  blood and the metrics scrape. Never shed for load.
+* ``auth``: login, registration and token refresh.
+* ``normal``: everything not classified.
+* ``low``: dashboards, the leaderboard, admin lists, stats, search, batch
+  calls, profile downloads and the Django admin site.
+
+Each worker process admits at most ADMISSION_MAX_CONCURRENCY requests at a
+time. A class may only start a request while the number in flight is below
+its share of that capacity (SHARES), so low-priority floods leave room for
+the classes above them. The capacity should equal the worker's request
+threads: gunicorn queues requests beyond them before Django runs, so the
+gate never sees more. With the default of 8, normal requests may fill 6
+threads, low ones 4, and the last threads stay free for auth and critical
+requests. A capacity below about 4 leaves normal traffic too small a share
+to be useful. Views can also cap their own concurrency with
+``admission_limit``. A request that is not admitted gets an immediate 503
+with ``Retry-After: ADMISSION_RETRY_AFTER`` and is counted in
+``http_requests_shed_total``.
+
+Class-based views set ``admission_priority`` / ``admission_limit``. Function
+views and third-party views are tagged with the ``route()`` decorator.
+The limits are per process, so they only matter for workers that run
+requests concurrently (threads); a sync worker serves one request at a time.
+
+LoginThrottle and RegisterThrottle are token buckets per client IP. Each
+bucket is one integer in the cache, the time at which it is full again,
+moved with cache.add/incr so concurrent requests cannot both take its last
+token. With REDIS_URL every worker shares the buckets; with the default
+per-process cache each worker has its own, so the rate applies per worker.
+Rates come from REST_FRAMEWORK['DEFAULT_THROTTLE_RATES'].
+"""
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from django.http import JsonResponse
+from django.urls import Resolver404, resolve
+from prometheus_client import Counter
+from rest_framework.throttling import SimpleRateThrottle
+
+PRIORITIES = ('critical', 'auth', 'normal', 'low')
+# Fraction of ADMISSION_MAX_CONCURRENCY a class may fill; critical requests are always admitted
+SHARES = {'critical': None, 'auth': 0.9, 'normal': 0.75, 'low': 0.5}
+DEFAULT_PRIORITY = 'normal'
+
+SHED = Counter(
+    'http_requests_shed_total', 'Requests rejected by admission control',
+    ['route', 'priority', 'reason'],
+)
+
+
+def route(priority=DEFAULT_PRIORITY, limit=None):
+    """Tag a function view (or a view function from ``as_view()``) with a priority class and limit"""
+    if priority not in PRIORITIES:
+        raise ValueError(f'Unknown admission priority {priority!r}')
+
+    def decorator(view_func):
+        view_func.admission_priority = priority
+        view_func.admission_limit = limit
+        return view_func
+    return decorator
+
+
+def classify(match):
+    """(priority, per-route limit) for a URL match"""
+    if match.namespace == 'admin':
+        return 'low', None
+    view_class = getattr(match.func, 'cls', None) or getattr(match.func, 'view_class', None)
+    for source in (match.func, view_class):
+        priority = getattr(source, 'admission_priority', None)
+        if priority:
+            return priority, getattr(source, 'admission_limit', None)
+    return DEFAULT_PRIORITY, None
+
+
+class Gate:
+    """In-flight counters for one process"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.per_route = defaultdict(int)
+
+    def enter(self, route_name, priority, limit, capacity):
+        """Admit a request, or return why it was rejected"""
+        with self.lock:
+            share = SHARES[priority]
+            if capacity and share is not None and self.in_flight >= capacity * share:
+                return 'capacity'
+            if limit is not None and self.per_route[route_name] >= limit:
+                return 'route_limit'
+            self.in_flight += 1
+            self.per_route[route_name] += 1
+            return None
+
+    def leave(self, route_name):
+        with self.lock:
+            self.in_flight -= 1
+            self.per_route[route_name] -= 1
+
+
+gate = Gate()
+
+
+class AdmissionControlMiddleware:
+    """Shed low-priority requests under load (see module docstring)"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not settings.ADMISSION_CONTROL:
+            return self.get_response(request)
+        try:
+            match = resolve(request.path_info)
+        except Resolver404:
+            return self.get_response(request)
+        # Lets MetricsMiddleware label shed requests by route
+        request.resolver_match = match
+
+        priority, limit = classify(match)
+        route_name = match.view_name
+        rejected = gate.enter(route_name, priority, limit, settings.ADMISSION_MAX_CONCURRENCY)
+        if rejected:
+            SHED.labels(route_name, priority, rejected).inc()
+            response = JsonResponse({'error': 'Server is busy, please retry shortly'}, status=503)
+            response['Retry-After'] = str(settings.ADMISSION_RETRY_AFTER)
+            # Shedding is expected under load; don't write an error log line per rejected request
+            response._has_been_logged = True
+            return response
+        try:
+            return self.get_response(request)
+        finally:
+            gate.leave(route_name)
+
+
+class TokenBucketThrottle(SimpleRateThrottle):
+    """
+    Token bucket per client: the rate ("10/min") is both the burst size and
+    the refill speed. Denied requests get Retry-After for the next token.
+    """
+
+    def get_cache_key(self, request, view):
+        return self.cache_format % {'scope': self.scope, 'ident': self.get_ident(request)}
+
+    def allow_request(self, request, view):
+        if self.rate is None:
+            return True
+        self.key = self.get_cache_key(request, view)
+        # The bucket is kept as the time (ms) it is full again; each request pushes that one token later
+        interval = round(self.duration * 1000 / self.num_requests)
+        window = self.duration * 1000
+        now = round(self.timer() * 1000)
+        try:
+            full_at = self.cache.incr(self.key, interval)
+        except ValueError:
+            if self.cache.add(self.key, now + interval, self.duration):
+                return True
+            full_at = self.cache.incr(self.key, interval)
+        if full_at < now + interval:
+            # Full again since the last request; two racing here can let one extra request through
+            self.cache.set(self.key, now + interval, self.duration)
+            return True
+        if full_at > now + window:
+            self.cache.decr(self.key, interval)
+            self.next_token_in = (full_at - now - window) / 1000
+            return False
+        # The entry outlives the time it is full again, so expiring it never refills the bucket early
+        self.cache.touch(self.key, self.duration)
+        return True
+
+    def wait(self):
+        return self.next_token_in
+
+
+class LoginThrottle(TokenBucketThrottle):
+    scope = 'login'
+
+
+class RegisterThrottle(TokenBucketThrottle):
+    scope = 'register'
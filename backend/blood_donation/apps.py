@@ -5,3 +5,7 @@ class BloodDonationConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'blood_donation'
 
+    def ready(self):
+        from . import search, sync
+        search.connect_signals()
+        sync.connect_signals()
@@ -0,0 +1,146 @@
+"""
+Retention for finished rows.
+
+Done and canceled schedules (with their donation records) and fulfilled
+or expired blood requests older than ARCHIVE_AFTER_DAYS are moved into the
+Archived* tables in bounded batches. Each batch copies the rows, keeping
+their ids, and deletes the originals in one transaction, without sync
+tombstones: the rows still exist, so offline devices keep them. The hot tables
+therefore only hold recent and open rows, and their indexes stay small.
+
+What still reads archived rows:
+
+* Certificates fall back to ArchivedDonationRecord by the same record id.
+* ListArchivedSchedulesView lists them for the donor's history.
+* Admin totals add the archived counts.
+* rollups.rebuild() reads both tables.
+* Donor and hospital counters are stored on the rows and are not touched.
+
+The three-month donation interval check only looks at recent records, so
+the horizon may not be shorter than MIN_ARCHIVE_DAYS.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+
+from .models import (
+    ArchivedBloodRequest, ArchivedDonationRecord, ArchivedDonationSchedule,
+    BloodRequest, DonationRecord, DonationSchedule,
+)
+from .sync import without_tombstones
+
+FINISHED_STATUSES = ('done', 'canceled')
+MIN_ARCHIVE_DAYS = 180
+
+
+def cutoff(days=None, now=None):
+    days = settings.ARCHIVE_AFTER_DAYS if days is None else days
+    if days < MIN_ARCHIVE_DAYS:
+        raise ValueError(f'Archive horizon must be at least {MIN_ARCHIVE_DAYS} days')
+    return (now or timezone.now()) - timedelta(days=days)
+
+
+def _batches(fn, batch_size, max_batches):
+    total = batches = 0
+    while not max_batches or batches < max_batches:
+        moved = fn(batch_size)
+        if not moved:
+            break
+        total += moved
+        batches += 1
+    return total
+
+
+def archive_schedules(before, batch_size=1000, max_batches=0):
+    """Move finished schedules and their records older than ``before``; returns schedules moved"""
+    def batch(size):
+        with transaction.atomic():
+            schedules = list(
+                DonationSchedule.objects
+                .filter(status__in=FINISHED_STATUSES, scheduled_date__lt=before)
+                .filter(Q(record__isnull=True) | Q(record__donation_date__lt=before))
+                .select_related('record')
+                .order_by('pk')[:size]
+            )
+            if not schedules:
+                return 0
+            ArchivedDonationSchedule.objects.bulk_create([
+                ArchivedDonationSchedule(
+                    id=schedule.id, donor_id=schedule.donor_id,
+                    preferred_hospital_id=schedule.preferred_hospital_id,
+                    scheduled_date=schedule.scheduled_date, donation_type=schedule.donation_type,
+                    status=schedule.status, created_at=schedule.created_at, updated_at=schedule.updated_at,
+                )
+                for schedule in schedules
+            ], ignore_conflicts=True)
+            records = [schedule.record for schedule in schedules if hasattr(schedule, 'record')]
+            ArchivedDonationRecord.objects.bulk_create([
+                ArchivedDonationRecord(
+                    id=record.id, schedule_id=record.schedule_id, hospital_id=record.hospital_id,
+                    donation_date=record.donation_date, blood_amount=record.blood_amount,
+                    lives_saved=record.lives_saved,
+                )
+                for record in records
+            ], ignore_conflicts=True)
+            # Cascades to the donation records
+            with without_tombstones():
+                DonationSchedule.objects.filter(pk__in=[schedule.pk for schedule in schedules]).delete()
+            return len(schedules)
+
+    return _batches(batch, batch_size, max_batches)
+
+
+def archive_blood_requests(before, batch_size=1000, max_batches=0):
+    """Move fulfilled and expired blood requests created before ``before``; returns requests moved"""
+    def batch(size):
+        with transaction.atomic():
+            requests = list(
+                BloodRequest.objects
+                .filter(Q(is_fulfilled=True) | Q(expired_at__isnull=False), created_at__lt=before)
+                .order_by('pk')[:size]
+            )
+            if not requests:
+                return 0
+            ArchivedBloodRequest.objects.bulk_create([
+                ArchivedBloodRequest(
+                    id=blood_request.id, requester_id=blood_request.requester_id,
+                    patient_name=blood_request.patient_name, blood_type=blood_request.blood_type,
+                    hospital_name=blood_request.hospital_name, hospital_location=blood_request.hospital_location,
+                    contact_phone=blood_request.contact_phone, urgency=blood_request.urgency,
+                    reason=blood_request.reason, expired_at=blood_request.expired_at,
+                    created_at=blood_request.created_at,
+                )
+                for blood_request in requests
+            ], ignore_conflicts=True)
+            with without_tombstones():
+                BloodRequest.objects.filter(pk__in=[blood_request.pk for blood_request in requests]).delete()
+            return len(requests)
+
+    return _batches(batch, batch_size, max_batches)
+
+
+def find_record(record_id):
+    """A live DonationRecord or, failing that, its archived copy (or None)"""
+    record = (
+        DonationRecord.objects.select_related('schedule__donor__user', 'hospital')
+        .filter(id=record_id).first()
+    )
+    if record is None:
+        record = (
+            ArchivedDonationRecord.objects.select_related('schedule__donor__user', 'hospital')
+            .filter(id=record_id).first()
+        )
+    return record
+
+
+def archived_totals():
+    """Counts and sums from the archive that whole-history statistics must include"""
+    totals = ArchivedDonationSchedule.objects.aggregate(
+        done=Count('id', filter=Q(status='done')),
+        canceled=Count('id', filter=Q(status='canceled')),
+    )
+    totals['blood_amount'] = ArchivedDonationRecord.objects.aggregate(total=Sum('blood_amount'))['total'] or 0
+    return totals
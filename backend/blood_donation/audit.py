@@ -0,0 +1,331 @@
+"""
+Append-only audit log of admin mutations.
+
+Admin views call record() once a change is made. Inserting the AuditEvent
+row right there would add a write to every one of those requests, so
+record() only queues the event, and only once the request's transaction
+commits, so a rolled-back change leaves no trace. A writer thread per
+process inserts the queue with one bulk INSERT every AUDIT_FLUSH_SECONDS,
+or as soon as AUDIT_BATCH_SIZE events are waiting, and once more when the
+process exits.
+
+AUDIT_DURABILITY sets what a queued event survives:
+
+* ``memory``: only a clean shutdown. A crashed process loses up to one
+  flush interval of events.
+* ``spill`` (default): the event is also appended to a spill file in
+  AUDIT_SPILL_DIR before the view returns. That survives the process being
+  killed, though not the machine losing power.
+* ``fsync``: as ``spill``, and the file is synced to disk first, at the cost
+  of one disk flush per admin action.
+
+Each writer appends to a spill segment of its own and deletes the segment
+once its batch has committed. It holds an flock on the segment until then,
+so a segment nobody holds was left behind by a crashed process or by a
+batch the database refused. Writers replay such segments when they start
+and after a failed flush, and replay_audit_spill does so on demand. Every
+event carries a random event_id that is unique in the table, so replaying a
+batch that did commit after all inserts nothing twice.
+
+query() pages through the events of an actor, of an object and/or of a time
+range, newest first, with a keyset cursor on (occurred_at, id). Each filter
+has an index ending in that order, so a page costs about the same with tens
+of millions of events as with a thousand.
+
+Events are ordered by when they happened, not by when they were inserted,
+and they reach the table up to a flush interval late, or much later when a
+spill file is replayed. An event can therefore land behind a cursor that
+was already handed out, and following that cursor will not return it. A
+reader that must see everything (an export, a SIEM feed) should re-query
+the recent past, e.g. with ``since`` a few flush intervals (or the last
+replay) back, and drop the event_ids it already has.
+"""
+import atexit
+import base64
+import binascii
+import json
+import logging
+import os
+import threading
+import uuid
+from pathlib import Path
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import DatabaseError, close_old_connections, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .metrics import AUDIT_EVENTS
+from .models import AuditEvent
+
+try:
+    import fcntl
+except ImportError:  # Windows: without flock only replay_audit_spill replays segments
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+DURABILITY_CHOICES = ('memory', 'spill', 'fsync')
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 1000
+# Memory durability keeps a failed batch queued for the next flush, up to this many events
+MAX_QUEUED = 100000
+COLUMNS = ('event_id', 'occurred_at', 'actor_id', 'action', 'object_type', 'object_id', 'details')
+
+
+class AuditError(Exception):
+    pass
+
+
+def _lock(handle, blocking=True):
+    """flock ``handle``; False if another process holds it and ``blocking`` is off"""
+    if fcntl is None:
+        return True
+    try:
+        fcntl.flock(handle.fileno(), fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+    except BlockingIOError:
+        return False
+    return True
+
+
+class Segment:
+    """Spill file of the batch being queued, locked by its writer until the batch is inserted"""
+
+    def __init__(self, directory):
+        directory.mkdir(parents=True, exist_ok=True)
+        name = f'{os.getpid()}-{uuid.uuid4().hex}'
+        self.path = directory / f'{name}.jsonl'
+        if fcntl is None:
+            self.file = open(self.path, 'a', encoding='utf-8')
+            return
+        # Locked before it gets the name replay() looks for, so replay never takes a live segment
+        partial = directory / f'{name}.partial'
+        self.file = open(partial, 'a', encoding='utf-8')
+        _lock(self.file)
+        os.replace(partial, self.path)
+
+    def append(self, events, sync):
+        self.file.write(''.join(json.dumps(event) + '\n' for event in events))
+        self.file.flush()
+        if sync:
+            os.fsync(self.file.fileno())
+
+    def release(self, inserted):
+        if inserted:
+            self.path.unlink(missing_ok=True)
+        self.file.close()
+
+
+def insert(events):
+    AuditEvent.objects.bulk_create(
+        [AuditEvent(**event) for event in events], batch_size=settings.AUDIT_BATCH_SIZE, ignore_conflicts=True,
+    )
+
+
+def replay():
+    """Insert and delete the spill segments no writer holds; returns the number of events read"""
+    replayed = 0
+    for path in sorted(Path(settings.AUDIT_SPILL_DIR).glob('*.jsonl')):
+        try:
+            handle = open(path, encoding='utf-8')
+        except FileNotFoundError:  # Its writer finished with it meanwhile
+            continue
+        with handle:
+            if not _lock(handle, blocking=False):
+                continue
+            events = []
+            for line in handle:
+                try:
+                    events.append(json.loads(line))
+                except ValueError:
+                    # Only the last line can be cut short, by a crash in the middle of a write
+                    logger.warning('Skipping a damaged line in audit spill file %s', path)
+            if events:
+                insert(events)
+            path.unlink(missing_ok=True)
+        AUDIT_EVENTS.labels('replayed').inc(len(events))
+        replayed += len(events)
+    return replayed
+
+
+class Writer:
+    """Event queue and writer thread of one process"""
+
+    def __init__(self):
+        if settings.AUDIT_DURABILITY not in DURABILITY_CHOICES:
+            raise ImproperlyConfigured(f"AUDIT_DURABILITY must be one of {', '.join(DURABILITY_CHOICES)}")
+        self.pid = os.getpid()
+        self.lock = threading.Lock()  # Guards queue and segment
+        self.flush_lock = threading.Lock()  # The thread and the exit hook flush one at a time
+        self.wake = threading.Event()
+        self.queue = []
+        self.segment = None
+        self.replay_due = fcntl is not None
+        threading.Thread(target=self.run, name='audit-writer', daemon=True).start()
+        atexit.register(self.flush)
+
+    def put(self, events):
+        durability = settings.AUDIT_DURABILITY
+        with self.lock:
+            if durability != 'memory':
+                try:
+                    if self.segment is None:
+                        self.segment = Segment(Path(settings.AUDIT_SPILL_DIR))
+                    self.segment.append(events, sync=durability == 'fsync')
+                except OSError:
+                    # The change itself has committed; keep its events in memory rather than fail the request
+                    logger.exception('Could not spill %d audit events', len(events))
+            self.queue.extend(events)
+            full = len(self.queue) >= settings.AUDIT_BATCH_SIZE
+        if full:
+            self.wake.set()
+
+    def run(self):
+        while True:
+            self.wake.wait(settings.AUDIT_FLUSH_SECONDS)
+            self.wake.clear()
+            self.flush()
+
+    def flush(self):
+        """Insert everything queued so far; returns False if the database refused it"""
+        if os.getpid() != self.pid:  # A forked child's copy; the parent owns the queue and segment
+            return True
+        with self.flush_lock:
+            close_old_connections()
+            if self.replay_due:
+                try:
+                    replay()
+                    self.replay_due = False
+                except DatabaseError:
+                    logger.warning('Could not replay audit spill files; retrying after the next flush', exc_info=True)
+            with self.lock:
+                events, self.queue = self.queue, []
+                segment, self.segment = self.segment, None
+            if not events:
+                return True
+            try:
+                insert(events)
+            except DatabaseError:
+                logger.exception('Could not write %d audit events', len(events))
+                AUDIT_EVENTS.labels('failed').inc(len(events))
+                if segment is not None:
+                    segment.release(inserted=False)
+                    self.replay_due = fcntl is not None
+                else:
+                    self.requeue(events)
+                return False
+            if segment is not None:
+                segment.release(inserted=True)
+            AUDIT_EVENTS.labels('written').inc(len(events))
+            return True
+
+    def requeue(self, events):
+        with self.lock:
+            self.queue[:0] = events
+            dropped = max(len(self.queue) - MAX_QUEUED, 0)
+            del self.queue[:dropped]
+        if dropped:
+            logger.error('Dropped the %d oldest queued audit events', dropped)
+            AUDIT_EVENTS.labels('dropped').inc(dropped)
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def writer():
+    """This process's Writer, started on first use (and again in a forked child)"""
+    global _writer
+    with _writer_lock:
+        if _writer is None or _writer.pid != os.getpid():
+            _writer = Writer()
+        return _writer
+
+
+def record(actor, action, object_type, object_id=None, **details):
+    """Queue an audit event for when the current transaction commits"""
+    record_many(actor, action, object_type, [object_id], **details)
+
+
+def record_many(actor, action, object_type, object_ids, **details):
+    """record() for several objects at once, such as every donor of an onboarded drive"""
+    occurred_at = timezone.now().isoformat()
+    details = json.dumps(details, cls=DjangoJSONEncoder) if details else ''
+    events = [
+        {
+            'event_id': uuid.uuid4().hex, 'occurred_at': occurred_at, 'actor_id': getattr(actor, 'pk', None),
+            'action': action, 'object_type': object_type, 'object_id': object_id, 'details': details,
+        }
+        for object_id in object_ids
+    ]
+    transaction.on_commit(lambda: writer().put(events))
+
+
+def _encode_cursor(event):
+    position = [event['occurred_at'].isoformat(), event['id']]
+    return base64.urlsafe_b64encode(json.dumps(position).encode()).decode()
+
+
+def _decode_cursor(cursor):
+    try:
+        occurred_at, event_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        occurred_at = parse_datetime(occurred_at)
+    except (binascii.Error, TypeError, ValueError):
+        occurred_at = event_id = None
+    if occurred_at is None or not isinstance(event_id, int):
+        raise AuditError('Invalid cursor')
+    return occurred_at, event_id
+
+
+def _time(value, name):
+    if isinstance(value, str):
+        try:
+            value = parse_datetime(value)
+        except ValueError:
+            value = None
+        if value is None:
+            raise AuditError(f'{name} must be an ISO 8601 date and time')
+    if timezone.is_naive(value):
+        value = timezone.make_aware(value)
+    return value
+
+
+def query(actor_id=None, object_type=None, object_id=None, since=None, until=None, cursor=None,
+          limit=DEFAULT_LIMIT):
+    """
+    One page of audit events, newest first: {'results': [...], 'next_cursor': ... or None}.
+
+    ``since`` is inclusive and ``until`` exclusive; both take datetimes or
+    ISO 8601 strings. ``object_id`` needs ``object_type``, which leads its
+    index. A cursor does not return events inserted after it was issued
+    with an earlier occurred_at (see the module docstring).
+    """
+    if not 1 <= limit <= MAX_LIMIT:
+        raise AuditError(f'limit must be between 1 and {MAX_LIMIT}')
+    if object_id is not None and not object_type:
+        raise AuditError('object_id needs object_type')
+
+    events = AuditEvent.objects.all()
+    if actor_id is not None:
+        events = events.filter(actor_id=actor_id)
+    if object_type:
+        events = events.filter(object_type=object_type)
+        if object_id is not None:
+            events = events.filter(object_id=object_id)
+    if since is not None:
+        events = events.filter(occurred_at__gte=_time(since, 'since'))
+    if until is not None:
+        events = events.filter(occurred_at__lt=_time(until, 'until'))
+    if cursor:
+        occurred_at, event_id = _decode_cursor(cursor)
+        # Rows after (occurred_at, id) in newest-first order, as one range on the index
+        events = events.filter(occurred_at__lte=occurred_at).exclude(occurred_at=occurred_at, id__gte=event_id)
+
+    rows = list(events.order_by('-occurred_at', '-id').values('id', *COLUMNS)[:limit + 1])
+    next_cursor = _encode_cursor(rows[limit - 1]) if len(rows) > limit else None
+    rows = rows[:limit]
+    for row in rows:
+        row['details'] = json.loads(row['details']) if row['details'] else {}
+    return {'results': rows, 'next_cursor': next_cursor}
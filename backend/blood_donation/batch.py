@@ -0,0 +1,65 @@
+"""
+In-process GET sub-requests, used by the batch and bootstrap endpoints.
+
+Each sub-request is dispatched straight to the resolved DRF view. It skips
+the middleware stack and JWT decoding: the caller's already authenticated
+user and token are handed over through DRF's forced authentication. All
+sub-requests share one request cache (see ``request_cache``), so lookups
+like the requesting donor happen once per HTTP call.
+"""
+from urllib.parse import urlsplit
+
+from django.http import HttpRequest, QueryDict
+from django.urls import Resolver404, resolve
+from rest_framework.views import APIView
+
+MAX_SUB_REQUESTS = 10
+API_PREFIX = '/api/'
+
+
+def request_cache(request):
+    """Per-request dict, shared with any sub-requests of the same HTTP call"""
+    http_request = getattr(request, '_request', request)
+    if not hasattr(http_request, 'request_cache'):
+        http_request.request_cache = {}
+    return http_request.request_cache
+
+
+def _resolve_api_view(path):
+    if not path.startswith(API_PREFIX):
+        return None
+    try:
+        match = resolve(path)
+    except Resolver404:
+        return None
+    view_class = getattr(match.func, 'cls', None) or getattr(match.func, 'view_class', None)
+    if not (view_class and issubclass(view_class, APIView)):
+        return None
+    # Views that fan out themselves (the batch endpoints) opt out
+    if not getattr(view_class, 'batchable', True):
+        return None
+    return match
+
+
+def get(request, url):
+    """Run ``url`` as a GET for the user of ``request``; returns (status_code, data)"""
+    parts = urlsplit(url)
+    match = _resolve_api_view(parts.path)
+    if match is None:
+        return 404, {'error': f'{parts.path} is not a batchable API route'}
+
+    parent = getattr(request, '_request', request)
+    sub = HttpRequest()
+    sub.method = 'GET'
+    sub.path = sub.path_info = parts.path
+    sub.META = {**parent.META, 'REQUEST_METHOD': 'GET', 'PATH_INFO': parts.path, 'QUERY_STRING': parts.query}
+    sub.GET = QueryDict(parts.query)
+    sub.COOKIES = parent.COOKIES
+    sub.resolver_match = match
+    sub.user = request.user
+    sub._force_auth_user = request.user
+    sub._force_auth_token = request.auth
+    sub.request_cache = request_cache(request)
+
+    response = match.func(sub, *match.args, **match.kwargs)
+    return response.status_code, getattr(response, 'data', None)
@@ -0,0 +1,141 @@
+"""
+Admin changelists that stay fast on large tables.
+
+ScalableAdminMixin changes three things for a ModelAdmin:
+
+* Counts: an unfiltered list uses the database's row estimate (pg_class on
+  Postgres, sqlite_stat1 on SQLite after ANALYZE). A filtered list counts at
+  most ADMIN_COUNT_LIMIT rows. Add ``?exact_count=1`` to the URL to get an
+  exact COUNT(*). The second "n total" count is turned off.
+* date_hierarchy: the year and month choices come from MIN/MAX of the date
+  column, which an index answers directly, instead of a DISTINCT over every
+  row. A year or month with no rows can therefore still be listed. The day
+  level is already limited to one month and keeps the exact query.
+* The subtitle tells the admin when the counts are estimates.
+"""
+from datetime import date
+
+from django.contrib.admin.views.main import ChangeList
+from django.core.paginator import Paginator
+from django.db import DatabaseError, connections
+from django.db.models import Max, Min, QuerySet
+from django.utils import timezone
+from django.utils.functional import cached_property
+
+ADMIN_COUNT_LIMIT = 10000
+EXACT_COUNT_VAR = 'exact_count'
+
+
+def estimated_row_count(model, using):
+    """Planner estimate of the table's row count, or None if the database has none"""
+    connection = connections[using]
+    table = model._meta.db_table
+    try:
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                cursor.execute("SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass", [table])
+            elif connection.vendor == 'sqlite':
+                # Only populated once ANALYZE (or PRAGMA optimize) has run
+                cursor.execute("SELECT stat FROM sqlite_stat1 WHERE tbl = %s LIMIT 1", [table])
+            else:
+                return None
+            row = cursor.fetchone()
+    except DatabaseError:
+        return None
+    if not row or row[0] is None:
+        return None
+    estimate = int(str(row[0]).split()[0])
+    # Postgres reports -1 for tables that were never analyzed
+    return estimate if estimate >= 0 else None
+
+
+class EstimatedCountPaginator(Paginator):
+    """Paginator that avoids an exact COUNT(*) unless ``exact`` is set"""
+
+    def __init__(self, *args, exact=False, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.exact = exact
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if self.exact or not isinstance(queryset, QuerySet):
+            return super().count
+        if not queryset.query.where:
+            estimate = estimated_row_count(queryset.model, queryset.db)
+            if estimate is not None and estimate > ADMIN_COUNT_LIMIT:
+                return estimate
+        return queryset.order_by()[:ADMIN_COUNT_LIMIT].count()
+
+
+class RangeDatesQuerySet(QuerySet):
+    """Answer year/month date lists from MIN/MAX instead of a DISTINCT over the table"""
+
+    def _range(self, field_name, kind):
+        bounds = self.aggregate(first=Min(field_name), last=Max(field_name))
+        first, last = bounds['first'], bounds['last']
+        if first is None or last is None:
+            return []
+        if timezone.is_aware(first):
+            first, last = timezone.localtime(first), timezone.localtime(last)
+        if kind == 'year':
+            return [date(year, 1, 1) for year in range(first.year, last.year + 1)]
+        months = []
+        year, month = first.year, first.month
+        while (year, month) <= (last.year, last.month):
+            months.append(date(year, month, 1))
+            year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+        return months
+
+    def dates(self, field_name, kind, order='ASC'):
+        if kind in ('year', 'month'):
+            values = self._range(field_name, kind)
+            return values[::-1] if order == 'DESC' else values
+        return super().dates(field_name, kind, order)
+
+    def datetimes(self, field_name, kind, *args, **kwargs):
+        if kind in ('year', 'month'):
+            order = kwargs.get('order', args[0] if args else 'ASC')
+            values = self._range(field_name, kind)
+            return values[::-1] if order == 'DESC' else values
+        return super().datetimes(field_name, kind, *args, **kwargs)
+
+
+class ScalableChangeList(ChangeList):
+    def get_filters_params(self, params=None):
+        # Keep exact_count in pagination links without treating it as a field lookup
+        params = super().get_filters_params(params)
+        params.pop(EXACT_COUNT_VAR, None)
+        return params
+
+    def get_queryset(self, request):
+        queryset = super().get_queryset(request)
+        if self.date_hierarchy:
+            queryset = queryset._chain()
+            queryset.__class__ = RangeDatesQuerySet
+        return queryset
+
+
+class ScalableAdminMixin:
+    """ModelAdmin mixin for tables too large for exact counts and full date scans"""
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def get_changelist(self, request, **kwargs):
+        return ScalableChangeList
+
+    def get_paginator(self, request, queryset, per_page, orphans=0, allow_empty_first_page=True):
+        return self.paginator(
+            queryset, per_page, orphans, allow_empty_first_page,
+            exact=request.GET.get(EXACT_COUNT_VAR) == '1',
+        )
+
+    def changelist_view(self, request, extra_context=None):
+        extra_context = extra_context or {}
+        if request.GET.get(EXACT_COUNT_VAR) != '1':
+            extra_context.setdefault(
+                'subtitle',
+                f'Counts are estimated (capped at {ADMIN_COUNT_LIMIT:,} when filtered). '
+                f'Add ?{EXACT_COUNT_VAR}=1 to the URL for exact totals.',
+            )
+        return super().changelist_view(request, extra_context)
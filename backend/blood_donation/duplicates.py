@@ -0,0 +1,244 @@
+"""
+Duplicate donor detection and merging.
+
+People sometimes register again under a new username. Their donation
+history is then split, and the 90-day interval check misses recent
+donations. find_candidates() compares only donors that share a blocking
+key, never all pairs:
+
+* the phone number (last 9 digits, so +251 and 0 prefixes match),
+* the email local part (lower-cased, ``+tag`` and dots removed),
+* the name with the estimated birth year (date joined minus age),
+* the name with the blood type.
+
+Blocks larger than ``max_block`` (e.g. a shared office phone) carry little
+information and are skipped. Candidate pairs are scored on these signals
+in a process pool. Workers only see plain tuples, and all database access
+happens in the parent process. Pairs at or above the threshold are stored
+as DuplicateCandidate rows for an admin to merge or dismiss.
+
+merge() moves one donor's schedules (archived ones included, so records
+follow) and blood requests to the other, fills in blank profile fields,
+adds the duplicate's totals to the kept donor's and deactivates the
+duplicate's login, all in one transaction. The totals are added rather than
+recomputed from records, which do not hold the lives saved before
+per-record counting. A donor may only have one pending schedule, so if
+both had one, only the earliest visit is kept and the others are canceled.
+Other open candidates naming the duplicate are dropped; the next
+find_duplicate_donors run pairs the kept donor up again where it matches.
+"""
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from difflib import SequenceMatcher
+from itertools import combinations
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from . import slots
+from .models import (
+    ArchivedBloodRequest, ArchivedDonationSchedule, BloodRequest, DonationSchedule, Donor,
+    DuplicateCandidate, User,
+)
+
+DEFAULT_THRESHOLD = 0.6
+DEFAULT_MAX_BLOCK = 50
+# Scoring in-process is faster than paying for worker start-up on small runs
+PARALLEL_MIN_PAIRS = 20000
+CHUNK_PAIRS = 5000
+
+# Positions in a donor tuple
+ID, PHONE, EMAIL, NAME, BIRTH_YEAR, BLOOD_TYPE, LOCATION = range(7)
+
+# Profile fields copied from the duplicate when the kept donor has them blank
+FILL_FIELDS = ('phone', 'age', 'weight', 'location', 'latitude', 'longitude', 'blood_type', 'health_info')
+
+
+def normalize_phone(phone):
+    digits = re.sub(r'\D', '', phone or '')
+    return digits[-9:] if len(digits) >= 7 else None
+
+
+def normalize_email(email):
+    local = (email or '').lower().partition('@')[0].partition('+')[0].replace('.', '')
+    return local if len(local) >= 3 else None
+
+
+def normalize_name(first_name, last_name):
+    tokens = re.findall(r'[a-z]+', f'{first_name} {last_name}'.lower())
+    return ' '.join(sorted(tokens)) or None
+
+
+def donor_tuple(row):
+    """Plain tuple for a row of (id, phone, email, first, last, date_joined, age, blood_type, location)"""
+    donor_id, phone, email, first_name, last_name, date_joined, age, blood_type, location = row
+    birth_year = date_joined.year - age if age else None
+    blood_type = blood_type if blood_type and blood_type != 'None' else None
+    return (
+        donor_id, normalize_phone(phone), normalize_email(email), normalize_name(first_name, last_name),
+        birth_year, blood_type, (location or '').strip().lower() or None,
+    )
+
+
+def blocking_keys(donor):
+    keys = []
+    if donor[PHONE]:
+        keys.append(('phone', donor[PHONE]))
+    if donor[EMAIL]:
+        keys.append(('email', donor[EMAIL]))
+    if donor[NAME] and donor[BIRTH_YEAR]:
+        keys.append(('name_year', donor[NAME], donor[BIRTH_YEAR]))
+    if donor[NAME] and donor[BLOOD_TYPE]:
+        keys.append(('name_blood', donor[NAME], donor[BLOOD_TYPE]))
+    return keys
+
+
+def candidate_pairs(donors, max_block=DEFAULT_MAX_BLOCK):
+    """Index pairs (i, j), i < j, of donors sharing at least one blocking key"""
+    blocks = {}
+    for index, donor in enumerate(donors):
+        for key in blocking_keys(donor):
+            blocks.setdefault(key, []).append(index)
+    pairs = set()
+    for members in blocks.values():
+        if 1 < len(members) <= max_block:
+            pairs.update(combinations(members, 2))
+    return pairs
+
+
+def score(a, b):
+    """(score in [0, 1], reasons) for two donor tuples"""
+    total = 0.0
+    reasons = []
+    if a[PHONE] and a[PHONE] == b[PHONE]:
+        total += 0.4
+        reasons.append('phone')
+    if a[EMAIL] and a[EMAIL] == b[EMAIL]:
+        total += 0.25
+        reasons.append('email')
+    if a[NAME] and b[NAME]:
+        similarity = 1.0 if a[NAME] == b[NAME] else SequenceMatcher(None, a[NAME], b[NAME]).ratio()
+        if similarity >= 0.85:
+            total += 0.25 * similarity
+            reasons.append('name')
+    if a[BIRTH_YEAR] and b[BIRTH_YEAR]:
+        if abs(a[BIRTH_YEAR] - b[BIRTH_YEAR]) <= 1:
+            total += 0.1
+            reasons.append('birth_year')
+        else:
+            total -= 0.2
+    if a[BLOOD_TYPE] and b[BLOOD_TYPE]:
+        # A blood type does not change, so a mismatch nearly rules the pair out
+        if a[BLOOD_TYPE] == b[BLOOD_TYPE]:
+            total += 0.05
+            reasons.append('blood_type')
+        else:
+            total -= 0.5
+    if a[LOCATION] and a[LOCATION] == b[LOCATION]:
+        total += 0.05
+        reasons.append('location')
+    return max(0.0, min(1.0, total)), reasons
+
+
+def score_pairs(job):
+    """Worker entry point: ``job`` is (threshold, [(donor_a, donor_b), ...]); returns matches"""
+    threshold, pairs = job
+    matches = []
+    for a, b in pairs:
+        value, reasons = score(a, b)
+        if value >= threshold:
+            matches.append((a[ID], b[ID], round(value, 3), ','.join(reasons)))
+    return matches
+
+
+def find_candidates(threshold=DEFAULT_THRESHOLD, max_block=DEFAULT_MAX_BLOCK, workers=None):
+    """
+    Score every blocked pair of active donors and store those at or above ``threshold``.
+
+    Open candidates are re-scored. Merged and dismissed pairs keep their status.
+    Returns (pairs compared, open candidates).
+    """
+    rows = (
+        Donor.objects.filter(user__is_active=True)
+        .order_by('id')
+        .values_list('id', 'phone', 'user__email', 'user__first_name', 'user__last_name',
+                     'user__date_joined', 'age', 'blood_type', 'location')
+    )
+    donors = [donor_tuple(row) for row in rows.iterator(chunk_size=5000)]
+    pairs = [(donors[i], donors[j]) for i, j in candidate_pairs(donors, max_block)]
+    jobs = [(threshold, pairs[start:start + CHUNK_PAIRS]) for start in range(0, len(pairs), CHUNK_PAIRS)]
+    if len(jobs) > 1 and len(pairs) >= PARALLEL_MIN_PAIRS:
+        with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+            results = list(pool.map(score_pairs, jobs))
+    else:
+        results = [score_pairs(job) for job in jobs]
+    matches = {(a, b): (value, reasons) for chunk in results for a, b, value, reasons in chunk}
+
+    existing = {
+        (candidate.donor_a_id, candidate.donor_b_id): candidate
+        for candidate in DuplicateCandidate.objects.filter(status='open')
+    }
+    updated = []
+    for pair, candidate in existing.items():
+        if pair in matches:
+            candidate.score, candidate.reasons = matches.pop(pair)
+            updated.append(candidate)
+    with transaction.atomic():
+        # Open pairs that no longer match (profiles were edited) are dropped
+        kept = {candidate.id for candidate in updated}
+        stale = [candidate.id for candidate in existing.values() if candidate.id not in kept]
+        DuplicateCandidate.objects.filter(id__in=stale).delete()
+        DuplicateCandidate.objects.bulk_update(updated, ['score', 'reasons'], batch_size=1000)
+        # Pairs already merged or dismissed are kept as they are
+        DuplicateCandidate.objects.bulk_create([
+            DuplicateCandidate(donor_a_id=a, donor_b_id=b, score=value, reasons=reasons)
+            for (a, b), (value, reasons) in matches.items()
+        ], batch_size=1000, ignore_conflicts=True)
+    return len(pairs), DuplicateCandidate.objects.filter(status='open').count()
+
+
+@transaction.atomic
+def merge(keep, duplicate):
+    """Fold ``duplicate`` (a Donor) into ``keep``; returns the number of schedules moved"""
+    if keep.pk == duplicate.pk:
+        raise ValueError('Cannot merge a donor into itself')
+    keep = Donor.objects.select_for_update().get(pk=keep.pk)
+    duplicate = Donor.objects.select_for_update().select_related('user').get(pk=duplicate.pk)
+
+    now = timezone.now()
+    # update() skips auto_now, so updated_at is set here for offline devices to pick up the move
+    moved = DonationSchedule.objects.filter(donor=duplicate).update(donor=keep, updated_at=now)
+    moved += ArchivedDonationSchedule.objects.filter(donor=duplicate).update(donor=keep)
+    pending = list(
+        DonationSchedule.objects.filter(donor=keep, status='pending').order_by('scheduled_date', 'id')
+        .values_list('id', 'slot_id')
+    )
+    for _schedule_id, slot_id in pending[1:]:
+        slots.release(slot_id)
+    DonationSchedule.objects.filter(id__in=[schedule_id for schedule_id, _slot_id in pending[1:]]).update(
+        status='canceled', updated_at=now,
+    )
+    BloodRequest.objects.filter(requester_id=duplicate.user_id).update(requester_id=keep.user_id, updated_at=now)
+    ArchivedBloodRequest.objects.filter(requester_id=duplicate.user_id).update(requester_id=keep.user_id)
+
+    filled = [
+        field for field in FILL_FIELDS
+        if getattr(keep, field) in (None, '') and getattr(duplicate, field) not in (None, '')
+    ]
+    for field in filled:
+        setattr(keep, field, getattr(duplicate, field))
+    # Both rows are locked, so the totals can be added in Python
+    keep.total_donations += duplicate.total_donations
+    keep.lives_saved += duplicate.lives_saved
+    keep.save(update_fields=filled + ['total_donations', 'lives_saved', 'updated_at'])
+    Donor.objects.filter(pk=duplicate.pk).update(total_donations=0, lives_saved=0, updated_at=now)
+    User.objects.filter(pk=duplicate.user_id).update(is_active=False)
+
+    a, b = sorted((keep.pk, duplicate.pk))
+    DuplicateCandidate.objects.filter(donor_a_id=a, donor_b_id=b).update(status='merged')
+    DuplicateCandidate.objects.filter(
+        Q(donor_a_id=duplicate.pk) | Q(donor_b_id=duplicate.pk), status='open',
+    ).delete()
+    return moved
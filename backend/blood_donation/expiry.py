@@ -0,0 +1,47 @@
+"""
+Expiry of blood requests that are never closed.
+
+Each urgency has a deadline (BLOOD_REQUEST_EXPIRY_HOURS) counted from
+creation. sweep_expired() stamps expired_at on open requests past their
+deadline so they drop off the board. It runs one range scan per urgency
+over blood_request_open_idx (is_fulfilled, urgency, created_at), in
+batched UPDATEs.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import BloodRequest
+
+
+def lifetime(urgency):
+    return timedelta(hours=settings.BLOOD_REQUEST_EXPIRY_HOURS[urgency])
+
+
+def expires_at(blood_request):
+    """When ``blood_request`` leaves the board if nobody fulfils it"""
+    return blood_request.created_at + lifetime(blood_request.urgency)
+
+
+def open_requests():
+    """Requests shown on the board; the filter matches blood_request_board_idx"""
+    return BloodRequest.objects.filter(is_fulfilled=False, expired_at__isnull=True)
+
+
+def sweep_expired(now=None, batch_size=1000):
+    """Mark open requests past their deadline as expired; returns the number expired"""
+    now = now or timezone.now()
+    expired = 0
+    for urgency, _label in BloodRequest.URGENCY_CHOICES:
+        stale = open_requests().filter(urgency=urgency, created_at__lt=now - lifetime(urgency))
+        while True:
+            with transaction.atomic():
+                ids = list(stale.order_by('created_at').values_list('id', flat=True)[:batch_size])
+                if not ids:
+                    break
+                # Re-check open in case a request was fulfilled since the select; updated_at
+                # is bumped by hand (update() skips auto_now) so offline devices see the change
+                expired += open_requests().filter(id__in=ids).update(expired_at=now, updated_at=timezone.now())
+    return expired
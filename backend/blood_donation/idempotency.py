@@ -0,0 +1,171 @@
+"""
+Idempotency-Key support for write endpoints.
+
+A client that may retry a write sends ``Idempotency-Key: <unique value>``.
+The first request with a key claims it by inserting a pending
+IdempotencyKey row (unique per user and key). The view then runs and its
+status code and JSON body are stored on that row. A retry with the same
+key gets the stored response back with ``Idempotent-Replayed: true``, and
+the view does not run again.
+
+* A duplicate that arrives while the first request is still running polls
+  for the stored response for up to IDEMPOTENCY_WAIT_SECONDS. After that it
+  gets 409.
+* Reusing a key for a different method, path or body gets 422.
+* 5xx responses and unhandled errors release the key, so a retry runs again.
+* Rows expire after IDEMPOTENCY_KEY_TTL_HOURS. An expired key can be reused
+  at once. purge_idempotency_keys deletes expired rows in batches.
+
+Requests without the header are not affected.
+"""
+import hashlib
+import json
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
+
+from .models import IdempotencyKey
+
+HEADER = 'HTTP_IDEMPOTENCY_KEY'
+REPLAYED_HEADER = 'Idempotent-Replayed'
+MAX_KEY_LENGTH = 255
+POLL_SECONDS = 0.1
+# A pending claim older than this belongs to a worker that died mid-request
+STALE_PENDING_SECONDS = 120
+
+
+class Replay(Exception):
+    """Raised from claim() with the response to send instead of running the view"""
+
+    def __init__(self, response):
+        super().__init__()
+        self.response = response
+
+
+def fingerprint(http_request):
+    digest = hashlib.sha256()
+    for part in (http_request.method, http_request.get_full_path()):
+        digest.update(part.encode())
+        digest.update(b'\0')
+    digest.update(http_request.body)
+    return digest.hexdigest()
+
+
+def _stored_response(row):
+    response = Response(json.loads(row.response_body) if row.response_body else None, status=row.status_code)
+    response[REPLAYED_HEADER] = 'true'
+    return response
+
+
+def claim(request):
+    """
+    Claim the Idempotency-Key of a DRF ``request`` for this execution.
+
+    Returns the pending row, or None when the request has no key. Raises
+    Replay when the view must not run (stored response, conflict or bad key).
+    """
+    key = request.META.get(HEADER)
+    if key is None or not request.user.is_authenticated:
+        return None
+    if not key or len(key) > MAX_KEY_LENGTH:
+        raise Replay(Response({'error': f'Idempotency-Key must be 1 to {MAX_KEY_LENGTH} characters'},
+                              status=status.HTTP_400_BAD_REQUEST))
+
+    request_fingerprint = fingerprint(request._request)
+    give_up_at = time.monotonic() + settings.IDEMPOTENCY_WAIT_SECONDS
+    while True:
+        now = timezone.now()
+        try:
+            with transaction.atomic():
+                return IdempotencyKey.objects.create(
+                    user=request.user, key=key, fingerprint=request_fingerprint,
+                    expires_at=now + timedelta(hours=settings.IDEMPOTENCY_KEY_TTL_HOURS),
+                )
+        except IntegrityError:
+            pass
+
+        row = IdempotencyKey.objects.filter(user=request.user, key=key).first()
+        if row is None:
+            # Released or purged since our insert failed
+            continue
+        abandoned = row.state == 'pending' and row.created_at < now - timedelta(seconds=STALE_PENDING_SECONDS)
+        if row.expires_at <= now or abandoned:
+            # Matching on created_at means only one of several concurrent takers deletes it
+            IdempotencyKey.objects.filter(pk=row.pk, created_at=row.created_at).delete()
+            continue
+        if row.fingerprint != request_fingerprint:
+            raise Replay(Response({'error': 'This Idempotency-Key was already used for a different request'},
+                                  status=status.HTTP_422_UNPROCESSABLE_ENTITY))
+        if row.state == 'done':
+            raise Replay(_stored_response(row))
+        if time.monotonic() >= give_up_at:
+            response = Response({'error': 'A request with this Idempotency-Key is still in progress'},
+                                status=status.HTTP_409_CONFLICT)
+            response['Retry-After'] = '1'
+            raise Replay(response)
+        time.sleep(POLL_SECONDS)
+
+
+def complete(row, response):
+    """Store ``response`` on a claimed row, or release the claim for 5xx responses"""
+    if response.status_code >= 500 or not hasattr(response, 'data'):
+        release(row)
+        return
+    body = '' if response.data is None else json.dumps(response.data, cls=JSONEncoder, separators=(',', ':'))
+    IdempotencyKey.objects.filter(pk=row.pk).update(
+        state='done', status_code=response.status_code, response_body=body,
+    )
+
+
+def release(row):
+    IdempotencyKey.objects.filter(pk=row.pk).delete()
+
+
+def purge_expired(now=None, batch_size=5000):
+    """Delete expired keys in batches; returns the number deleted"""
+    now = now or timezone.now()
+    purged = 0
+    while True:
+        ids = list(
+            IdempotencyKey.objects.filter(expires_at__lte=now).order_by('expires_at')
+            .values_list('id', flat=True)[:batch_size]
+        )
+        if not ids:
+            return purged
+        purged += IdempotencyKey.objects.filter(id__in=ids).delete()[0]
+
+
+class IdempotentMixin:
+    """DRF view mixin: honour Idempotency-Key on POST, PUT and PATCH"""
+    idempotency_methods = ('POST', 'PUT', 'PATCH')
+    _idempotency_claim = None
+
+    def initial(self, request, *args, **kwargs):
+        # After authentication, so keys are scoped to the user
+        super().initial(request, *args, **kwargs)
+        if request.method in self.idempotency_methods:
+            self._idempotency_claim = claim(request)
+
+    def handle_exception(self, exc):
+        if isinstance(exc, Replay):
+            return exc.response
+        try:
+            return super().handle_exception(exc)
+        except Exception:
+            if self._idempotency_claim is not None:
+                release(self._idempotency_claim)
+                self._idempotency_claim = None
+            raise
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        if self._idempotency_claim is not None:
+            complete(self._idempotency_claim, response)
+            self._idempotency_claim = None
+        return response
@@ -0,0 +1,195 @@
+"""
+Per-hospital blood inventory.
+
+Every movement is appended to InventoryTransaction. BloodUnitLot tracks what
+is left of each donation until it is used or expires, and BloodStock keeps a
+one-row-per-(hospital, blood_type) snapshot so stock reads never have to sum
+the ledger. The snapshot only drops expired blood when sweep_expired() runs,
+so reads subtract what expired since, from the few lots past their expiry
+that still have units left.
+"""
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import DecimalField, ExpressionWrapper, F, FilteredRelation, Max, Q, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import BloodStock, BloodUnitLot, Hospital, InventoryTransaction
+
+
+class InsufficientStock(Exception):
+    """Raised when a hospital does not hold enough units to dispense"""
+
+
+def _adjust_stock(hospital_id, blood_type, delta):
+    updated = BloodStock.objects.filter(hospital_id=hospital_id, blood_type=blood_type).update(
+        units=F('units') + delta, updated_at=timezone.now()
+    )
+    if updated:
+        return
+    try:
+        with transaction.atomic():
+            BloodStock.objects.create(hospital_id=hospital_id, blood_type=blood_type, units=delta)
+    except IntegrityError:
+        BloodStock.objects.filter(hospital_id=hospital_id, blood_type=blood_type).update(
+            units=F('units') + delta, updated_at=timezone.now()
+        )
+
+
+@transaction.atomic
+def receive(record):
+    """Put the blood from a completed donation on its hospital's shelf"""
+    if record.hospital_id is None:
+        return None
+
+    units = Decimal(str(record.blood_amount))
+    blood_type = record.schedule.donor.blood_type or 'None'
+    received_at = record.donation_date or timezone.now()
+    lot = BloodUnitLot.objects.create(
+        hospital_id=record.hospital_id,
+        record=record,
+        blood_type=blood_type,
+        units_received=units,
+        units_remaining=units,
+        received_at=received_at,
+        expires_at=received_at + timedelta(days=settings.BLOOD_SHELF_LIFE_DAYS),
+    )
+    InventoryTransaction.objects.create(
+        hospital_id=record.hospital_id, lot=lot, blood_type=blood_type, kind='in', units=units,
+        note=f'Donation record {record.id}',
+    )
+    _adjust_stock(record.hospital_id, blood_type, units)
+    return lot
+
+
+@transaction.atomic
+def dispense(hospital_id, blood_type, units, note=''):
+    """
+    Take units off the shelf, oldest expiry first.
+
+    Raises InsufficientStock if the hospital holds fewer unexpired units.
+    """
+    units = Decimal(str(units))
+    now = timezone.now()
+    lots = (
+        BloodUnitLot.objects
+        .select_for_update()
+        .filter(hospital_id=hospital_id, blood_type=blood_type, units_remaining__gt=0, expires_at__gt=now)
+        .order_by('expires_at')
+    )
+
+    needed = units
+    taken = []
+    for lot in lots.iterator():
+        take = min(lot.units_remaining, needed)
+        taken.append((lot, take))
+        needed -= take
+        if needed <= 0:
+            break
+    if needed > 0:
+        raise InsufficientStock(f'Only {units - needed} units of {blood_type} available')
+
+    for lot, take in taken:
+        BloodUnitLot.objects.filter(pk=lot.pk).update(units_remaining=F('units_remaining') - take)
+    InventoryTransaction.objects.bulk_create([
+        InventoryTransaction(hospital_id=hospital_id, lot=lot, blood_type=blood_type, kind='out', units=take, note=note)
+        for lot, take in taken
+    ])
+    _adjust_stock(hospital_id, blood_type, -units)
+    return units
+
+
+def sweep_expired(now=None, batch_size=5000):
+    """
+    Write off every lot that has passed its expiry date.
+
+    Lots are processed in batches of ``batch_size``, each in its own
+    transaction, with one ledger insert, one lot update and one stock
+    update per (hospital, blood_type) per batch. Returns the number of lots expired.
+    """
+    now = now or timezone.now()
+    expired = 0
+    while True:
+        with transaction.atomic():
+            batch = list(
+                BloodUnitLot.objects
+                .select_for_update()
+                .filter(units_remaining__gt=0, expires_at__lte=now)
+                .order_by('expires_at')
+                .values_list('id', 'hospital_id', 'blood_type', 'units_remaining')[:batch_size]
+            )
+            if not batch:
+                return expired
+
+            totals = defaultdict(Decimal)
+            for lot_id, hospital_id, blood_type, remaining in batch:
+                totals[(hospital_id, blood_type)] += remaining
+
+            InventoryTransaction.objects.bulk_create([
+                InventoryTransaction(
+                    hospital_id=hospital_id, lot_id=lot_id, blood_type=blood_type,
+                    kind='expired', units=remaining,
+                )
+                for lot_id, hospital_id, blood_type, remaining in batch
+            ], batch_size=1000)
+            BloodUnitLot.objects.filter(id__in=[row[0] for row in batch]).update(units_remaining=0)
+            for (hospital_id, blood_type), units in totals.items():
+                _adjust_stock(hospital_id, blood_type, -units)
+
+        expired += len(batch)
+
+
+def stock_for(hospital_id):
+    """Return {blood_type: usable units} for one hospital"""
+    # The snapshot rows and, negated, the expired lots not yet swept, in one round trip
+    unswept = (
+        BloodUnitLot.objects
+        .filter(hospital_id=hospital_id, units_remaining__gt=0, expires_at__lte=timezone.now())
+        .annotate(units=ExpressionWrapper(-F('units_remaining'), output_field=BloodStock._meta.get_field('units')))
+        .values_list('blood_type', 'units')
+    )
+    rows = BloodStock.objects.filter(hospital_id=hospital_id).values_list('blood_type', 'units').union(unswept, all=True)
+    stock = {}
+    for blood_type, units in rows:
+        stock[blood_type] = stock.get(blood_type, Decimal('0')) + units
+    return stock
+
+
+def shortages(blood_type, threshold):
+    """Hospitals holding fewer than ``threshold`` usable units of ``blood_type``, lowest stock first"""
+    zero = Value(Decimal('0'))
+    units = DecimalField(max_digits=10, decimal_places=2)
+    return (
+        Hospital.objects
+        .annotate(
+            shelf=FilteredRelation('blood_stock', condition=Q(blood_stock__blood_type=blood_type)),
+            unswept=FilteredRelation('blood_lots', condition=Q(
+                blood_lots__blood_type=blood_type, blood_lots__units_remaining__gt=0,
+                blood_lots__expires_at__lte=timezone.now(),
+            )),
+        )
+        # At most one stock row joins per hospital, so Max reads it unchanged next to the lot rows
+        .annotate(units=ExpressionWrapper(
+            Coalesce(Max('shelf__units'), zero, output_field=units)
+            - Coalesce(Sum('unswept__units_remaining'), zero, output_field=units),
+            output_field=units,
+        ))
+        .filter(units__lt=threshold)
+        .order_by('units', 'name')
+    )
+
+
+def ledger_balance(hospital_id, blood_type):
+    """Recompute stock from the ledger, for auditing the snapshot"""
+    totals = dict(
+        InventoryTransaction.objects
+        .filter(hospital_id=hospital_id, blood_type=blood_type)
+        .values_list('kind')
+        .annotate(total=Sum('units'))
+        .order_by()
+    )
+    return totals.get('in', Decimal('0')) - totals.get('out', Decimal('0')) - totals.get('expired', Decimal('0'))
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from blood_donation import archive
+
+
+class Command(BaseCommand):
+    help = 'Move finished schedules, their donation records and closed blood requests into the archive tables'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=None,
+                            help='Archive rows older than this many days (default ARCHIVE_AFTER_DAYS)')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Rows moved per transaction')
+        parser.add_argument('--max-batches', type=int, default=0,
+                            help='Stop after this many batches per table (0 = until done)')
+
+    def handle(self, *args, **options):
+        if options['batch_size'] <= 0:
+            raise CommandError('--batch-size must be positive')
+        if options['max_batches'] < 0:
+            raise CommandError('--max-batches must not be negative')
+        try:
+            before = archive.cutoff(options['days'])
+        except ValueError as exc:
+            raise CommandError(str(exc))
+
+        kwargs = {'batch_size': options['batch_size'], 'max_batches': options['max_batches']}
+        schedules = archive.archive_schedules(before, **kwargs)
+        requests = archive.archive_blood_requests(before, **kwargs)
+        self.stdout.write(self.style.SUCCESS(
+            f'Archived {schedules} schedules and {requests} blood requests older than {before:%Y-%m-%d}'
+        ))
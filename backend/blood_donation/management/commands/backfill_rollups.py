@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from blood_donation import rollups
+
+
+class Command(BaseCommand):
+    help = 'Rebuild donation rollups (day, week and month) from DonationRecord history'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', help='First day to rebuild (YYYY-MM-DD), defaults to the oldest record')
+        parser.add_argument('--end', help='Last day to rebuild (YYYY-MM-DD), defaults to the newest record')
+
+    def handle(self, *args, **options):
+        start = self._parse(options['start'], '--start')
+        end = self._parse(options['end'], '--end')
+        if start and end and start > end:
+            raise CommandError('--start must not be after --end')
+
+        written = rollups.rebuild(start, end)
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {written} daily rollup rows'))
+
+    def _parse(self, value, option):
+        if not value:
+            return None
+        day = parse_date(value)
+        if day is None:
+            raise CommandError(f'{option} must be a date in YYYY-MM-DD format')
+        return day
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from blood_donation import expiry
+
+
+class Command(BaseCommand):
+    help = 'Close open blood requests that are past their urgency deadline'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Requests expired per transaction')
+
+    def handle(self, *args, **options):
+        if options['batch_size'] <= 0:
+            raise CommandError('--batch-size must be positive')
+
+        expired = expiry.sweep_expired(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Expired {expired} blood requests'))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from blood_donation import inventory
+
+
+class Command(BaseCommand):
+    help = 'Write off blood lots past their shelf life and update hospital stock'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000, help='Lots expired per transaction')
+
+    def handle(self, *args, **options):
+        if options['batch_size'] <= 0:
+            raise CommandError('--batch-size must be positive')
+
+        expired = inventory.sweep_expired(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Expired {expired} blood lots'))
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from blood_donation import duplicates
+
+
+class Command(BaseCommand):
+    help = 'Find donor profiles that probably belong to the same person and list them for review in the admin'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threshold', type=float, default=duplicates.DEFAULT_THRESHOLD,
+                            help='Minimum score (0-1) for a pair to be stored')
+        parser.add_argument('--max-block', type=int, default=duplicates.DEFAULT_MAX_BLOCK,
+                            help='Skip blocking keys shared by more donors than this')
+        parser.add_argument('--workers', type=int, default=None, help='Worker processes, defaults to the CPU count')
+
+    def handle(self, *args, **options):
+        if not 0 < options['threshold'] <= 1:
+            raise CommandError('--threshold must be between 0 and 1')
+        if options['max_block'] < 2:
+            raise CommandError('--max-block must be at least 2')
+
+        compared, found = duplicates.find_candidates(
+            threshold=options['threshold'], max_block=options['max_block'], workers=options['workers'],
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Compared {compared} donor pairs; {found} open duplicate candidates'
+        ))
@@ -0,0 +1,21 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from blood_donation import slots
+
+
+class Command(BaseCommand):
+    help = 'Materialize bookable appointment slots from hospital slot capacities'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=30, help='How many days ahead to generate, starting today')
+
+    def handle(self, *args, **options):
+        if options['days'] <= 0:
+            raise CommandError('--days must be positive')
+
+        today = timezone.localdate()
+        count = slots.generate_slots(today, today + timedelta(days=options['days'] - 1))
+        self.stdout.write(self.style.SUCCESS(f'Ensured {count} appointment slots'))
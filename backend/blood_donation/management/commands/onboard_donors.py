@@ -0,0 +1,51 @@
+import csv
+from contextlib import nullcontext
+
+from django.core.management.base import BaseCommand, CommandError
+
+from blood_donation import onboarding
+from blood_donation.serializers import DonorOnboardingSerializer
+
+
+class Command(BaseCommand):
+    help = ('Register donors from a blood drive CSV (username, email, first_name, last_name and optional '
+            'password, phone, location, blood_type, age columns)')
+
+    def add_arguments(self, parser):
+        parser.add_argument('csv_file', help='CSV file with a header row')
+        parser.add_argument('--batch-size', type=int, default=onboarding.MAX_BATCH,
+                            help=f'Donors created per transaction (at most {onboarding.MAX_BATCH})')
+        parser.add_argument('--workers', type=int, default=None, help='Hashing processes, defaults to the CPU count (1 hashes in-process)')
+
+    def handle(self, *args, **options):
+        if not 0 < options['batch_size'] <= onboarding.MAX_BATCH:
+            raise CommandError(f'--batch-size must be between 1 and {onboarding.MAX_BATCH}')
+        try:
+            with open(options['csv_file'], newline='', encoding='utf-8-sig') as handle:
+                # Blank cells fall back to the serializer defaults
+                rows = [{key: value for key, value in row.items() if key and value} for row in csv.DictReader(handle)]
+        except OSError as exc:
+            raise CommandError(f'Cannot read {options["csv_file"]}: {exc}')
+        if not rows:
+            raise CommandError('The file has no donors')
+
+        # Validate everything first, so a bad row does not leave the drive half imported
+        serializer = DonorOnboardingSerializer(data=rows, many=True)
+        if not serializer.is_valid():
+            errors = serializer.errors
+            if isinstance(errors, dict):
+                # Batch-level problems, e.g. usernames that are already taken
+                raise CommandError(' '.join(str(message) for messages in errors.values() for message in messages))
+            problems = [
+                f'  line {line}: ' + '; '.join(f'{field}: {" ".join(map(str, messages))}' for field, messages in error.items())
+                for line, error in enumerate(errors, start=2) if error
+            ]
+            raise CommandError('Invalid rows:\n' + '\n'.join(problems[:20]))
+
+        entries = serializer.validated_data
+        created = 0
+        # One pool for the whole file, so workers start once rather than per batch
+        with nullcontext() if options['workers'] == 1 else onboarding.hashing_pool(options['workers']) as pool:
+            for start in range(0, len(entries), options['batch_size']):
+                created += len(onboarding.create_donors(entries[start:start + options['batch_size']], pool))
+        self.stdout.write(self.style.SUCCESS(f'Registered {created} donors'))
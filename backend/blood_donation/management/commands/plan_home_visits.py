@@ -0,0 +1,50 @@
+import json
+from contextlib import nullcontext
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from blood_donation import routing
+
+
+class Command(BaseCommand):
+    help = "Plan nurse team routes for a day's pending home-visit donations"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date', help='Day to plan (YYYY-MM-DD), defaults to today')
+        parser.add_argument('--teams', type=int, default=1, help='Nurse teams available per hospital region')
+        parser.add_argument('--workers', type=int, default=None, help='Worker processes, defaults to the CPU count (1 plans in-process)')
+        parser.add_argument('--time-budget', type=float, default=2.0, help='Seconds of route improvement per region')
+        parser.add_argument('--json', action='store_true', help='Print the full plan as JSON')
+
+    def handle(self, *args, **options):
+        day = parse_date(options['date']) if options['date'] else timezone.localdate()
+        if day is None:
+            raise CommandError('--date must be in YYYY-MM-DD format')
+        if options['teams'] <= 0:
+            raise CommandError('--teams must be positive')
+
+        with nullcontext() if options['workers'] == 1 else routing.planning_pool(options['workers']) as pool:
+            plan = routing.plan_routes(
+                day,
+                teams_per_region=options['teams'],
+                pool=pool,
+                time_budget=options['time_budget'],
+            )
+
+        if options['json']:
+            self.stdout.write(json.dumps(plan, indent=2))
+            return
+
+        for route in plan['routes']:
+            self.stdout.write(
+                f"{route['hospital']['name']} team {route['team']}: "
+                f"{len(route['stops'])} stops, {route['distance_km']} km"
+            )
+            for stop in route['stops']:
+                self.stdout.write(f"  {stop['position']}. {stop['donor_name']} - {stop['location']} ({stop['phone']})")
+        if plan['unrouted']:
+            self.stdout.write(self.style.WARNING(
+                f"{len(plan['unrouted'])} home visits have no coordinates and need manual dispatch"
+            ))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from blood_donation import sync
+
+
+class Command(BaseCommand):
+    help = 'Delete sync tombstones older than SYNC_TOMBSTONE_DAYS (older device cursors get a full resync)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000, help='Tombstones deleted per query')
+
+    def handle(self, *args, **options):
+        if options['batch_size'] <= 0:
+            raise CommandError('--batch-size must be positive')
+
+        purged = sync.purge_tombstones(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Purged {purged} sync tombstones'))
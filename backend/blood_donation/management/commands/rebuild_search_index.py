@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from blood_donation import search
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the full-text search index for donors, hospitals and blood requests'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=2000, help='Documents inserted per batch')
+
+    def handle(self, *args, **options):
+        total = search.rebuild(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Indexed {total} documents'))
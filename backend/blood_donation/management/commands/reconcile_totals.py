@@ -0,0 +1,37 @@
+from collections import Counter
+
+from django.core.management.base import BaseCommand, CommandError
+
+from blood_donation import reconcile
+
+
+class Command(BaseCommand):
+    help = 'Recompute donor and hospital donation totals from donation records and fix the rows that drifted'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--only', choices=sorted(reconcile.TARGETS), help='Reconcile just donors or hospitals')
+        parser.add_argument('--chunk-size', type=int, default=10000, help='Rows compared per transaction')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Rows written per UPDATE')
+        parser.add_argument('--dry-run', action='store_true', help='Report discrepancies without writing')
+        parser.add_argument('--show', type=int, default=20, help='Discrepancies listed per table (0 for none)')
+
+    def handle(self, *args, **options):
+        if options['chunk_size'] <= 0 or options['batch_size'] <= 0:
+            raise CommandError('--chunk-size and --batch-size must be positive')
+
+        targets = [options['only']] if options['only'] else list(reconcile.TARGETS)
+        for target in targets:
+            checked, discrepancies = reconcile.reconcile(
+                target, chunk_size=options['chunk_size'], batch_size=options['batch_size'],
+                dry_run=options['dry_run'],
+            )
+            for object_id, column, stored, actual in discrepancies[:options['show']]:
+                self.stdout.write(f'  {target} {object_id}: {column} {stored} -> {actual}')
+            if len(discrepancies) > options['show'] > 0:
+                self.stdout.write(f'  ... and {len(discrepancies) - options["show"]} more')
+
+            rows = len({object_id for object_id, *_ in discrepancies})
+            per_column = ', '.join(f'{column}: {count}' for column, count in Counter(d[1] for d in discrepancies).items())
+            verb = 'would fix' if options['dry_run'] else 'fixed'
+            summary = f'{target}s: checked {checked}, {verb} {rows}' + (f' ({per_column})' if per_column else '')
+            self.stdout.write(self.style.WARNING(summary) if rows else self.style.SUCCESS(summary))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError
+
+from blood_donation import audit
+
+
+class Command(BaseCommand):
+    help = ('Insert the audit events left in AUDIT_SPILL_DIR by crashed processes or failed flushes '
+            '(without flock, e.g. on Windows, run it only while the app is stopped)')
+
+    def handle(self, *args, **options):
+        try:
+            replayed = audit.replay()
+        except DatabaseError as exc:
+            raise CommandError(f'Could not write the audit events; the spill files are kept: {exc}')
+        self.stdout.write(self.style.SUCCESS(f'Replayed {replayed} audit events'))
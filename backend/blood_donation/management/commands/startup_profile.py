@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from blood_donation import startup
+from blood_donation.models import User
+
+
+class Command(BaseCommand):
+    help = 'Boot the app in a fresh process and report the cost of each start-up phase, AppConfig.ready and import'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', default='/api/hospitals/', help='Path of the first request')
+        parser.add_argument('--user', help='Send the request with a JWT for this username')
+        parser.add_argument('--warm-up', action='store_true', help='Run the warm-up hook before the first request')
+        parser.add_argument('--top', type=int, default=15, help='Packages and modules to list')
+
+    def handle(self, *args, **options):
+        token = None
+        if options['user']:
+            user = User.objects.filter(username=options['user']).first()
+            if user is None:
+                raise CommandError(f"No user named {options['user']}")
+            token = str(RefreshToken.for_user(user).access_token)
+        try:
+            report = startup.profile(options['path'], token=token, warm_up=options['warm_up'])
+        except RuntimeError as exc:
+            raise CommandError(str(exc))
+
+        self.stdout.write(f"GET {options['path']} -> {report['status']}")
+        self.stdout.write('Phases (ms):')
+        for phase, elapsed in report['phases'].items():
+            self.stdout.write(f'  {phase:<16}{elapsed:>9.1f}')
+        self.stdout.write('AppConfig.ready (ms):')
+        for label, elapsed in sorted(report['ready'].items(), key=lambda item: -item[1]):
+            self.stdout.write(f'  {label:<24}{elapsed:>9.1f}')
+        self.stdout.write('Import time by package (ms):')
+        for package, elapsed in startup.by_package(report['imports'])[:options['top']]:
+            self.stdout.write(f'  {package:<24}{elapsed:>9.1f}')
+        self.stdout.write('Slowest modules (ms, own / including their imports):')
+        for name, own, cumulative in sorted(report['imports'], key=lambda item: -item[1])[:options['top']]:
+            self.stdout.write(f'  {name:<48}{own:>9.1f}{cumulative:>9.1f}')
+        if report['loaded'] and not options['warm_up']:
+            self.stdout.write(self.style.WARNING(f"Loaded at start-up although lazy: {', '.join(report['loaded'])}"))
+        self.stdout.write(self.style.SUCCESS(f"Cold start to first response: {report['cold_start_ms']:.0f} ms"))
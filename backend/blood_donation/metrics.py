@@ -0,0 +1,154 @@
+"""
+Per-route performance metrics in Prometheus format.
+
+MetricsMiddleware records, for every request labelled by its resolved URL
+name: request count, latency, SQL query count and time, render time and
+response size. It also sends the same breakdown to the browser as a
+``Server-Timing`` header.
+
+Under gunicorn each worker is its own process. Set PROMETHEUS_MULTIPROC_DIR
+to a writable, empty directory before the workers start. prometheus_client
+then keeps the values in memory-mapped files there, and metrics_view merges
+every worker's files into a single scrape. Without it, the endpoint reports
+only the process that answers the scrape.
+
+The per-route traffic and error data is not public: scrapes must send
+``Authorization: Bearer <METRICS_TOKEN>``. With DEBUG off and no token set,
+the endpoint refuses every scrape.
+"""
+import hmac
+import os
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+from django.http import HttpResponse, HttpResponseForbidden
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Histogram, REGISTRY, generate_latest, multiprocess,
+)
+from rest_framework.renderers import JSONRenderer
+
+REQUESTS = Counter(
+    'http_requests_total', 'Requests by route, method and status',
+    ['route', 'method', 'status'],
+)
+LATENCY = Histogram(
+    'http_request_duration_seconds', 'Total time spent handling the request',
+    ['route', 'method'],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+DB_QUERIES = Histogram(
+    'http_request_db_queries', 'SQL queries executed per request',
+    ['route'],
+    buckets=(0, 1, 2, 5, 10, 20, 50, 100, 200, 500),
+)
+DB_TIME = Histogram(
+    'http_request_db_duration_seconds', 'Time spent in SQL per request',
+    ['route'],
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5),
+)
+RENDER_TIME = Histogram(
+    'http_request_render_duration_seconds', 'Time spent rendering the response body',
+    ['route'],
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1),
+)
+RESPONSE_BYTES = Histogram(
+    'http_response_size_bytes', 'Response body size',
+    ['route'],
+    buckets=(256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304),
+)
+
+AUDIT_EVENTS = Counter(
+    'audit_events_total', 'Audit events by outcome: written, replayed, failed (left for replay) or dropped',
+    ['outcome'],
+)
+
+
+class TimedJSONRenderer(JSONRenderer):
+    """JSONRenderer that notes how long rendering took on the underlying request"""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        started = time.perf_counter()
+        try:
+            return super().render(data, accepted_media_type, renderer_context)
+        finally:
+            request = (renderer_context or {}).get('request')
+            if request is not None:
+                http_request = getattr(request, '_request', request)
+                http_request.render_seconds = getattr(http_request, 'render_seconds', 0.0) + (
+                    time.perf_counter() - started
+                )
+
+
+class _QueryTimer:
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.seconds += time.perf_counter() - started
+
+
+def _route(request):
+    match = getattr(request, 'resolver_match', None)
+    # Unresolved paths share one label so scanners cannot explode cardinality
+    return match.view_name if match and match.view_name else 'unmatched'
+
+
+class MetricsMiddleware:
+    """Record per-route metrics and add a Server-Timing header"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        timer = _QueryTimer()
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for alias in connections:
+                stack.enter_context(connections[alias].execute_wrapper(timer))
+            response = self.get_response(request)
+        total = time.perf_counter() - started
+
+        route = _route(request)
+        render = getattr(request, 'render_seconds', 0.0)
+        size = len(response.content) if not response.streaming else 0
+
+        REQUESTS.labels(route, request.method, response.status_code).inc()
+        LATENCY.labels(route, request.method).observe(total)
+        DB_QUERIES.labels(route).observe(timer.count)
+        DB_TIME.labels(route).observe(timer.seconds)
+        RENDER_TIME.labels(route).observe(render)
+        if not response.streaming:
+            RESPONSE_BYTES.labels(route).observe(size)
+
+        app = max(total - timer.seconds - render, 0.0)
+        response['Server-Timing'] = ', '.join([
+            f'db;dur={timer.seconds * 1000:.1f};desc="{timer.count} queries"',
+            f'render;dur={render * 1000:.1f}',
+            f'app;dur={app * 1000:.1f}',
+            f'total;dur={total * 1000:.1f}',
+        ])
+        return response
+
+
+def metrics_view(request):
+    """Prometheus scrape endpoint, protected by METRICS_TOKEN (open only in DEBUG without one)"""
+    token = settings.METRICS_TOKEN
+    if not token and not settings.DEBUG:
+        return HttpResponseForbidden('Metrics are disabled until METRICS_TOKEN is set')
+    if token and not hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}'):
+        return HttpResponseForbidden('Invalid metrics token')
+
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return HttpResponse(generate_latest(registry), content_type=CONTENT_TYPE_LATEST)
@@ -0,0 +1,50 @@
+# Generated by Django 4.2.7 on 2026-10-18 23:06
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blood_donation', '0007_bloodrequest'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DonationRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('granularity', models.CharField(choices=[('day', 'Day'), ('week', 'Week'), ('month', 'Month')], max_length=5)),
+                ('period_start', models.DateField()),
+                ('blood_type', models.CharField(choices=[('A+', 'A+'), ('A-', 'A-'), ('B+', 'B+'), ('B-', 'B-'), ('AB+', 'AB+'), ('AB-', 'AB-'), ('O+', 'O+'), ('O-', 'O-'), ('None', 'None')], max_length=4)),
+                ('donation_type', models.CharField(choices=[('station', 'Come to Station'), ('home', 'Come to Me')], max_length=10)),
+                ('donation_count', models.IntegerField(default=0)),
+                ('blood_amount', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('lives_saved', models.IntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Donation Rollup',
+                'verbose_name_plural': 'Donation Rollups',
+                'ordering': ['granularity', 'period_start'],
+            },
+        ),
+        migrations.AddField(
+            model_name='donationrecord',
+            name='lives_saved',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='donationrecord',
+            index=models.Index(fields=['donation_date'], name='donation_record_date_idx'),
+        ),
+        migrations.AddField(
+            model_name='donationrollup',
+            name='hospital',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='donation_rollups', to='blood_donation.hospital'),
+        ),
+        migrations.AddConstraint(
+            model_name='donationrollup',
+            constraint=models.UniqueConstraint(fields=('granularity', 'period_start', 'hospital', 'blood_type', 'donation_type'), name='unique_donation_rollup_bucket'),
+        ),
+    ]
@@ -0,0 +1,80 @@
+# Generated by Django 4.2.7 on 2026-10-18 23:08
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blood_donation', '0008_donation_rollups'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BloodUnitLot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('blood_type', models.CharField(choices=[('A+', 'A+'), ('A-', 'A-'), ('B+', 'B+'), ('B-', 'B-'), ('AB+', 'AB+'), ('AB-', 'AB-'), ('O+', 'O+'), ('O-', 'O-'), ('None', 'None')], max_length=4)),
+                ('units_received', models.DecimalField(decimal_places=2, max_digits=7)),
+                ('units_remaining', models.DecimalField(decimal_places=2, max_digits=7)),
+                ('received_at', models.DateTimeField()),
+                ('expires_at', models.DateTimeField()),
+                ('hospital', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='blood_lots', to='blood_donation.hospital')),
+                ('record', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='lot', to='blood_donation.donationrecord')),
+            ],
+            options={
+                'verbose_name': 'Blood Unit Lot',
+                'verbose_name_plural': 'Blood Unit Lots',
+            },
+        ),
+        migrations.CreateModel(
+            name='BloodStock',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('blood_type', models.CharField(choices=[('A+', 'A+'), ('A-', 'A-'), ('B+', 'B+'), ('B-', 'B-'), ('AB+', 'AB+'), ('AB-', 'AB-'), ('O+', 'O+'), ('O-', 'O-'), ('None', 'None')], max_length=4)),
+                ('units', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('hospital', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='blood_stock', to='blood_donation.hospital')),
+            ],
+            options={
+                'verbose_name': 'Blood Stock',
+                'verbose_name_plural': 'Blood Stock',
+            },
+        ),
+        migrations.CreateModel(
+            name='InventoryTransaction',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('blood_type', models.CharField(choices=[('A+', 'A+'), ('A-', 'A-'), ('B+', 'B+'), ('B-', 'B-'), ('AB+', 'AB+'), ('AB-', 'AB-'), ('O+', 'O+'), ('O-', 'O-'), ('None', 'None')], max_length=4)),
+                ('kind', models.CharField(choices=[('in', 'Received'), ('out', 'Used'), ('expired', 'Expired')], max_length=10)),
+                ('units', models.DecimalField(decimal_places=2, max_digits=7)),
+                ('note', models.CharField(blank=True, default='', max_length=255)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('hospital', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='inventory_transactions', to='blood_donation.hospital')),
+                ('lot', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='transactions', to='blood_donation.bloodunitlot')),
+            ],
+            options={
+                'verbose_name': 'Inventory Transaction',
+                'verbose_name_plural': 'Inventory Transactions',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['hospital', 'blood_type', 'created_at'], name='inventory_txn_hospital_idx')],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='bloodunitlot',
+            index=models.Index(condition=models.Q(('units_remaining__gt', 0)), fields=['hospital', 'blood_type', 'expires_at'], name='blood_lot_on_shelf_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='bloodunitlot',
+            index=models.Index(condition=models.Q(('units_remaining__gt', 0)), fields=['expires_at'], name='blood_lot_expiry_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='bloodstock',
+            index=models.Index(fields=['blood_type', 'units'], name='blood_stock_level_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='bloodstock',
+            constraint=models.UniqueConstraint(fields=('hospital', 'blood_type'), name='unique_blood_stock'),
+        ),
+    ]
@@ -0,0 +1,61 @@
+# Generated by Django 4.2.7 on 2026-10-18 23:09
+
+import django.core.validators
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blood_donation', '0009_blood_inventory'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SlotCapacity',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('weekday', models.IntegerField(choices=[(0, 'Monday'), (1, 'Tuesday'), (2, 'Wednesday'), (3, 'Thursday'), (4, 'Friday'), (5, 'Saturday'), (6, 'Sunday')])),
+                ('start_time', models.TimeField()),
+                ('end_time', models.TimeField()),
+                ('slot_minutes', models.IntegerField(default=60, validators=[django.core.validators.MinValueValidator(5)])),
+                ('capacity', models.IntegerField(help_text='Donors per slot', validators=[django.core.validators.MinValueValidator(1)])),
+                ('hospital', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='slot_capacities', to='blood_donation.hospital')),
+            ],
+            options={
+                'verbose_name': 'Slot Capacity',
+                'verbose_name_plural': 'Slot Capacities',
+                'ordering': ['hospital', 'weekday', 'start_time'],
+            },
+        ),
+        migrations.CreateModel(
+            name='AppointmentSlot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('starts_at', models.DateTimeField()),
+                ('ends_at', models.DateTimeField()),
+                ('capacity', models.IntegerField()),
+                ('booked', models.IntegerField(default=0)),
+                ('hospital', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='appointment_slots', to='blood_donation.hospital')),
+            ],
+            options={
+                'verbose_name': 'Appointment Slot',
+                'verbose_name_plural': 'Appointment Slots',
+                'ordering': ['starts_at'],
+            },
+        ),
+        migrations.AddField(
+            model_name='donationschedule',
+            name='slot',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='schedules', to='blood_donation.appointmentslot'),
+        ),
+        migrations.AddConstraint(
+            model_name='appointmentslot',
+            constraint=models.UniqueConstraint(fields=('hospital', 'starts_at'), name='unique_appointment_slot'),
+        ),
+        migrations.AddConstraint(
+            model_name='appointmentslot',
+            constraint=models.CheckConstraint(check=models.Q(('booked__gte', 0), ('booked__lte', models.F('capacity'))), name='appointment_slot_booked_within_capacity'),
+        ),
+    ]
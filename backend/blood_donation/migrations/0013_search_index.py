@@ -0,0 +1,76 @@
+from django.db import migrations
+
+
+SQLITE_FORWARD = [
+    # External-content FTS5 table over SearchDocument, kept in sync by triggers
+    """
+    CREATE VIRTUAL TABLE blood_donation_search_fts USING fts5(
+        title, content,
+        content='blood_donation_searchdocument', content_rowid='id',
+        tokenize='unicode61', prefix='2 3 4'
+    )
+    """,
+    """
+    CREATE TRIGGER blood_donation_search_fts_ai AFTER INSERT ON blood_donation_searchdocument BEGIN
+        INSERT INTO blood_donation_search_fts(rowid, title, content) VALUES (new.id, new.title, new.content);
+    END
+    """,
+    """
+    CREATE TRIGGER blood_donation_search_fts_ad AFTER DELETE ON blood_donation_searchdocument BEGIN
+        INSERT INTO blood_donation_search_fts(blood_donation_search_fts, rowid, title, content)
+        VALUES ('delete', old.id, old.title, old.content);
+    END
+    """,
+    """
+    CREATE TRIGGER blood_donation_search_fts_au AFTER UPDATE ON blood_donation_searchdocument BEGIN
+        INSERT INTO blood_donation_search_fts(blood_donation_search_fts, rowid, title, content)
+        VALUES ('delete', old.id, old.title, old.content);
+        INSERT INTO blood_donation_search_fts(rowid, title, content) VALUES (new.id, new.title, new.content);
+    END
+    """,
+]
+
+SQLITE_REVERSE = [
+    "DROP TRIGGER IF EXISTS blood_donation_search_fts_au",
+    "DROP TRIGGER IF EXISTS blood_donation_search_fts_ad",
+    "DROP TRIGGER IF EXISTS blood_donation_search_fts_ai",
+    "DROP TABLE IF EXISTS blood_donation_search_fts",
+]
+
+POSTGRES_FORWARD = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    """
+    CREATE INDEX blood_donation_search_tsv_idx ON blood_donation_searchdocument
+    USING GIN (to_tsvector('simple', title || ' ' || content))
+    """,
+    """
+    CREATE INDEX blood_donation_search_trgm_idx ON blood_donation_searchdocument
+    USING GIN ((title || ' ' || content) gin_trgm_ops)
+    """,
+]
+
+POSTGRES_REVERSE = [
+    "DROP INDEX IF EXISTS blood_donation_search_trgm_idx",
+    "DROP INDEX IF EXISTS blood_donation_search_tsv_idx",
+]
+
+
+def _run(statements_by_vendor):
+    def run(apps, schema_editor):
+        for statement in statements_by_vendor.get(schema_editor.connection.vendor, []):
+            schema_editor.execute(statement)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blood_donation', '0012_search_documents'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            _run({'sqlite': SQLITE_FORWARD, 'postgresql': POSTGRES_FORWARD}),
+            _run({'sqlite': SQLITE_REVERSE, 'postgresql': POSTGRES_REVERSE}),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 4.2.7 on 2026-10-18 23:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blood_donation', '0013_search_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='appointmentslot',
+            index=models.Index(fields=['starts_at'], name='appointment_slot_start_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='bloodrequest',
+            index=models.Index(fields=['created_at'], name='blood_request_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='donationschedule',
+            index=models.Index(fields=['scheduled_date'], name='donation_schedule_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='donationschedule',
+            index=models.Index(fields=['status', 'scheduled_date'], name='donation_schedule_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='donor',
+            index=models.Index(fields=['blood_type'], name='donor_blood_type_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='donor',
+            index=models.Index(fields=['created_at'], name='donor_created_idx'),
+        ),
+    ]
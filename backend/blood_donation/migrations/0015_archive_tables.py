@@ -0,0 +1,88 @@
+# Generated by Django 4.2.7 on 2026-10-18 23:33
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blood_donation', '0014_admin_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedDonationSchedule',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('scheduled_date', models.DateTimeField()),
+                ('donation_type', models.CharField(choices=[('station', 'Come to Station'), ('home', 'Come to Me')], max_length=10)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('done', 'Done'), ('canceled', 'Canceled')], max_length=10)),
+                ('created_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField()),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+                ('donor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_schedules', to='blood_donation.donor')),
+                ('preferred_hospital', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='blood_donation.hospital')),
+            ],
+            options={
+                'verbose_name': 'Archived Donation Schedule',
+                'verbose_name_plural': 'Archived Donation Schedules',
+                'ordering': ['-scheduled_date'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ArchivedDonationRecord',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('donation_date', models.DateTimeField()),
+                ('blood_amount', models.DecimalField(decimal_places=2, max_digits=5)),
+                ('lives_saved', models.IntegerField(default=0)),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+                ('hospital', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='blood_donation.hospital')),
+                ('schedule', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='record', to='blood_donation.archiveddonationschedule')),
+            ],
+            options={
+                'verbose_name': 'Archived Donation Record',
+                'verbose_name_plural': 'Archived Donation Records',
+                'ordering': ['-donation_date'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ArchivedBloodRequest',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('patient_name', models.CharField(max_length=255)),
+                ('blood_type', models.CharField(choices=[('A+', 'A+'), ('A-', 'A-'), ('B+', 'B+'), ('B-', 'B-'), ('AB+', 'AB+'), ('AB-', 'AB-'), ('O+', 'O+'), ('O-', 'O-'), ('None', 'None')], max_length=4)),
+                ('hospital_name', models.CharField(max_length=255)),
+                ('hospital_location', models.CharField(max_length=255)),
+                ('contact_phone', models.CharField(max_length=20)),
+                ('urgency', models.CharField(choices=[('normal', 'Normal'), ('urgent', 'Urgent'), ('emergency', 'Immediate Emergency')], max_length=10)),
+                ('reason', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField()),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+                ('requester', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Archived Blood Request',
+                'verbose_name_plural': 'Archived Blood Requests',
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='archiveddonationschedule',
+            index=models.Index(fields=['donor', 'scheduled_date'], name='archived_schedule_donor_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='archiveddonationschedule',
+            index=models.Index(fields=['status'], name='archived_schedule_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='archiveddonationrecord',
+            index=models.Index(fields=['donation_date'], name='archived_record_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='archivedbloodrequest',
+            index=models.Index(fields=['created_at'], name='archived_request_created_idx'),
+        ),
+    ]
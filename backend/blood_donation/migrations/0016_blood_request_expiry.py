@@ -0,0 +1,31 @@
+# Generated by Django 4.2.7 on 2026-10-18 23:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blood_donation', '0015_archive_tables'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='archivedbloodrequest',
+            name='expired_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='bloodrequest',
+            name='expired_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='bloodrequest',
+            index=models.Index(condition=models.Q(('expired_at__isnull', True), ('is_fulfilled', False)), fields=['-created_at'], name='blood_request_board_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='bloodrequest',
+            index=models.Index(condition=models.Q(('expired_at__isnull', True)), fields=['is_fulfilled', 'urgency', 'created_at'], name='blood_request_open_idx'),
+        ),
+    ]
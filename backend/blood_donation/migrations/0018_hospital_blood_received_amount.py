@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-18 23:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blood_donation', '0017_idempotency_keys'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='hospital',
+            name='total_blood_received',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=12),
+        ),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 4.2.7 on 2026-10-18 23:56
+
+from django.db import migrations, models
+
+
+def backfill_blood_request_updated_at(apps, schema_editor):
+    # Existing requests did not change at migration time; keep first syncs ordered by age
+    BloodRequest = apps.get_model('blood_donation', 'BloodRequest')
+    BloodRequest.objects.update(updated_at=models.F('created_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blood_donation', '0019_duplicate_candidates'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SyncTombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('schedule', 'Donation Schedule'), ('hospital', 'Hospital'), ('donor', 'Donor'), ('blood_request', 'Blood Request')], max_length=20)),
+                ('object_id', models.BigIntegerField()),
+                ('deleted_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Sync Tombstone',
+                'verbose_name_plural': 'Sync Tombstones',
+            },
+        ),
+        migrations.AddField(
+            model_name='bloodrequest',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.RunPython(backfill_blood_request_updated_at, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='bloodrequest',
+            index=models.Index(fields=['updated_at', 'id'], name='blood_request_sync_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='donationschedule',
+            index=models.Index(fields=['updated_at', 'id'], name='donation_schedule_sync_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='donor',
+            index=models.Index(fields=['updated_at', 'id'], name='donor_sync_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='hospital',
+            index=models.Index(fields=['updated_at', 'id'], name='hospital_sync_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='synctombstone',
+            index=models.Index(fields=['deleted_at'], name='sync_tombstone_deleted_idx'),
+        ),
+    ]
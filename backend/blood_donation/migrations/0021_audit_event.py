@@ -0,0 +1,32 @@
+# Generated by Django 4.2.7 on 2026-10-19 00:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blood_donation', '0020_sync_tracking'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AuditEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('event_id', models.UUIDField(unique=True)),
+                ('occurred_at', models.DateTimeField()),
+                ('actor_id', models.BigIntegerField(blank=True, null=True)),
+                ('action', models.CharField(max_length=40)),
+                ('object_type', models.CharField(max_length=30)),
+                ('object_id', models.BigIntegerField(blank=True, null=True)),
+                ('details', models.TextField(blank=True, default='')),
+            ],
+            options={
+                'verbose_name': 'Audit Event',
+                'verbose_name_plural': 'Audit Events',
+                'ordering': ['-occurred_at', '-id'],
+                'indexes': [models.Index(fields=['occurred_at', 'id'], name='audit_time_idx'), models.Index(fields=['actor_id', 'occurred_at', 'id'], name='audit_actor_time_idx'), models.Index(fields=['object_type', 'object_id', 'occurred_at', 'id'], name='audit_object_time_idx')],
+            },
+        ),
+    ]
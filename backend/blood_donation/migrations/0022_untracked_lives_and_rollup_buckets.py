@@ -0,0 +1,70 @@
+# Generated by Django 4.2.7 on 2026-10-19 00:48
+
+from django.db import migrations, models
+from django.db.migrations.recorder import MigrationRecorder
+
+
+def merge_duplicate_buckets(apps, schema_editor):
+    # The old constraint let concurrent first writes create several buckets without a hospital
+    DonationRollup = apps.get_model('blood_donation', 'DonationRollup')
+    key = ('granularity', 'period_start', 'blood_type', 'donation_type')
+    duplicated = (
+        DonationRollup.objects.filter(hospital__isnull=True)
+        .values(*key).annotate(rows=models.Count('id')).filter(rows__gt=1).order_by()
+    )
+    for bucket in duplicated:
+        rows = list(DonationRollup.objects.filter(hospital__isnull=True, **{field: bucket[field] for field in key}))
+        kept = rows[0]
+        kept.donation_count = sum(row.donation_count for row in rows)
+        kept.blood_amount = sum(row.blood_amount for row in rows)
+        kept.lives_saved = sum(row.lives_saved for row in rows)
+        kept.save(update_fields=['donation_count', 'blood_amount', 'lives_saved'])
+        DonationRollup.objects.filter(id__in=[row.id for row in rows[1:]]).delete()
+
+
+def mark_untracked_lives(apps, schema_editor):
+    # Records from before 0008 got lives_saved=0 whatever their donors were credited with
+    tracked_since = (
+        MigrationRecorder(schema_editor.connection).migration_qs
+        .filter(app='blood_donation', name='0008_donation_rollups')
+        .values_list('applied', flat=True).first()
+    )
+    if tracked_since is None:
+        return
+    for name in ('DonationRecord', 'ArchivedDonationRecord'):
+        model = apps.get_model('blood_donation', name)
+        model.objects.filter(donation_date__lt=tracked_since).update(lives_saved=None)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blood_donation', '0021_audit_event'),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name='donationrollup',
+            name='unique_donation_rollup_bucket',
+        ),
+        migrations.RunPython(merge_duplicate_buckets, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='archiveddonationrecord',
+            name='lives_saved',
+            field=models.IntegerField(blank=True, default=0, null=True),
+        ),
+        migrations.AlterField(
+            model_name='donationrecord',
+            name='lives_saved',
+            field=models.IntegerField(blank=True, default=0, null=True),
+        ),
+        migrations.RunPython(mark_untracked_lives, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='donationrollup',
+            constraint=models.UniqueConstraint(condition=models.Q(('hospital__isnull', False)), fields=('granularity', 'period_start', 'hospital', 'blood_type', 'donation_type'), name='unique_donation_rollup_bucket'),
+        ),
+        migrations.AddConstraint(
+            model_name='donationrollup',
+            constraint=models.UniqueConstraint(condition=models.Q(('hospital__isnull', True)), fields=('granularity', 'period_start', 'blood_type', 'donation_type'), name='unique_donation_rollup_bucket_no_hospital'),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 4.2.7 on 2026-10-19 00:56
+
+from django.db import migrations, models
+
+
+def mark_public_tombstones(apps, schema_editor):
+    # Owners of rows deleted before this migration are unknown, so only admins get those tombstones;
+    # hospitals are public either way
+    SyncTombstone = apps.get_model('blood_donation', 'SyncTombstone')
+    SyncTombstone.objects.filter(kind='hospital').update(public=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blood_donation', '0022_untracked_lives_and_rollup_buckets'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='synctombstone',
+            name='owner_id',
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='synctombstone',
+            name='public',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.RunPython(mark_public_tombstones, migrations.RunPython.noop),
+    ]
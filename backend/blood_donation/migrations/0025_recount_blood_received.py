@@ -0,0 +1,31 @@
+from django.db import migrations
+from django.db.models import Sum
+
+
+def recount_blood_received(apps, schema_editor):
+    # 0018 made the column a unit total but kept the record counts older code stored in it
+    Hospital = apps.get_model('blood_donation', 'Hospital')
+    received = {}
+    for name in ('DonationRecord', 'ArchivedDonationRecord'):
+        rows = (
+            apps.get_model('blood_donation', name).objects
+            .filter(hospital__isnull=False)
+            .values('hospital').annotate(amount=Sum('blood_amount')).order_by()
+        )
+        for row in rows:
+            received[row['hospital']] = received.get(row['hospital'], 0) + row['amount']
+    hospitals = list(Hospital.objects.only('id', 'total_blood_received'))
+    for hospital in hospitals:
+        hospital.total_blood_received = received.get(hospital.id, 0)
+    Hospital.objects.bulk_update(hospitals, ['total_blood_received'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blood_donation', '0024_backfill_search_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(recount_blood_received, migrations.RunPython.noop),
+    ]
@@ -34,6 +34,8 @@ class Donor(models.Model):
     weight = models.DecimalField(max_digits=5, decimal_places=2, null=True, blank=True, help_text="Weight in kilograms")
     phone = models.CharField(max_length=20, blank=True, default='')
     location = models.CharField(max_length=255, blank=True, default='')
+    latitude = models.FloatField(null=True, blank=True)
+    longitude = models.FloatField(null=True, blank=True)
     blood_type = models.CharField(max_length=4, choices=BLOOD_TYPE_CHOICES, blank=True, null=True)
     health_info = models.TextField(blank=True, null=True)
     profile_image = models.ImageField(upload_to='donor_profiles/', blank=True, null=True)
@@ -48,13 +50,20 @@ class Donor(models.Model):
     class Meta:
         verbose_name = "Donor"
         verbose_name_plural = "Donors"
+        indexes = [
+            models.Index(fields=['blood_type'], name='donor_blood_type_idx'),
+            models.Index(fields=['created_at'], name='donor_created_idx'),
+            models.Index(fields=['updated_at', 'id'], name='donor_sync_idx'),
+        ]
 
 
 class Hospital(models.Model):
     """Hospital model"""
     name = models.CharField(max_length=255)
     location = models.CharField(max_length=255)
-    total_blood_received = models.IntegerField(default=0)
+    latitude = models.FloatField(null=True, blank=True)
+    longitude = models.FloatField(null=True, blank=True)
+    total_blood_received = models.DecimalField(max_digits=12, decimal_places=2, default=0)  # sum of blood_amount, in units
     total_lives_saved = models.IntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -65,6 +74,64 @@ class Hospital(models.Model):
     class Meta:
         verbose_name = "Hospital"
         verbose_name_plural = "Hospitals"
+        indexes = [
+            models.Index(fields=['updated_at', 'id'], name='hospital_sync_idx'),
+        ]
+
+
+class SlotCapacity(models.Model):
+    """Recurring weekly appointment capacity for a hospital"""
+    WEEKDAY_CHOICES = [
+        (0, 'Monday'),
+        (1, 'Tuesday'),
+        (2, 'Wednesday'),
+        (3, 'Thursday'),
+        (4, 'Friday'),
+        (5, 'Saturday'),
+        (6, 'Sunday'),
+    ]
+    
+    hospital = models.ForeignKey(Hospital, on_delete=models.CASCADE, related_name='slot_capacities')
+    weekday = models.IntegerField(choices=WEEKDAY_CHOICES)
+    start_time = models.TimeField()
+    end_time = models.TimeField()
+    slot_minutes = models.IntegerField(default=60, validators=[MinValueValidator(5)])
+    capacity = models.IntegerField(validators=[MinValueValidator(1)], help_text="Donors per slot")
+    
+    def __str__(self):
+        return f"{self.hospital.name} - {self.get_weekday_display()} {self.start_time}-{self.end_time}"
+    
+    class Meta:
+        verbose_name = "Slot Capacity"
+        verbose_name_plural = "Slot Capacities"
+        ordering = ['hospital', 'weekday', 'start_time']
+
+
+class AppointmentSlot(models.Model):
+    """A bookable time slot with its own booking counter"""
+    hospital = models.ForeignKey(Hospital, on_delete=models.CASCADE, related_name='appointment_slots')
+    starts_at = models.DateTimeField()
+    ends_at = models.DateTimeField()
+    capacity = models.IntegerField()
+    booked = models.IntegerField(default=0)
+    
+    def __str__(self):
+        return f"{self.hospital_id} - {self.starts_at.strftime('%Y-%m-%d %H:%M')} ({self.booked}/{self.capacity})"
+    
+    class Meta:
+        verbose_name = "Appointment Slot"
+        verbose_name_plural = "Appointment Slots"
+        ordering = ['starts_at']
+        indexes = [
+            models.Index(fields=['starts_at'], name='appointment_slot_start_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['hospital', 'starts_at'], name='unique_appointment_slot'),
+            models.CheckConstraint(
+                check=models.Q(booked__gte=0, booked__lte=models.F('capacity')),
+                name='appointment_slot_booked_within_capacity',
+            ),
+        ]
 
 
 class DonationSchedule(models.Model):
@@ -82,6 +149,7 @@ class DonationSchedule(models.Model):
     
     donor = models.ForeignKey(Donor, on_delete=models.CASCADE, related_name='schedules')
     preferred_hospital = models.ForeignKey(Hospital, on_delete=models.SET_NULL, null=True, blank=True, related_name='scheduled_donations')
+    slot = models.ForeignKey(AppointmentSlot, on_delete=models.SET_NULL, null=True, blank=True, related_name='schedules')
     scheduled_date = models.DateTimeField()
     donation_type = models.CharField(max_length=10, choices=DONATION_TYPE_CHOICES)
     status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
@@ -95,6 +163,11 @@ class DonationSchedule(models.Model):
         verbose_name = "Donation Schedule"
         verbose_name_plural = "Donation Schedules"
         ordering = ['-scheduled_date']
+        indexes = [
+            models.Index(fields=['scheduled_date'], name='donation_schedule_date_idx'),
+            models.Index(fields=['status', 'scheduled_date'], name='donation_schedule_status_idx'),
+            models.Index(fields=['updated_at', 'id'], name='donation_schedule_sync_idx'),
+        ]
 
 
 class DonationRecord(models.Model):
@@ -103,6 +176,9 @@ class DonationRecord(models.Model):
     hospital = models.ForeignKey(Hospital, on_delete=models.SET_NULL, null=True, blank=True, related_name='donations')
     donation_date = models.DateTimeField(auto_now_add=True)
     blood_amount = models.DecimalField(max_digits=5, decimal_places=2, default=1.0)  # in units (typically 1 unit = 450ml)
+    # NULL for records older than per-record counting (migration 0008): the lives credited for them
+    # went straight to the donor's and hospital's totals and cannot be attributed any more
+    lives_saved = models.IntegerField(default=0, null=True, blank=True)
     
     def __str__(self):
         return f"{self.schedule.donor.user.username} - {self.donation_date.strftime('%Y-%m-%d')}"
@@ -111,6 +187,9 @@ class DonationRecord(models.Model):
         verbose_name = "Donation Record"
         verbose_name_plural = "Donation Records"
         ordering = ['-donation_date']
+        indexes = [
+            models.Index(fields=['donation_date'], name='donation_record_date_idx'),
+        ]
 
 
 class BloodRequest(models.Model):
@@ -130,11 +209,357 @@ class BloodRequest(models.Model):
     urgency = models.CharField(max_length=10, choices=URGENCY_CHOICES, default='normal')
     reason = models.TextField(blank=True)
     is_fulfilled = models.BooleanField(default=False)
+    # Set by expire_blood_requests once the urgency's deadline has passed unfulfilled
+    expired_at = models.DateTimeField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
     
     def __str__(self):
         return f"{self.blood_type} - {self.patient_name}"
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['created_at'], name='blood_request_created_idx'),
+            # Only open requests are indexed, so both stay small however much history there is
+            models.Index(fields=['-created_at'], name='blood_request_board_idx',
+                         condition=models.Q(is_fulfilled=False, expired_at__isnull=True)),
+            models.Index(fields=['is_fulfilled', 'urgency', 'created_at'], name='blood_request_open_idx',
+                         condition=models.Q(expired_at__isnull=True)),
+            models.Index(fields=['updated_at', 'id'], name='blood_request_sync_idx'),
+        ]
+
+
+class DonationRollup(models.Model):
+    """Pre-aggregated donation totals per period, hospital, blood type and donation type"""
+    GRANULARITY_CHOICES = [
+        ('day', 'Day'),
+        ('week', 'Week'),
+        ('month', 'Month'),
+    ]
+    
+    granularity = models.CharField(max_length=5, choices=GRANULARITY_CHOICES)
+    period_start = models.DateField()
+    hospital = models.ForeignKey(Hospital, on_delete=models.SET_NULL, null=True, blank=True, related_name='donation_rollups')
+    blood_type = models.CharField(max_length=4, choices=Donor.BLOOD_TYPE_CHOICES)
+    donation_type = models.CharField(max_length=10, choices=DonationSchedule.DONATION_TYPE_CHOICES)
+    donation_count = models.IntegerField(default=0)
+    blood_amount = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    lives_saved = models.IntegerField(default=0)
+    
+    def __str__(self):
+        return f"{self.granularity} {self.period_start} - {self.blood_type}"
+    
+    class Meta:
+        verbose_name = "Donation Rollup"
+        verbose_name_plural = "Donation Rollups"
+        ordering = ['granularity', 'period_start']
+        # NULLs never collide in a unique index, so buckets without a hospital get their own constraint
+        constraints = [
+            models.UniqueConstraint(
+                fields=['granularity', 'period_start', 'hospital', 'blood_type', 'donation_type'],
+                condition=models.Q(hospital__isnull=False),
+                name='unique_donation_rollup_bucket',
+            ),
+            models.UniqueConstraint(
+                fields=['granularity', 'period_start', 'blood_type', 'donation_type'],
+                condition=models.Q(hospital__isnull=True),
+                name='unique_donation_rollup_bucket_no_hospital',
+            ),
+        ]
+
+
+class BloodUnitLot(models.Model):
+    """Blood received by a hospital from one donation, tracked until used or expired"""
+    hospital = models.ForeignKey(Hospital, on_delete=models.CASCADE, related_name='blood_lots')
+    record = models.OneToOneField(DonationRecord, on_delete=models.SET_NULL, null=True, blank=True, related_name='lot')
+    blood_type = models.CharField(max_length=4, choices=Donor.BLOOD_TYPE_CHOICES)
+    units_received = models.DecimalField(max_digits=7, decimal_places=2)
+    units_remaining = models.DecimalField(max_digits=7, decimal_places=2)
+    received_at = models.DateTimeField()
+    expires_at = models.DateTimeField()
+    
+    def __str__(self):
+        return f"{self.hospital_id} - {self.blood_type} - {self.units_remaining}/{self.units_received}"
+    
+    class Meta:
+        verbose_name = "Blood Unit Lot"
+        verbose_name_plural = "Blood Unit Lots"
+        indexes = [
+            # Only lots still on the shelf are interesting for dispensing and expiry
+            models.Index(
+                fields=['hospital', 'blood_type', 'expires_at'],
+                condition=models.Q(units_remaining__gt=0),
+                name='blood_lot_on_shelf_idx',
+            ),
+            models.Index(
+                fields=['expires_at'],
+                condition=models.Q(units_remaining__gt=0),
+                name='blood_lot_expiry_idx',
+            ),
+        ]
+
+
+class InventoryTransaction(models.Model):
+    """Append-only ledger of blood units moving in and out of hospital stock"""
+    KIND_CHOICES = [
+        ('in', 'Received'),
+        ('out', 'Used'),
+        ('expired', 'Expired'),
+    ]
+    
+    hospital = models.ForeignKey(Hospital, on_delete=models.CASCADE, related_name='inventory_transactions')
+    lot = models.ForeignKey(BloodUnitLot, on_delete=models.SET_NULL, null=True, blank=True, related_name='transactions')
+    blood_type = models.CharField(max_length=4, choices=Donor.BLOOD_TYPE_CHOICES)
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    units = models.DecimalField(max_digits=7, decimal_places=2)
+    note = models.CharField(max_length=255, blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    def __str__(self):
+        return f"{self.kind} {self.units} {self.blood_type} @ {self.hospital_id}"
+    
+    class Meta:
+        verbose_name = "Inventory Transaction"
+        verbose_name_plural = "Inventory Transactions"
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['hospital', 'blood_type', 'created_at'], name='inventory_txn_hospital_idx'),
+        ]
+
+
+class BloodStock(models.Model):
+    """Current units on the shelf per hospital and blood type"""
+    hospital = models.ForeignKey(Hospital, on_delete=models.CASCADE, related_name='blood_stock')
+    blood_type = models.CharField(max_length=4, choices=Donor.BLOOD_TYPE_CHOICES)
+    units = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"{self.hospital_id} - {self.blood_type}: {self.units}"
+    
+    class Meta:
+        verbose_name = "Blood Stock"
+        verbose_name_plural = "Blood Stock"
+        constraints = [
+            models.UniqueConstraint(fields=['hospital', 'blood_type'], name='unique_blood_stock'),
+        ]
+        indexes = [
+            models.Index(fields=['blood_type', 'units'], name='blood_stock_level_idx'),
+        ]
+
+
+class SearchDocument(models.Model):
+    """Denormalized text of a searchable object, indexed by the database's full-text engine"""
+    KIND_CHOICES = [
+        ('donor', 'Donor'),
+        ('hospital', 'Hospital'),
+        ('blood_request', 'Blood Request'),
+    ]
+    
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    object_id = models.BigIntegerField()
+    title = models.CharField(max_length=255)
+    content = models.TextField(blank=True, default='')
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"{self.kind} {self.object_id}: {self.title}"
+    
+    class Meta:
+        verbose_name = "Search Document"
+        verbose_name_plural = "Search Documents"
+        constraints = [
+            models.UniqueConstraint(fields=['kind', 'object_id'], name='unique_search_document'),
+        ]
+
+
+class ArchivedDonationSchedule(models.Model):
+    """Finished schedule moved out of DonationSchedule by archive_old_data; keeps the original id"""
+    id = models.BigIntegerField(primary_key=True)
+    donor = models.ForeignKey(Donor, on_delete=models.CASCADE, related_name='archived_schedules')
+    preferred_hospital = models.ForeignKey(Hospital, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    scheduled_date = models.DateTimeField()
+    donation_type = models.CharField(max_length=10, choices=DonationSchedule.DONATION_TYPE_CHOICES)
+    status = models.CharField(max_length=10, choices=DonationSchedule.STATUS_CHOICES)
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+    
+    def __str__(self):
+        return f"{self.donor_id} - {self.scheduled_date.strftime('%Y-%m-%d %H:%M')} (archived)"
+    
+    class Meta:
+        verbose_name = "Archived Donation Schedule"
+        verbose_name_plural = "Archived Donation Schedules"
+        ordering = ['-scheduled_date']
+        indexes = [
+            models.Index(fields=['donor', 'scheduled_date'], name='archived_schedule_donor_idx'),
+            models.Index(fields=['status'], name='archived_schedule_status_idx'),
+        ]
+
+
+class ArchivedDonationRecord(models.Model):
+    """Donation record of an archived schedule; keeps the original id so certificates still resolve"""
+    id = models.BigIntegerField(primary_key=True)
+    schedule = models.OneToOneField(ArchivedDonationSchedule, on_delete=models.CASCADE, related_name='record')
+    hospital = models.ForeignKey(Hospital, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    donation_date = models.DateTimeField()
+    blood_amount = models.DecimalField(max_digits=5, decimal_places=2)
+    lives_saved = models.IntegerField(default=0, null=True, blank=True)
+    archived_at = models.DateTimeField(auto_now_add=True)
+    
+    def __str__(self):
+        return f"{self.schedule_id} - {self.donation_date.strftime('%Y-%m-%d')} (archived)"
+    
+    class Meta:
+        verbose_name = "Archived Donation Record"
+        verbose_name_plural = "Archived Donation Records"
+        ordering = ['-donation_date']
+        indexes = [
+            models.Index(fields=['donation_date'], name='archived_record_date_idx'),
+        ]
+
+
+class ArchivedBloodRequest(models.Model):
+    """Fulfilled or expired blood request moved out of BloodRequest by archive_old_data"""
+    id = models.BigIntegerField(primary_key=True)
+    requester = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    patient_name = models.CharField(max_length=255)
+    blood_type = models.CharField(max_length=4, choices=Donor.BLOOD_TYPE_CHOICES)
+    hospital_name = models.CharField(max_length=255)
+    hospital_location = models.CharField(max_length=255)
+    contact_phone = models.CharField(max_length=20)
+    urgency = models.CharField(max_length=10, choices=BloodRequest.URGENCY_CHOICES)
+    reason = models.TextField(blank=True)
+    expired_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+    
+    def __str__(self):
+        return f"{self.blood_type} - {self.patient_name} (archived)"
+    
+    class Meta:
+        verbose_name = "Archived Blood Request"
+        verbose_name_plural = "Archived Blood Requests"
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['created_at'], name='archived_request_created_idx'),
+        ]
+
+
+class IdempotencyKey(models.Model):
+    """Stored outcome of a write sent with an Idempotency-Key header, replayed on retries"""
+    STATE_CHOICES = [
+        ('pending', 'In flight'),
+        ('done', 'Done'),
+    ]
+    
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    key = models.CharField(max_length=255)
+    # sha256 of method, path and body, so a reused key with a different request is rejected
+    fingerprint = models.CharField(max_length=64)
+    state = models.CharField(max_length=7, choices=STATE_CHOICES, default='pending')
+    status_code = models.PositiveSmallIntegerField(null=True, blank=True)
+    response_body = models.TextField(blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField()
+    
+    def __str__(self):
+        return f"{self.user_id}:{self.key} ({self.state})"
+    
+    class Meta:
+        verbose_name = "Idempotency Key"
+        verbose_name_plural = "Idempotency Keys"
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'key'], name='unique_idempotency_key'),
+        ]
+        indexes = [
+            models.Index(fields=['expires_at'], name='idempotency_expires_idx'),
+        ]
 
+
+class DuplicateCandidate(models.Model):
+    """Pair of donor profiles that find_duplicate_donors thinks belong to one person"""
+    STATUS_CHOICES = [
+        ('open', 'Open'),
+        ('merged', 'Merged'),
+        ('dismissed', 'Not a duplicate'),
+    ]
+    
+    # donor_a always has the lower id
+    donor_a = models.ForeignKey(Donor, on_delete=models.CASCADE, related_name='+')
+    donor_b = models.ForeignKey(Donor, on_delete=models.CASCADE, related_name='+')
+    score = models.FloatField()
+    reasons = models.CharField(max_length=100, blank=True, default='')
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='open')
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"{self.donor_a_id} ~ {self.donor_b_id} ({self.score:.2f})"
+    
+    class Meta:
+        verbose_name = "Duplicate Candidate"
+        verbose_name_plural = "Duplicate Candidates"
+        ordering = ['-score']
+        constraints = [
+            models.UniqueConstraint(fields=['donor_a', 'donor_b'], name='unique_duplicate_pair'),
+        ]
+        indexes = [
+            models.Index(fields=['status', '-score'], name='duplicate_status_score_idx'),
+        ]
+
+
+class SyncTombstone(models.Model):
+    """Id of a deleted row that offline devices still have to drop; see blood_donation/sync.py"""
+    KIND_CHOICES = [
+        ('schedule', 'Donation Schedule'),
+        ('hospital', 'Hospital'),
+        ('donor', 'Donor'),
+        ('blood_request', 'Blood Request'),
+    ]
+    
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    object_id = models.BigIntegerField()
+    # Who else may learn of the deletion: the user the row belonged to, or everyone if it was public
+    owner_id = models.BigIntegerField(null=True, blank=True)
+    public = models.BooleanField(default=False)
+    deleted_at = models.DateTimeField(auto_now_add=True)
+    
+    def __str__(self):
+        return f"{self.kind} {self.object_id} (deleted)"
+    
+    class Meta:
+        verbose_name = "Sync Tombstone"
+        verbose_name_plural = "Sync Tombstones"
+        indexes = [
+            models.Index(fields=['deleted_at'], name='sync_tombstone_deleted_idx'),
+        ]
+
+
+class AuditEvent(models.Model):
+    """Admin mutation, written in batches by blood_donation/audit.py; never updated or deleted"""
+    # Random per event, so replaying a spill file that was already inserted adds nothing
+    event_id = models.UUIDField(unique=True)
+    occurred_at = models.DateTimeField()
+    # Plain ids rather than foreign keys: the log has to outlive the users and rows it mentions
+    actor_id = models.BigIntegerField(null=True, blank=True)
+    action = models.CharField(max_length=40)
+    object_type = models.CharField(max_length=30)
+    object_id = models.BigIntegerField(null=True, blank=True)
+    details = models.TextField(blank=True, default='')
+    
+    def __str__(self):
+        return f"{self.action} {self.object_type} {self.object_id} by {self.actor_id}"
+    
+    class Meta:
+        verbose_name = "Audit Event"
+        verbose_name_plural = "Audit Events"
+        ordering = ['-occurred_at', '-id']
+        # One per filter audit.query() accepts, each ending in its (occurred_at, id) page order
+        indexes = [
+            models.Index(fields=['occurred_at', 'id'], name='audit_time_idx'),
+            models.Index(fields=['actor_id', 'occurred_at', 'id'], name='audit_actor_time_idx'),
+            models.Index(fields=['object_type', 'object_id', 'occurred_at', 'id'], name='audit_object_time_idx'),
+        ]
@@ -0,0 +1,115 @@
+"""
+Bulk donor onboarding for organised blood drives.
+
+Registering a donor is dominated by hashing the password, which is
+deliberately slow (hundreds of milliseconds with the default PBKDF2
+iterations). At a drive that signs up hundreds of people at once,
+create_donors() therefore:
+
+* hashes the passwords in a process pool when the caller passes one.
+  onboard_donors starts a pool with the ``spawn`` start method (forking a
+  process that runs threads, like the audit writer, can copy a lock while it
+  is held) and keeps it for the whole file. The HTTP endpoint does not
+  start processes inside a threaded worker: it hashes in the request
+  thread, a chunk at a time. PBKDF2 releases the GIL, so the worker's other
+  threads keep serving meanwhile, but the request still waits for every
+  hash, so the endpoint takes at most HTTP_MAX_BATCH donors (a few seconds
+  of hashing). Larger drives go through onboard_donors;
+* writes users, donor profiles and their search documents with one
+  bulk_create each, in a single transaction, so a batch goes in whole or
+  not at all;
+* optionally issues JWT pairs for the new users afterwards. Signing needs
+  no database access.
+
+Entries are validated beforehand with DonorOnboardingSerializer(many=True).
+"""
+import os
+
+import django
+from django.contrib.auth.hashers import get_hasher, make_password
+from django.db import transaction
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from . import search
+from .models import Donor, User
+
+MAX_BATCH = 500
+# About 0.2 s of PBKDF2 per password, so an HTTP batch hashes for 5 s at most
+HTTP_MAX_BATCH = 25
+# Handing a pool a few hashes costs more than it saves
+PARALLEL_MIN_PASSWORDS = 4
+CHUNK_PASSWORDS = 2
+
+
+def hash_chunk(job):
+    """Worker entry point: ``job`` is (hasher, [password, ...]); returns encoded hashes"""
+    hasher, passwords = job
+    return [hasher.encode(password, hasher.salt()) for password in passwords]
+
+
+def hashing_pool(workers=None):
+    """Process pool for hash_passwords(); spawned workers set Django up before their first chunk"""
+    # Imported here to keep multiprocessing out of start-up
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+
+    return ProcessPoolExecutor(
+        max_workers=workers or os.cpu_count(), mp_context=multiprocessing.get_context('spawn'),
+        initializer=django.setup,
+    )
+
+
+def hash_passwords(passwords, pool=None):
+    """Encoded hashes for ``passwords`` in order, in ``pool`` if given; None gets an unusable password"""
+    hasher = get_hasher()
+    given = [password for password in passwords if password]
+    jobs = [(hasher, given[start:start + CHUNK_PASSWORDS]) for start in range(0, len(given), CHUNK_PASSWORDS)]
+    if pool is not None and len(jobs) > 1 and len(given) >= PARALLEL_MIN_PASSWORDS:
+        chunks = list(pool.map(hash_chunk, jobs))
+    else:
+        chunks = [hash_chunk(job) for job in jobs]
+    hashes = iter([encoded for chunk in chunks for encoded in chunk])
+    return [next(hashes) if password else make_password(None) for password in passwords]
+
+
+def create_donors(entries, pool=None):
+    """Create a User and Donor for each validated entry in one transaction; returns the donors"""
+    if len(entries) > MAX_BATCH:
+        raise ValueError(f'At most {MAX_BATCH} donors per batch')
+    hashes = hash_passwords([entry.get('password') for entry in entries], pool)
+    users = [
+        User(
+            username=entry['username'], email=User.objects.normalize_email(entry['email']),
+            first_name=entry['first_name'], last_name=entry['last_name'], role='donor', password=encoded,
+        )
+        for entry, encoded in zip(entries, hashes)
+    ]
+    with transaction.atomic():
+        users = User.objects.bulk_create(users)
+        if any(user.pk is None for user in users):
+            # Backends without INSERT ... RETURNING leave the primary keys unset
+            ids = dict(User.objects.filter(username__in=[user.username for user in users]).values_list('username', 'id'))
+            for user in users:
+                user.pk = ids[user.username]
+        donors = Donor.objects.bulk_create([
+            Donor(
+                user=user, phone=entry['phone'], location=entry['location'],
+                blood_type=entry['blood_type'], age=entry['age'],
+            )
+            for entry, user in zip(entries, users)
+        ])
+        if any(donor.pk is None for donor in donors):
+            ids = dict(Donor.objects.filter(user__in=users).values_list('user_id', 'id'))
+            for donor in donors:
+                donor.pk = ids[donor.user_id]
+        search.index_many('donor', donors)
+    return donors
+
+
+def issue_tokens(users):
+    """A refresh/access pair per user, in order"""
+    tokens = []
+    for user in users:
+        refresh = RefreshToken.for_user(user)
+        tokens.append({'refresh': str(refresh), 'access': str(refresh.access_token)})
+    return tokens
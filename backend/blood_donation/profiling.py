@@ -0,0 +1,208 @@
+"""
+On-demand request profiling.
+
+An admin asks /api/admin/profiling/token/ for a short-lived signed token and
+sends it back in an ``X-Profile`` header on the request to inspect. Only the
+header is read: a token in the URL would end up in access and proxy logs.
+ProfilingMiddleware then runs that request under cProfile, records every SQL
+statement with its timing, and gathers explain plans for the slowest ones. The result is saved as a zip artifact in
+PROFILING_DIR. Artifacts are rotated so the directory stays under
+PROFILING_MAX_FILES and PROFILING_MAX_BYTES.
+
+PROFILING_SAMPLE_RATE additionally profiles a random fraction of all requests.
+"""
+import io
+import json
+import logging
+import os
+import random
+import re
+import time
+import uuid
+from contextlib import ExitStack
+from datetime import datetime, timezone as dt_timezone
+from pathlib import Path
+
+from django.conf import settings
+from django.core import signing
+from django.db import connections
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+HEADER = 'X-Profile'
+TOKEN_SALT = 'blood_donation.profiling'
+ARTIFACT_RE = re.compile(r'^[0-9]{8}T[0-9]{6}-[\w.-]+-[0-9a-f]{8}\.zip$')
+EXPLAIN_SLOWEST = 5
+
+
+def issue_token(user):
+    """Signed token that lets ``user`` profile requests for PROFILING_TOKEN_SECONDS"""
+    return signing.TimestampSigner(salt=TOKEN_SALT).sign(str(user.pk))
+
+
+def _token_user_id(token):
+    try:
+        return int(signing.TimestampSigner(salt=TOKEN_SALT).unsign(token, max_age=settings.PROFILING_TOKEN_SECONDS))
+    except (signing.BadSignature, ValueError):
+        return None
+
+
+def _requested_by_admin(request):
+    token = request.headers.get(HEADER)
+    if not token:
+        return False
+    user_id = _token_user_id(token)
+    if user_id is None:
+        return False
+    from .models import User
+    return User.objects.filter(pk=user_id, role='admin', is_active=True).exists()
+
+
+class _SQLRecorder:
+    def __init__(self, alias):
+        self.alias = alias
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append({
+                'alias': self.alias,
+                'sql': sql,
+                'params': repr(params)[:500],
+                # Kept until the slow SELECTs have been explained, then dropped
+                'raw_params': params,
+                'many': many,
+                'ms': round((time.perf_counter() - started) * 1000, 3),
+            })
+
+
+def _explain(query):
+    if query['many'] or not query['sql'].lstrip().upper().startswith('SELECT'):
+        return None
+    connection = connections[query['alias']]
+    prefix = 'EXPLAIN QUERY PLAN ' if connection.vendor == 'sqlite' else 'EXPLAIN '
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(prefix + query['sql'], query.get('raw_params'))
+            return [' '.join(str(column) for column in row) for row in cursor.fetchall()]
+    except Exception as exc:  # explain is best effort; never break the response
+        return [f'explain failed: {exc}']
+
+
+def artifact_dir():
+    path = Path(settings.PROFILING_DIR)
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def list_artifacts():
+    """Newest first, as (name, size, created_at)"""
+    entries = []
+    for path in artifact_dir().iterdir():
+        if ARTIFACT_RE.match(path.name):
+            stat = path.stat()
+            entries.append((path.name, stat.st_size, datetime.fromtimestamp(stat.st_mtime, tz=dt_timezone.utc)))
+    return sorted(entries, key=lambda entry: entry[2], reverse=True)
+
+
+def artifact_path(name):
+    """Resolve an artifact name safely, or None if it does not exist"""
+    if not ARTIFACT_RE.match(name):
+        return None
+    path = artifact_dir() / name
+    return path if path.exists() else None
+
+
+def rotate():
+    """Delete the oldest artifacts beyond the count and size budgets"""
+    total = 0
+    for index, (name, size, _) in enumerate(list_artifacts()):
+        total += size
+        if index >= settings.PROFILING_MAX_FILES or total > settings.PROFILING_MAX_BYTES:
+            try:
+                os.remove(artifact_dir() / name)
+            except FileNotFoundError:
+                pass
+
+
+def _save(request, response, profiler, queries, elapsed, reason):
+    route = getattr(getattr(request, 'resolver_match', None), 'url_name', None) or 'unmatched'
+    name = f"{timezone.now():%Y%m%dT%H%M%S}-{route}-{uuid.uuid4().hex[:8]}.zip"
+
+    slowest = sorted(range(len(queries)), key=lambda i: queries[i]['ms'], reverse=True)[:EXPLAIN_SLOWEST]
+    for i in slowest:
+        queries[i]['explain'] = _explain(queries[i])
+    for query in queries:
+        query.pop('raw_params', None)
+
+    import pstats
+    import zipfile
+
+    stats_text = io.StringIO()
+    stats = pstats.Stats(profiler, stream=stats_text)
+    stats.sort_stats('cumulative').print_stats(60)
+
+    report = {
+        'method': request.method,
+        'path': request.path,
+        'route': route,
+        'status': response.status_code,
+        'reason': reason,
+        'elapsed_ms': round(elapsed * 1000, 3),
+        'sql_count': len(queries),
+        'sql_ms': round(sum(query['ms'] for query in queries), 3),
+        'queries': queries,
+        'created_at': timezone.now().isoformat(),
+    }
+
+    prof_path = artifact_dir() / f'.{name}.prof'
+    stats.dump_stats(prof_path)
+    try:
+        with zipfile.ZipFile(artifact_dir() / name, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+            archive.writestr('report.json', json.dumps(report, indent=2, default=str))
+            archive.writestr('stats.txt', stats_text.getvalue())
+            archive.write(prof_path, 'profile.prof')
+    finally:
+        prof_path.unlink(missing_ok=True)
+    rotate()
+    return name
+
+
+class ProfilingMiddleware:
+    """Profile requests carrying a valid admin profiling token, plus a random sample"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        reason = None
+        if _requested_by_admin(request):
+            reason = 'requested'
+        elif settings.PROFILING_SAMPLE_RATE and random.random() < settings.PROFILING_SAMPLE_RATE:
+            reason = 'sampled'
+        if reason is None:
+            return self.get_response(request)
+
+        # Imported here, so processes that never profile do not load it at start-up
+        import cProfile
+
+        recorders = [_SQLRecorder(alias) for alias in connections]
+        profiler = cProfile.Profile()
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for recorder in recorders:
+                stack.enter_context(connections[recorder.alias].execute_wrapper(recorder))
+            response = profiler.runcall(self.get_response, request)
+        elapsed = time.perf_counter() - started
+
+        queries = [query for recorder in recorders for query in recorder.queries]
+        try:
+            response['X-Profile-Id'] = _save(request, response, profiler, queries, elapsed, reason)
+        except OSError:
+            logger.exception('Could not store profile for %s', request.path)
+        return response
+
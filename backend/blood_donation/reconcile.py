@@ -0,0 +1,116 @@
+"""
+Recompute the denormalized donor and hospital totals from donation records.
+
+The stored columns are bumped by the views as donations happen. Anything
+that bypasses them (admin edits, imports, lost updates, older code that
+counted records instead of units) makes them drift. reconcile() walks a
+table in primary-key ranges. For each range it:
+
+1. locks the stored rows (skipped for a dry run),
+2. computes the true values with one GROUP BY per record table (live and
+   archived records both count), and
+3. diffs them in Python and writes only the rows that differ, with
+   bulk_update.
+
+Each range is one transaction, so concurrent view updates wait on the row
+locks and then apply their increments on top of the corrected value.
+
+Records from before per-record lives counting (migration 0008) have
+lives_saved NULL: the lives were only added to the donor and hospital
+totals. For a row with such records the summed lives are only a lower
+bound, so a larger stored total is left alone and a smaller one is raised.
+"""
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Count, Max, Min, Q, Sum
+
+from .models import ArchivedDonationRecord, DonationRecord, Donor, Hospital
+
+RECORD_MODELS = (DonationRecord, ArchivedDonationRecord)
+
+# model, path from a record to the model's id, {stored column: aggregate over records},
+# lives column (summed lives are only a lower bound where records predate per-record counting)
+TARGETS = {
+    'donor': (Donor, 'schedule__donor', {
+        'total_donations': Count('id'),
+        'lives_saved': Sum('lives_saved'),
+    }, 'lives_saved'),
+    'hospital': (Hospital, 'hospital', {
+        'total_blood_received': Sum('blood_amount'),
+        'total_lives_saved': Sum('lives_saved'),
+    }, 'total_lives_saved'),
+}
+UNTRACKED = Count('id', filter=Q(lives_saved__isnull=True))
+
+
+def _actual(path, aggregates, lo, hi):
+    """{object id: {column: summed value, 'untracked': records without lives}} for ids in [lo, hi) that have records"""
+    actual = defaultdict(lambda: dict.fromkeys([*aggregates, 'untracked'], 0))
+    for model in RECORD_MODELS:
+        rows = (
+            model.objects
+            .filter(**{f'{path}__gte': lo, f'{path}__lt': hi})
+            .values(path)
+            # Before the aggregates, so its filter means the record field and not the donor's Sum of it
+            .annotate(untracked=UNTRACKED, **aggregates)
+            .order_by()
+        )
+        for row in rows:
+            values = actual[row[path]]
+            for column in values:
+                values[column] += row[column] or 0
+    return actual
+
+
+def _true_values(columns, lives_column, stored, summed):
+    """What each column should hold, given its stored values and the sums from _actual()"""
+    true_values = {column: summed[column] if summed else 0 for column in columns}
+    if summed and summed['untracked']:
+        # The lives of the untracked records are unknown; only a total below the known ones is wrong
+        true_values[lives_column] = max(true_values[lives_column], stored[lives_column])
+    return true_values
+
+
+def reconcile(target, chunk_size=10000, batch_size=1000, dry_run=False):
+    """
+    Bring one target's columns in line with the records.
+
+    Returns (rows checked, discrepancies) where each discrepancy is
+    (object id, column, stored value, true value).
+    """
+    model, path, aggregates, lives_column = TARGETS[target]
+    columns = list(aggregates)
+    bounds = model.objects.aggregate(first=Min('id'), last=Max('id'))
+    if bounds['first'] is None:
+        return 0, []
+
+    checked = 0
+    discrepancies = []
+    for lo in range(bounds['first'], bounds['last'] + 1, chunk_size):
+        hi = lo + chunk_size
+        with transaction.atomic():
+            stored = model.objects.filter(id__gte=lo, id__lt=hi).order_by('id')
+            if not dry_run:
+                stored = stored.select_for_update()
+            stored = list(stored.values_list('id', *columns))
+            actual = _actual(path, aggregates, lo, hi)
+
+            changed = []
+            for object_id, *values in stored:
+                values = dict(zip(columns, values))
+                true_values = _true_values(columns, lives_column, values, actual.get(object_id))
+                wrong = [
+                    (object_id, column, value, true_values[column])
+                    for column, value in values.items() if value != true_values[column]
+                ]
+                if wrong:
+                    discrepancies.extend(wrong)
+                    # Columns that were right are rewritten with the same value
+                    changed.append(model(id=object_id, **true_values))
+            checked += len(stored)
+
+            if changed and not dry_run:
+                model.objects.bulk_update(changed, columns, batch_size=batch_size)
+    return checked, discrepancies
+
@@ -0,0 +1,238 @@
+"""
+Time-series rollups for donations.
+
+Completed donations are counted into day, week and month buckets keyed by
+(period_start, hospital, blood_type, donation_type). Day buckets are the
+source of truth; week and month buckets hold the same totals at a coarser
+grain so long ranges can be answered from a handful of rows.
+
+Lives saved are only known per record since migration 0008. Older records
+have lives_saved NULL, so rebuilt buckets count the lives attributed to
+records, which can be fewer than the donors' and hospitals' totals.
+"""
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Max, Min, Sum
+from django.db.models.functions import TruncDate, TruncMonth, TruncWeek
+from django.utils import timezone
+
+from .models import ArchivedDonationRecord, DonationRecord, DonationRollup
+
+GRANULARITIES = ('day', 'week', 'month')
+# Live and archived records share the field paths rebuild() reads
+RECORD_MODELS = (DonationRecord, ArchivedDonationRecord)
+DIMENSIONS = ('hospital', 'blood_type', 'donation_type')
+
+
+def period_start(day, granularity):
+    """Return the first day of the bucket that contains ``day``"""
+    if granularity == 'week':
+        return day - timedelta(days=day.weekday())
+    if granularity == 'month':
+        return day.replace(day=1)
+    return day
+
+
+def _bucket_key(record):
+    schedule = record.schedule
+    return {
+        'hospital_id': record.hospital_id,
+        'blood_type': schedule.donor.blood_type or 'None',
+        'donation_type': schedule.donation_type,
+    }
+
+
+def _bump(granularity, start, key, donations=0, blood_amount=Decimal('0'), lives_saved=0):
+    """Add to one bucket, creating it on first use"""
+    lookup = dict(key, granularity=granularity, period_start=start)
+    changes = {
+        'donation_count': F('donation_count') + donations,
+        'blood_amount': F('blood_amount') + blood_amount,
+        'lives_saved': F('lives_saved') + lives_saved,
+    }
+    if DonationRollup.objects.filter(**lookup).update(**changes):
+        return
+    try:
+        with transaction.atomic():
+            DonationRollup.objects.create(
+                donation_count=donations,
+                blood_amount=blood_amount,
+                lives_saved=lives_saved,
+                **lookup
+            )
+    except IntegrityError:
+        # Another request created the bucket between our update and insert
+        DonationRollup.objects.filter(**lookup).update(**changes)
+
+
+def _bump_all_levels(record, **amounts):
+    day = timezone.localdate(record.donation_date)
+    key = _bucket_key(record)
+    for granularity in GRANULARITIES:
+        _bump(granularity, period_start(day, granularity), key, **amounts)
+
+
+def record_donation(record):
+    """Count a newly created donation record into every rollup level"""
+    _bump_all_levels(record, donations=1, blood_amount=Decimal(str(record.blood_amount)))
+
+
+def record_lives_saved(record, lives_saved):
+    """Attribute lives saved to the buckets of the record's donation"""
+    _bump_all_levels(record, lives_saved=lives_saved)
+
+
+def rebuild(start=None, end=None):
+    """
+    Rebuild rollups from DonationRecord history, archived records included.
+
+    Day buckets are recomputed with one GROUP BY per month of history, then
+    week and month buckets touching the range are derived from the day rows.
+    Returns the number of day buckets written.
+    """
+    if start is None or end is None:
+        bounds = [
+            model.objects.aggregate(first=Min('donation_date'), last=Max('donation_date'))
+            for model in RECORD_MODELS
+        ]
+        firsts = [b['first'] for b in bounds if b['first'] is not None]
+        if not firsts:
+            return 0
+        start = start or timezone.localdate(min(firsts))
+        end = end or timezone.localdate(max(b['last'] for b in bounds if b['last'] is not None))
+
+    written = 0
+    chunk_start = start
+    while chunk_start <= end:
+        next_month = (chunk_start.replace(day=1) + timedelta(days=32)).replace(day=1)
+        chunk_end = min(end, next_month - timedelta(days=1))
+        written += _rebuild_days(chunk_start, chunk_end)
+        chunk_start = next_month
+
+    _derive('week', period_start(start, 'week'), period_start(end, 'week') + timedelta(days=6))
+    month_end = (period_start(end, 'month') + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+    _derive('month', period_start(start, 'month'), month_end)
+    return written
+
+
+def _day_start(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+@transaction.atomic
+def _rebuild_days(start, end):
+    DonationRollup.objects.filter(granularity='day', period_start__range=(start, end)).delete()
+    buckets = {}
+    for model in RECORD_MODELS:
+        # Filter on the raw column so an index on donation_date can be used
+        rows = (
+            model.objects
+            .filter(
+                donation_date__gte=_day_start(start),
+                donation_date__lt=_day_start(end + timedelta(days=1)),
+            )
+            .annotate(day=TruncDate('donation_date'))
+            .values('day', 'hospital_id', 'schedule__donor__blood_type', 'schedule__donation_type')
+            .annotate(
+                donations=Count('id'),
+                amount=Sum('blood_amount'),
+                lives=Sum('lives_saved'),
+            )
+            .order_by()
+        )
+        for row in rows:
+            key = (
+                row['day'], row['hospital_id'],
+                row['schedule__donor__blood_type'] or 'None', row['schedule__donation_type'],
+            )
+            rollup = buckets.get(key)
+            if rollup is None:
+                rollup = buckets[key] = DonationRollup(
+                    granularity='day',
+                    period_start=key[0],
+                    hospital_id=key[1],
+                    blood_type=key[2],
+                    donation_type=key[3],
+                    donation_count=0,
+                    blood_amount=Decimal('0'),
+                    lives_saved=0,
+                )
+            rollup.donation_count += row['donations']
+            rollup.blood_amount += row['amount'] or 0
+            rollup.lives_saved += row['lives'] or 0
+    DonationRollup.objects.bulk_create(buckets.values(), batch_size=1000)
+    return len(buckets)
+
+
+@transaction.atomic
+def _derive(granularity, start, end):
+    trunc = TruncWeek if granularity == 'week' else TruncMonth
+    DonationRollup.objects.filter(granularity=granularity, period_start__range=(start, end)).delete()
+    rows = (
+        DonationRollup.objects
+        .filter(granularity='day', period_start__range=(start, end))
+        .annotate(period=trunc('period_start'))
+        .values('period', 'hospital_id', 'blood_type', 'donation_type')
+        .annotate(
+            donations=Sum('donation_count'),
+            amount=Sum('blood_amount'),
+            lives=Sum('lives_saved'),
+        )
+        .order_by()
+    )
+    DonationRollup.objects.bulk_create([
+        DonationRollup(
+            granularity=granularity,
+            period_start=row['period'],
+            hospital_id=row['hospital_id'],
+            blood_type=row['blood_type'],
+            donation_type=row['donation_type'],
+            donation_count=row['donations'],
+            blood_amount=row['amount'],
+            lives_saved=row['lives'],
+        )
+        for row in rows
+    ], batch_size=1000)
+
+
+def query(granularity, start, end, hospital_id=None, blood_type=None, donation_type=None, group_by=None):
+    """
+    Return totals per period between ``start`` and ``end`` (inclusive).
+
+    ``group_by`` optionally splits each period by one of DIMENSIONS.
+    """
+    rows = DonationRollup.objects.filter(
+        granularity=granularity,
+        period_start__range=(period_start(start, granularity), end),
+    )
+    if hospital_id is not None:
+        rows = rows.filter(hospital_id=hospital_id)
+    if blood_type:
+        rows = rows.filter(blood_type=blood_type)
+    if donation_type:
+        rows = rows.filter(donation_type=donation_type)
+
+    fields = ['period_start']
+    if group_by:
+        fields.append('hospital_id' if group_by == 'hospital' else group_by)
+
+    rows = rows.values(*fields).annotate(
+        donations=Sum('donation_count'),
+        amount=Sum('blood_amount'),
+        lives=Sum('lives_saved'),
+    ).order_by(*fields)
+
+    series = []
+    for row in rows:
+        point = {
+            'period_start': row['period_start'].isoformat(),
+            'donations': row['donations'],
+            'blood_amount': float(row['amount']),
+            'lives_saved': row['lives'],
+        }
+        if group_by:
+            point[group_by] = row[fields[1]]
+        series.append(point)
+    return series
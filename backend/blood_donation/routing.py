@@ -0,0 +1,205 @@
+"""
+Daily route planning for home-visit donations.
+
+Pending home-visit schedules for a day are grouped into regions, one per
+hospital acting as the depot the nurse teams start from. Each region is
+split between its teams with a sweep around the depot, and every team's
+stops are ordered with nearest-neighbour construction followed by 2-opt.
+
+Regions are independent, so plan_home_visits solves them in a process pool
+started with the ``spawn`` method (forking a process that runs threads, like
+the audit writer, can copy a lock while it is held). Workers only see plain
+tuples; all database access happens in the parent process. The HTTP view
+starts no processes: it solves the regions in the request thread, and they
+share the time budget, so the request ends in about that time.
+"""
+import math
+import os
+import time
+from datetime import datetime, timedelta
+
+import django
+from django.utils import timezone
+
+from .models import DonationSchedule, Hospital
+
+EARTH_RADIUS_KM = 6371.0
+
+# Handing a pool a small day costs more than it saves
+PARALLEL_MIN_STOPS = 500
+
+
+def distance_km(a, b):
+    """Equirectangular approximation, accurate enough at city scale"""
+    lat1, lon1 = math.radians(a[0]), math.radians(a[1])
+    lat2, lon2 = math.radians(b[0]), math.radians(b[1])
+    x = (lon2 - lon1) * math.cos((lat1 + lat2) / 2)
+    y = lat2 - lat1
+    return EARTH_RADIUS_KM * math.hypot(x, y)
+
+
+def _route_length(points, order):
+    return sum(distance_km(points[order[i]], points[order[i + 1]]) for i in range(len(order) - 1))
+
+
+def _nearest_neighbour(points):
+    """Greedy tour starting at index 0 (the depot)"""
+    unvisited = set(range(1, len(points)))
+    order = [0]
+    while unvisited:
+        here = points[order[-1]]
+        nearest = min(unvisited, key=lambda i: distance_km(here, points[i]))
+        unvisited.remove(nearest)
+        order.append(nearest)
+    return order
+
+
+def _two_opt(points, order, deadline):
+    """Reverse segments while that shortens the open route; the depot stays first"""
+    n = len(order)
+    improved = True
+    while improved and time.monotonic() < deadline:
+        improved = False
+        for i in range(1, n - 1):
+            a, b = points[order[i - 1]], points[order[i]]
+            for j in range(i + 1, n):
+                c = points[order[j]]
+                d = points[order[j + 1]] if j + 1 < n else None
+                before = distance_km(a, b) + (distance_km(c, d) if d else 0)
+                after = distance_km(a, c) + (distance_km(b, d) if d else 0)
+                if after < before - 1e-9:
+                    order[i:j + 1] = reversed(order[i:j + 1])
+                    b = points[order[i]]
+                    improved = True
+            if time.monotonic() >= deadline:
+                break
+    return order
+
+
+def _sweep(depot, stops, teams):
+    """Split stops into ``teams`` contiguous angular sectors of similar size"""
+    ordered = sorted(stops, key=lambda stop: math.atan2(stop[1] - depot[0], stop[2] - depot[1]))
+    size = math.ceil(len(ordered) / teams) if ordered else 0
+    return [ordered[i:i + size] for i in range(0, len(ordered), size)] if size else []
+
+
+def solve_region(region):
+    """
+    Plan routes for one region.
+
+    ``region`` is (region_id, depot, stops, teams, time_budget) where depot is
+    (lat, lon) and each stop is (schedule_id, lat, lon). Returns
+    (region_id, [(ordered schedule ids, distance_km), ...]).
+    """
+    region_id, depot, stops, teams, time_budget = region
+    routes = []
+    groups = _sweep(depot, stops, max(1, teams))
+    for group in groups:
+        deadline = time.monotonic() + time_budget / len(groups)
+        points = [depot] + [(lat, lon) for _, lat, lon in group]
+        order = _two_opt(points, _nearest_neighbour(points), deadline)
+        routes.append(([group[i - 1][0] for i in order[1:]], round(_route_length(points, order), 2)))
+    return region_id, routes
+
+
+def _nearest_hospital(point, depots):
+    return min(depots, key=lambda hospital_id: distance_km(point, depots[hospital_id]))
+
+
+def planning_pool(workers=None):
+    """Process pool for plan_routes(); spawned workers set Django up before their first region"""
+    # Imported here to keep multiprocessing out of start-up
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+
+    return ProcessPoolExecutor(
+        max_workers=workers or os.cpu_count(), mp_context=multiprocessing.get_context('spawn'),
+        initializer=django.setup,
+    )
+
+
+def plan_routes(day, teams_per_region=1, pool=None, time_budget=2.0):
+    """
+    Plan the home visits scheduled on ``day``.
+
+    Stops are assigned to their preferred hospital's region when it has
+    coordinates, otherwise to the nearest hospital. Schedules whose donor has
+    no coordinates are returned as unrouted so dispatch can follow up.
+    With ``pool`` (from planning_pool()) each region gets ``time_budget``
+    seconds of improvement; without it the regions share it.
+    """
+    day_start = timezone.make_aware(datetime.combine(day, datetime.min.time()))
+    schedules = (
+        DonationSchedule.objects
+        .filter(
+            donation_type='home', status='pending',
+            scheduled_date__gte=day_start, scheduled_date__lt=day_start + timedelta(days=1),
+        )
+        .select_related('donor__user')
+        .order_by('id')
+    )
+    hospitals = {
+        hospital.id: hospital
+        for hospital in Hospital.objects.filter(latitude__isnull=False, longitude__isnull=False)
+    }
+    depots = {hospital_id: (h.latitude, h.longitude) for hospital_id, h in hospitals.items()}
+
+    by_id = {}
+    regions = {}
+    unrouted = []
+    for schedule in schedules:
+        donor = schedule.donor
+        if donor.latitude is None or donor.longitude is None or not depots:
+            unrouted.append(schedule)
+            continue
+        point = (donor.latitude, donor.longitude)
+        region_id = schedule.preferred_hospital_id
+        if region_id not in depots:
+            region_id = _nearest_hospital(point, depots)
+        regions.setdefault(region_id, []).append((schedule.id, donor.latitude, donor.longitude))
+        by_id[schedule.id] = schedule
+
+    parallel = pool is not None and len(regions) > 1 and len(by_id) >= PARALLEL_MIN_STOPS
+    region_budget = time_budget if parallel else time_budget / max(len(regions), 1)
+    jobs = [
+        (region_id, depots[region_id], stops, teams_per_region, region_budget)
+        for region_id, stops in regions.items()
+    ]
+    if parallel:
+        solved = list(pool.map(solve_region, jobs))
+    else:
+        solved = [solve_region(job) for job in jobs]
+
+    plan = []
+    for region_id, routes in solved:
+        hospital = hospitals[region_id]
+        for team, (schedule_ids, distance) in enumerate(routes, start=1):
+            plan.append({
+                'hospital': {'id': hospital.id, 'name': hospital.name},
+                'team': team,
+                'distance_km': distance,
+                'stops': [_stop(by_id[schedule_id], position) for position, schedule_id in enumerate(schedule_ids, start=1)],
+            })
+
+    return {
+        'date': day.isoformat(),
+        'routes': plan,
+        'unrouted': [_stop(schedule) for schedule in unrouted],
+    }
+
+
+def _stop(schedule, position=None):
+    donor = schedule.donor
+    stop = {
+        'schedule_id': schedule.id,
+        'donor_id': donor.id,
+        'donor_name': f"{donor.user.first_name} {donor.user.last_name}".strip() or donor.user.username,
+        'phone': donor.phone,
+        'location': donor.location,
+        'latitude': donor.latitude,
+        'longitude': donor.longitude,
+        'scheduled_date': schedule.scheduled_date.isoformat(),
+    }
+    if position is not None:
+        stop['position'] = position
+    return stop
@@ -0,0 +1,236 @@
+"""
+Full-text search over donors, hospitals and blood requests.
+
+Each searchable object is flattened into a SearchDocument row, which the
+database indexes natively: an FTS5 external-content table on SQLite and
+tsvector/trigram GIN indexes on Postgres (see migration 0013). Documents are
+refreshed from model signals, so the index follows every save and delete.
+Migration 0024 indexed the rows that existed before the index did.
+
+Note for SQLite: the FTS5 triggers live on the SearchDocument table, so a
+future migration that rebuilds that table must recreate them.
+"""
+import re
+
+from django.db import connections, router
+from django.db.models.signals import post_delete, post_save
+
+from .models import BloodRequest, Donor, Hospital, SearchDocument, User
+
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def _digits(value):
+    return re.sub(r'\D', '', value or '')
+
+
+def donor_document(donor):
+    user = donor.user
+    title = f"{user.first_name} {user.last_name}".strip() or user.username
+    content = ' '.join(filter(None, [
+        user.username, user.email, user.email.split('@')[0] if user.email else '',
+        donor.phone, _digits(donor.phone), donor.location, donor.blood_type,
+    ]))
+    return title, content
+
+
+def hospital_document(hospital):
+    return hospital.name, hospital.location
+
+
+def blood_request_document(blood_request):
+    content = ' '.join(filter(None, [
+        blood_request.hospital_name, blood_request.hospital_location,
+        blood_request.contact_phone, _digits(blood_request.contact_phone),
+        blood_request.blood_type, blood_request.urgency, blood_request.reason,
+    ]))
+    return blood_request.patient_name, content
+
+
+DOCUMENT_BUILDERS = {
+    'donor': (Donor, donor_document),
+    'hospital': (Hospital, hospital_document),
+    'blood_request': (BloodRequest, blood_request_document),
+}
+
+
+def index_object(kind, obj):
+    title, content = DOCUMENT_BUILDERS[kind][1](obj)
+    SearchDocument.objects.update_or_create(
+        kind=kind, object_id=obj.pk, defaults={'title': title[:255], 'content': content}
+    )
+
+
+def index_many(kind, objects):
+    """Index objects created with bulk_create, which sends no post_save signals"""
+    build = DOCUMENT_BUILDERS[kind][1]
+    documents = []
+    for obj in objects:
+        title, content = build(obj)
+        documents.append(SearchDocument(kind=kind, object_id=obj.pk, title=title[:255], content=content))
+    SearchDocument.objects.bulk_create(documents, batch_size=1000)
+
+
+def remove_object(kind, object_id):
+    SearchDocument.objects.filter(kind=kind, object_id=object_id).delete()
+
+
+def rebuild(batch_size=2000, apps=None):
+    """Re-create every search document; returns the number indexed. Migrations pass their ``apps``."""
+    document_model = apps.get_model('blood_donation', 'SearchDocument') if apps else SearchDocument
+    document_model.objects.all().delete()
+    total = 0
+    for kind, (model, build) in DOCUMENT_BUILDERS.items():
+        if apps:
+            model = apps.get_model('blood_donation', model.__name__)
+        queryset = model.objects.order_by('pk')
+        if kind == 'donor':
+            queryset = queryset.select_related('user')
+        batch = []
+        for obj in queryset.iterator(chunk_size=batch_size):
+            title, content = build(obj)
+            batch.append(document_model(kind=kind, object_id=obj.pk, title=title[:255], content=content))
+            if len(batch) >= batch_size:
+                document_model.objects.bulk_create(batch)
+                total += len(batch)
+                batch = []
+        document_model.objects.bulk_create(batch)
+        total += len(batch)
+    return total
+
+
+def _tokens(query):
+    return TOKEN_RE.findall(query.lower())[:10]
+
+
+def _search_sqlite(connection, tokens, kind, limit, offset):
+    match = ' '.join(f'"{token}"*' for token in tokens)
+    where = "blood_donation_search_fts MATCH %s"
+    params = [match]
+    if kind:
+        where += " AND d.kind = %s"
+        params.append(kind)
+    base = (
+        "FROM blood_donation_search_fts "
+        "JOIN blood_donation_searchdocument d ON d.id = blood_donation_search_fts.rowid "
+        f"WHERE {where}"
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(f"SELECT COUNT(*) {base}", params)
+        count = cursor.fetchone()[0]
+        # bm25 scores are negative; smaller is better. Titles weigh more than other text.
+        cursor.execute(
+            f"SELECT d.kind, d.object_id, d.title, -bm25(blood_donation_search_fts, 10.0, 1.0) AS score {base} "
+            "ORDER BY bm25(blood_donation_search_fts, 10.0, 1.0) LIMIT %s OFFSET %s",
+            params + [limit, offset],
+        )
+        rows = cursor.fetchall()
+    return count, rows
+
+
+def _search_postgres(connection, tokens, kind, limit, offset):
+    tsquery = ' & '.join(f'{token}:*' for token in tokens)
+    document = "(title || ' ' || content)"
+    where = f"(to_tsvector('simple', {document}) @@ to_tsquery('simple', %s) OR {document} %% %s)"
+    params = [tsquery, ' '.join(tokens)]
+    if kind:
+        where += " AND kind = %s"
+        params.append(kind)
+    with connection.cursor() as cursor:
+        cursor.execute(f"SELECT COUNT(*) FROM blood_donation_searchdocument WHERE {where}", params)
+        count = cursor.fetchone()[0]
+        cursor.execute(
+            "SELECT kind, object_id, title, "
+            f"ts_rank_cd(setweight(to_tsvector('simple', title), 'A') || to_tsvector('simple', content), "
+            f"to_tsquery('simple', %s)) + similarity({document}, %s) AS score "
+            f"FROM blood_donation_searchdocument WHERE {where} "
+            "ORDER BY score DESC LIMIT %s OFFSET %s",
+            [tsquery, ' '.join(tokens)] + params + [limit, offset],
+        )
+        rows = cursor.fetchall()
+    return count, rows
+
+
+def _search_fallback(connection, tokens, kind, limit, offset):
+    documents = SearchDocument.objects.using(connection.alias)
+    if kind:
+        documents = documents.filter(kind=kind)
+    for token in tokens:
+        documents = documents.filter(title__icontains=token) | documents.filter(content__icontains=token)
+    count = documents.count()
+    rows = documents.order_by('title').values_list('kind', 'object_id', 'title')[offset:offset + limit]
+    return count, [(row_kind, object_id, title, 0.0) for row_kind, object_id, title in rows]
+
+
+def search(query, kind=None, limit=20, offset=0):
+    """
+    Ranked prefix search. Every word in ``query`` must match the start of a
+    word in the document. Returns (total_count, [result dicts]).
+    """
+    tokens = _tokens(query)
+    if not tokens:
+        return 0, []
+    connection = connections[router.db_for_read(SearchDocument)]
+    if connection.vendor == 'sqlite':
+        backend = _search_sqlite
+    elif connection.vendor == 'postgresql':
+        backend = _search_postgres
+    else:
+        backend = _search_fallback
+    count, rows = backend(connection, tokens, kind, limit, offset)
+    return count, [
+        {'kind': row_kind, 'id': object_id, 'title': title, 'score': round(float(score), 4)}
+        for row_kind, object_id, title, score in rows
+    ]
+
+
+def matching_ids(kind, query, limit=1000):
+    """Ids of the best ``limit`` objects of ``kind`` matching ``query``, for narrowing admin changelists"""
+    return [result['id'] for result in search(query, kind=kind, limit=limit)[1]]
+
+
+# Signal handlers keep documents in step with the source rows
+
+def _on_donor_saved(sender, instance, **kwargs):
+    index_object('donor', instance)
+
+
+INDEXED_USER_FIELDS = {'username', 'email', 'first_name', 'last_name'}
+
+
+def _on_user_saved(sender, instance, created, update_fields=None, **kwargs):
+    # New users have no donor yet, and logins only touch last_login
+    if created or (update_fields and not INDEXED_USER_FIELDS & set(update_fields)):
+        return
+    donor = Donor.objects.filter(user=instance).select_related('user').first()
+    if donor:
+        index_object('donor', donor)
+
+
+def _on_hospital_saved(sender, instance, **kwargs):
+    index_object('hospital', instance)
+
+
+def _on_blood_request_saved(sender, instance, **kwargs):
+    index_object('blood_request', instance)
+
+
+def _removal_handler(kind):
+    def handler(sender, instance, **kwargs):
+        remove_object(kind, instance.pk)
+    return handler
+
+
+_remove_donor = _removal_handler('donor')
+_remove_hospital = _removal_handler('hospital')
+_remove_blood_request = _removal_handler('blood_request')
+
+
+def connect_signals():
+    post_save.connect(_on_donor_saved, sender=Donor, dispatch_uid='search_donor_saved')
+    post_save.connect(_on_user_saved, sender=User, dispatch_uid='search_user_saved')
+    post_save.connect(_on_hospital_saved, sender=Hospital, dispatch_uid='search_hospital_saved')
+    post_save.connect(_on_blood_request_saved, sender=BloodRequest, dispatch_uid='search_blood_request_saved')
+    post_delete.connect(_remove_donor, sender=Donor, dispatch_uid='search_donor_deleted')
+    post_delete.connect(_remove_hospital, sender=Hospital, dispatch_uid='search_hospital_deleted')
+    post_delete.connect(_remove_blood_request, sender=BloodRequest, dispatch_uid='search_blood_request_deleted')
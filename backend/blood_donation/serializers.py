@@ -1,7 +1,12 @@
 from rest_framework import serializers
 from django.contrib.auth.password_validation import validate_password
+from django.core.exceptions import ValidationError as DjangoValidationError
 from django.contrib.auth import authenticate
-from .models import User, Donor, Hospital, DonationSchedule, DonationRecord, BloodRequest
+from .models import (
+    User, Donor, Hospital, DonationSchedule, DonationRecord, BloodRequest, ArchivedDonationSchedule,
+)
+from . import expiry
+from .sparse import SparseFieldsMixin
 
 
 class UserRegistrationSerializer(serializers.ModelSerializer):
@@ -25,28 +30,66 @@ class UserRegistrationSerializer(serializers.ModelSerializer):
     
     def create(self, validated_data):
         validated_data.pop('password2')
-        password = validated_data.pop('password')
-        user = User.objects.create_user(**validated_data)
-        user.set_password(password)
-        user.save()
-        return user
+        # One hash and one INSERT; hashing dominates registration time
+        return User.objects.create_user(**validated_data)
 
 
-class UserSerializer(serializers.ModelSerializer):
+class DonorOnboardingListSerializer(serializers.ListSerializer):
+    """Checks a whole onboarding batch for taken usernames with one query"""
+    
+    def validate(self, attrs):
+        usernames = [entry['username'] for entry in attrs]
+        repeated = sorted({name for name in usernames if usernames.count(name) > 1})
+        if repeated:
+            raise serializers.ValidationError({'username': f"Repeated in the batch: {', '.join(repeated)}"})
+        taken = sorted(User.objects.filter(username__in=usernames).values_list('username', flat=True))
+        if taken:
+            raise serializers.ValidationError({'username': f"Already registered: {', '.join(taken)}"})
+        return attrs
+
+
+class DonorOnboardingSerializer(serializers.Serializer):
+    """One donor signed up at a blood drive; without a password the donor sets one later"""
+    username = serializers.RegexField(r'^[\w.@+-]+\Z', max_length=150)
+    email = serializers.EmailField()
+    first_name = serializers.CharField(max_length=150)
+    last_name = serializers.CharField(max_length=150)
+    password = serializers.CharField(required=False, write_only=True)
+    phone = serializers.CharField(max_length=20, required=False, allow_blank=True, default='')
+    location = serializers.CharField(max_length=255, required=False, allow_blank=True, default='')
+    blood_type = serializers.ChoiceField(choices=Donor.BLOOD_TYPE_CHOICES, required=False, allow_null=True, default=None)
+    age = serializers.IntegerField(min_value=18, max_value=100, required=False, allow_null=True, default=None)
+    
+    class Meta:
+        list_serializer_class = DonorOnboardingListSerializer
+    
+    def validate(self, attrs):
+        if attrs.get('password'):
+            user = User(username=attrs['username'], email=attrs['email'],
+                        first_name=attrs['first_name'], last_name=attrs['last_name'])
+            try:
+                validate_password(attrs['password'], user)
+            except DjangoValidationError as exc:
+                raise serializers.ValidationError({'password': list(exc.messages)})
+        return attrs
+
+
+class UserSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """Basic user serializer"""
     class Meta:
         model = User
         fields = ('id', 'username', 'email', 'first_name', 'last_name', 'role')
 
 
-class DonorProfileSerializer(serializers.ModelSerializer):
+class DonorProfileSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """Serializer for donor profile"""
     user = UserSerializer(read_only=True)
     profile_image_url = serializers.SerializerMethodField()
+    sparse_sources = {'profile_image_url': ('profile_image',)}
     
     class Meta:
         model = Donor
-        fields = ('id', 'user', 'age', 'weight', 'phone', 'location', 'blood_type', 'health_info', 
+        fields = ('id', 'user', 'age', 'weight', 'phone', 'location', 'latitude', 'longitude', 'blood_type', 'health_info', 
                   'profile_image', 'profile_image_url', 'total_donations', 
                   'lives_saved', 'created_at', 'updated_at')
         read_only_fields = ('total_donations', 'lives_saved', 'created_at', 'updated_at')
@@ -64,12 +107,14 @@ class DonorCreateUpdateSerializer(serializers.ModelSerializer):
     """Serializer for creating/updating donor profile"""
     class Meta:
         model = Donor
-        fields = ('age', 'weight', 'phone', 'location', 'blood_type', 'health_info', 'profile_image')
+        fields = ('age', 'weight', 'phone', 'location', 'latitude', 'longitude', 'blood_type', 'health_info', 'profile_image')
         extra_kwargs = {
             'age': {'required': False, 'allow_null': True},
             'weight': {'required': False, 'allow_null': True},
             'phone': {'required': False, 'allow_blank': True},
             'location': {'required': False, 'allow_blank': True},
+            'latitude': {'required': False, 'allow_null': True},
+            'longitude': {'required': False, 'allow_null': True},
             'blood_type': {'required': False, 'allow_null': True, 'allow_blank': True},
         }
     
@@ -81,23 +126,41 @@ class DonorCreateUpdateSerializer(serializers.ModelSerializer):
         return value
 
 
-class HospitalSerializer(serializers.ModelSerializer):
+class HospitalSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """Serializer for hospital"""
+    # A number like the other totals, not DRF's default decimal string
+    total_blood_received = serializers.DecimalField(max_digits=12, decimal_places=2, read_only=True,
+                                                    coerce_to_string=False)
+    
     class Meta:
         model = Hospital
-        fields = ('id', 'name', 'location', 'total_blood_received', 
+        fields = ('id', 'name', 'location', 'latitude', 'longitude', 'total_blood_received', 
                   'total_lives_saved', 'created_at', 'updated_at')
         read_only_fields = ('total_blood_received', 'total_lives_saved', 
                            'created_at', 'updated_at')
 
 
-class DonationScheduleSerializer(serializers.ModelSerializer):
+def _record_summary(record):
+    """Record of a live or archived schedule; the id is what certificates are looked up by"""
+    return {
+        'id': record.id,
+        'hospital': {
+            'id': record.hospital.id,
+            'name': record.hospital.name,
+        } if record.hospital else None,
+        'donation_date': record.donation_date,
+        'blood_amount': str(record.blood_amount),
+    }
+
+
+class DonationScheduleSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """Serializer for donation schedule"""
     donor = DonorProfileSerializer(read_only=True)
     donor_id = serializers.IntegerField(write_only=True, required=False)
     preferred_hospital = HospitalSerializer(read_only=True)
     preferred_hospital_id = serializers.IntegerField(write_only=True, required=False, allow_null=True)
     record = serializers.SerializerMethodField()
+    sparse_sources = {'record': ('record', 'record__hospital')}
     
     class Meta:
         model = DonationSchedule
@@ -106,18 +169,7 @@ class DonationScheduleSerializer(serializers.ModelSerializer):
         read_only_fields = ('status', 'created_at', 'updated_at')
     
     def get_record(self, obj):
-        if hasattr(obj, 'record'):
-            record = obj.record
-            return {
-                'id': record.id,
-                'hospital': {
-                    'id': record.hospital.id if record.hospital else None,
-                    'name': record.hospital.name if record.hospital else None,
-                } if record.hospital else None,
-                'donation_date': record.donation_date,
-                'blood_amount': str(record.blood_amount),
-            }
-        return None
+        return _record_summary(obj.record) if hasattr(obj, 'record') else None
     
     def create(self, validated_data):
         # Remove donor_id if present, donor will be set from request user
@@ -141,7 +193,23 @@ class DonationScheduleCreateSerializer(serializers.ModelSerializer):
         return super().create(validated_data)
 
 
-class DonationRecordSerializer(serializers.ModelSerializer):
+class ArchivedDonationScheduleSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    """Serializer for an archived schedule, shaped like DonationScheduleSerializer"""
+    preferred_hospital = HospitalSerializer(read_only=True)
+    record = serializers.SerializerMethodField()
+    sparse_sources = {'record': ('record', 'record__hospital')}
+    
+    class Meta:
+        model = ArchivedDonationSchedule
+        fields = ('id', 'preferred_hospital', 'scheduled_date', 'donation_type', 'status', 'record',
+                  'created_at', 'updated_at', 'archived_at')
+        read_only_fields = fields
+    
+    def get_record(self, obj):
+        return _record_summary(obj.record) if hasattr(obj, 'record') else None
+
+
+class DonationRecordSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """Serializer for donation record"""
     schedule_id = serializers.IntegerField(source='schedule.id', read_only=True)
     hospital = HospitalSerializer(read_only=True)
@@ -176,11 +244,17 @@ class LoginSerializer(serializers.Serializer):
         return attrs
 
 
-class BloodRequestSerializer(serializers.ModelSerializer):
+class BloodRequestSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """Serializer for blood requests"""
     requester_name = serializers.ReadOnlyField(source='requester.username')
+    expires_at = serializers.SerializerMethodField()
+    sparse_sources = {'expires_at': ('urgency', 'created_at')}
     
     class Meta:
         model = BloodRequest
         fields = '__all__'
-        read_only_fields = ('requester', 'created_at', 'is_fulfilled')
+        read_only_fields = ('requester', 'created_at', 'is_fulfilled', 'expired_at')
+    
+    def get_expires_at(self, obj):
+        # Same format as created_at
+        return serializers.DateTimeField().to_representation(expiry.expires_at(obj))
@@ -0,0 +1,133 @@
+"""
+Capacity-aware appointment slots.
+
+SlotCapacity rows describe a hospital's weekly opening pattern. They are
+materialized into AppointmentSlot rows, one per bookable time, each carrying
+its own ``booked`` counter. Booking is a single conditional UPDATE on that
+counter row, so concurrent bookers for the last seat serialize on the row
+lock and at most ``capacity`` of them succeed.
+
+Rows are created ahead of time by generate_slots and, for days it has not
+reached yet, by reserve() on the first booking. open_slots() therefore
+answers from the weekly pattern overlaid with the rows that exist, so it
+lists every time reserve() would accept.
+"""
+from datetime import datetime, timedelta
+
+from django.db.models import F
+from django.utils import timezone
+
+from .models import AppointmentSlot, SlotCapacity
+
+# A slot lies within one day, so stored slots covering the start of a range begin at most this early
+MAX_SLOT_LENGTH = timedelta(hours=24)
+# open_slots() builds unsaved slots in memory, so its range is bounded
+MAX_RANGE_DAYS = 62
+
+
+class SlotUnavailable(Exception):
+    """Raised when a requested appointment time cannot be booked"""
+
+
+def _planned(start_date, end_date, hospital_ids=None):
+    """Unsaved AppointmentSlot for every slot SlotCapacity defines on the days in [start_date, end_date]"""
+    capacities = SlotCapacity.objects.all()
+    if hospital_ids is not None:
+        capacities = capacities.filter(hospital_id__in=hospital_ids)
+    by_weekday = {}
+    for capacity in capacities:
+        by_weekday.setdefault(capacity.weekday, []).append(capacity)
+
+    slots = []
+    day = start_date
+    while day <= end_date:
+        for capacity in by_weekday.get(day.weekday(), []):
+            starts_at = timezone.make_aware(datetime.combine(day, capacity.start_time))
+            closes_at = timezone.make_aware(datetime.combine(day, capacity.end_time))
+            step = timedelta(minutes=capacity.slot_minutes)
+            while starts_at + step <= closes_at:
+                slots.append(AppointmentSlot(
+                    hospital_id=capacity.hospital_id,
+                    starts_at=starts_at,
+                    ends_at=starts_at + step,
+                    capacity=capacity.capacity,
+                ))
+                starts_at += step
+        day += timedelta(days=1)
+    return slots
+
+
+def generate_slots(start_date, end_date, hospital_ids=None):
+    """
+    Materialize slots for every day in [start_date, end_date] from SlotCapacity.
+
+    Existing slots are left untouched, so this is safe to run repeatedly.
+    Returns the number of slots considered.
+    """
+    slots = _planned(start_date, end_date, hospital_ids)
+    AppointmentSlot.objects.bulk_create(slots, batch_size=1000, ignore_conflicts=True)
+    return len(slots)
+
+
+def open_slots(hospital_id, start, end):
+    """
+    Slots with free seats starting in [start, end), soonest first.
+
+    Stored slots come from the (hospital, starts_at) index. Times that have
+    no row yet are added from SlotCapacity unsaved (``pk`` None, nothing
+    booked), unless a stored slot already covers them, as reserve() would
+    book that one instead.
+    """
+    stored = list(
+        AppointmentSlot.objects
+        .filter(hospital_id=hospital_id, starts_at__gte=start - MAX_SLOT_LENGTH, starts_at__lt=end)
+        .order_by('starts_at')
+    )
+    planned = [
+        slot for slot in _planned(timezone.localdate(start), timezone.localdate(end), [hospital_id])
+        if start <= slot.starts_at < end
+        and not any(row.starts_at <= slot.starts_at < row.ends_at for row in stored)
+    ]
+    slots = [row for row in stored if row.starts_at >= start and row.booked < row.capacity] + planned
+    return sorted(slots, key=lambda slot: slot.starts_at)
+
+
+def hospital_uses_slots(hospital_id):
+    return SlotCapacity.objects.filter(hospital_id=hospital_id).exists()
+
+
+def _slot_at(hospital_id, when):
+    return (
+        AppointmentSlot.objects
+        .filter(hospital_id=hospital_id, starts_at__lte=when, ends_at__gt=when)
+        .order_by('-starts_at')
+        .first()
+    )
+
+
+def reserve(hospital_id, when):
+    """
+    Take one seat in the slot covering ``when``.
+
+    Must run inside the transaction that creates the schedule so a failed
+    insert gives the seat back. Raises SlotUnavailable when there is no slot
+    at that time or the slot is full.
+    """
+    slot = _slot_at(hospital_id, when)
+    if slot is None:
+        generate_slots(timezone.localdate(when), timezone.localdate(when), hospital_ids=[hospital_id])
+        slot = _slot_at(hospital_id, when)
+    if slot is None:
+        raise SlotUnavailable('The hospital has no appointment slot at that time.')
+
+    taken = AppointmentSlot.objects.filter(pk=slot.pk, booked__lt=F('capacity')).update(booked=F('booked') + 1)
+    if not taken:
+        raise SlotUnavailable('This appointment slot is fully booked. Please choose another time.')
+    return slot
+
+
+def release(slot_id):
+    """Give back the seat held by a schedule that will no longer take place"""
+    if slot_id is None:
+        return
+    AppointmentSlot.objects.filter(pk=slot_id, booked__gt=0).update(booked=F('booked') - 1)
@@ -0,0 +1,166 @@
+"""
+Sparse fieldsets for GET responses.
+
+``?fields=id,scheduled_date,donor.blood_type`` keeps only the listed fields.
+Dotted names pick fields inside nested objects. Once ``fields`` is given, a
+nested object that is listed without any dotted sub-fields comes back as its
+id, unless it is also named in ``?expand=`` (e.g. ``expand=donor,donor.user``).
+Without ``fields`` responses are unchanged.
+
+SparseQuerysetMixin trims a view's queryset to match. It keeps only the
+select_related() joins and only() columns that the remaining fields read.
+"""
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework import serializers
+
+FIELDS_PARAM = 'fields'
+EXPAND_PARAM = 'expand'
+
+
+def parse_tree(value):
+    """'a,b.c,b.d' -> {'a': {}, 'b': {'c': {}, 'd': {}}}"""
+    tree = {}
+    for path in (value or '').split(','):
+        node = tree
+        for part in filter(None, path.strip().split('.')):
+            node = node.setdefault(part, {})
+    return tree
+
+
+def request_spec(request):
+    """(fields tree or None, expand tree) for a GET request, or None when no sparse parameters are set"""
+    if request is None or request.method != 'GET':
+        return None
+    params = getattr(request, 'query_params', request.GET)
+    if FIELDS_PARAM not in params and EXPAND_PARAM not in params:
+        return None
+    fields = parse_tree(params[FIELDS_PARAM]) if FIELDS_PARAM in params else None
+    return fields, parse_tree(params.get(EXPAND_PARAM))
+
+
+def _nested(field):
+    """The serializer behind a nested field (unwrapping many=True), or None"""
+    if isinstance(field, serializers.ListSerializer):
+        field = field.child
+    return field if isinstance(field, serializers.BaseSerializer) else None
+
+
+class SparseFieldsMixin:
+    """Serializer mixin that applies ?fields= and ?expand= (see module docstring)"""
+
+    def _is_root(self):
+        parent = self.parent
+        return parent is None or (isinstance(parent, serializers.ListSerializer) and parent.parent is None)
+
+    def get_fields(self):
+        fields = super().get_fields()
+        # Nested serializers get their part of the spec from the parent below
+        spec = getattr(self, '_sparse_spec', None)
+        if spec is None and self._is_root():
+            spec = request_spec(self.context.get('request'))
+        if spec is None:
+            return fields
+
+        wanted, expand = spec
+        if wanted is not None:
+            fields = {name: field for name, field in fields.items() if name in wanted}
+        for name, field in list(fields.items()):
+            nested = _nested(field)
+            if nested is None:
+                continue
+            sub_fields = wanted.get(name) if wanted is not None else None
+            if wanted is not None and not sub_fields and name not in expand:
+                fields[name] = serializers.PrimaryKeyRelatedField(
+                    source=field.source, read_only=True, many=isinstance(field, serializers.ListSerializer),
+                )
+            else:
+                nested._sparse_spec = (sub_fields or None, expand.get(name, {}))
+        return fields
+
+
+def _model_field(model, name):
+    try:
+        return model._meta.get_field(name)
+    except FieldDoesNotExist:
+        return None
+
+
+# Paths are built as 'donor__user__'; prefix[:-2] is the relation path itself
+# ('' for the queryset's own model).
+
+def _require(model, prefix, path, related, columns, unrestricted):
+    """Record what reading ``path`` (a__b__c) from ``model`` needs"""
+    for part in path.split('__'):
+        field = _model_field(model, part)
+        if field is None or field.many_to_many or field.one_to_many:
+            # Not a plain attribute chain we can plan for; load this model in full
+            unrestricted.add(prefix[:-2])
+            return
+        if not field.is_relation:
+            columns.add(prefix + part)
+            return
+        if field.concrete:
+            columns.add(prefix + part)
+        related.add(prefix + part)
+        prefix, model = f'{prefix}{part}__', field.related_model
+    unrestricted.add(prefix[:-2])
+
+
+def _plan(serializer, model, prefix, related, columns, unrestricted):
+    """Collect select_related paths and only() columns the serializer's readable fields need"""
+    # Computed fields declare which attributes they read
+    hints = getattr(serializer, 'sparse_sources', {})
+    for name, field in serializer.fields.items():
+        if field.write_only:
+            continue
+        if name in hints:
+            for path in hints[name]:
+                _require(model, prefix, path, related, columns, unrestricted)
+            continue
+        if field.source == '*' or isinstance(field, serializers.SerializerMethodField):
+            unrestricted.add(prefix[:-2])
+            continue
+        parts = field.source.split('.')
+        model_field = _model_field(model, parts[0])
+        nested = _nested(field)
+        if nested is not None and model_field is not None and model_field.is_relation:
+            if model_field.concrete:
+                columns.add(prefix + parts[0])
+            related.add(prefix + parts[0])
+            _plan(nested, model_field.related_model, f'{prefix}{parts[0]}__', related, columns, unrestricted)
+        elif model_field is not None and model_field.concrete and (
+                (len(parts) == 1 and isinstance(field, serializers.PrimaryKeyRelatedField))
+                or (len(parts) == 2 and parts[1] in ('id', 'pk'))):
+            # The foreign key value is already on this row
+            columns.add(prefix + parts[0])
+        else:
+            _require(model, prefix, '__'.join(parts), related, columns, unrestricted)
+
+
+def trim_queryset(queryset, serializer):
+    """Restrict ``queryset`` to the joins and columns ``serializer`` reads"""
+    related, columns, unrestricted = set(), set(), set()
+    _plan(serializer, queryset.model, '', related, columns, unrestricted)
+    queryset = queryset.select_related(None)
+    if related:
+        queryset = queryset.select_related(*sorted(related))
+    if '' in unrestricted:
+        return queryset
+    # only() has to name every column of the relations that are loaded in full
+    for path in unrestricted:
+        model = queryset.model
+        for part in path.split('__'):
+            model = model._meta.get_field(part).related_model
+        columns.update(f'{path}__{field.name}' for field in model._meta.concrete_fields)
+    return queryset.only(*sorted(columns))
+
+
+class SparseQuerysetMixin:
+    """Generic view mixin: trim the view's queryset to the requested ?fields="""
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        spec = request_spec(self.request)
+        if spec is None or spec[0] is None:
+            return queryset
+        return trim_queryset(queryset, self.get_serializer())
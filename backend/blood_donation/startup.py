@@ -0,0 +1,219 @@
+"""
+Cold start: profiling it and warming a process up.
+
+After the free-tier instance spins down, the first request pays for the
+whole boot: importing Django, DRF and our modules, AppConfig.ready hooks,
+building the middleware chain, importing the views, and the first database
+connection. profile() boots the app in a fresh interpreter under
+``python -X importtime`` and reports the cost of each phase, of each app's
+ready(), and of every imported module. The startup_profile command prints
+that report, and benchmarks/cold_start.py fails when cold start exceeds its
+budget.
+
+warm_up() pays the rest of the boot before the first request arrives. The
+gunicorn config calls it when WARMUP_ON_START is set.
+
+Only the standard library is imported at module level. Django is imported
+inside the functions, so that measuring a fresh process does not pull in
+half of the app before the clock starts.
+"""
+import json
+import logging
+import os
+import subprocess
+import sys
+import time
+from io import BytesIO
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+# Modules a cold API request never needs (warm_up() does load the admin)
+LAZY_MODULES = ('PIL', 'blood_donation.admin')
+CHILD = 'import sys; from blood_donation.startup import measure; measure(sys.argv[1])'
+
+
+def _ms(started):
+    return round((time.perf_counter() - started) * 1000, 1)
+
+
+def connect_databases(barrier=None):
+    """
+    Open this thread's connection to every database; returns the aliases that failed.
+
+    Connections are per thread, so a threaded server calls this once on each
+    request thread. The optional ``barrier`` holds every call until all have
+    started, which keeps two calls from running on the same thread.
+    """
+    from django.db import DatabaseError, connections
+
+    if barrier is not None:
+        barrier.wait()
+    failed = []
+    for alias in connections:
+        try:
+            connections[alias].ensure_connection()
+        except DatabaseError as exc:
+            # The first request reports it properly; the worker must still boot
+            logger.warning('Warm-up could not connect to database %s: %s', alias, exc)
+            failed.append(alias)
+    return failed
+
+
+def warm_up(connect=True):
+    """Do what the first requests of a process would do anyway; returns the time per step in ms"""
+    from django.conf import settings
+    from django.contrib.auth.hashers import get_hashers
+    from django.core.cache import caches
+    from django.urls import get_resolver
+
+    timings = {}
+    started = time.perf_counter()
+    # Imports the views and builds the map reverse() uses, which loads the admin URLs as well
+    get_resolver().reverse_dict
+    timings['urls'] = _ms(started)
+
+    started = time.perf_counter()
+    get_hashers()
+    for alias in settings.CACHES:
+        caches[alias].get('warm-up')
+    timings['caches'] = _ms(started)
+
+    if connect:
+        started = time.perf_counter()
+        connect_databases()
+        timings['databases'] = _ms(started)
+    return timings
+
+
+def request(application, path, token=None):
+    """Send a GET for ``path`` straight to the WSGI ``application``; returns the status code"""
+    from django.conf import settings
+
+    path, _, query = path.partition('?')
+    host = next((host for host in settings.ALLOWED_HOSTS if host != '*' and not host.startswith('.')), 'localhost')
+    environ = {
+        'REQUEST_METHOD': 'GET', 'PATH_INFO': path, 'QUERY_STRING': query, 'SCRIPT_NAME': '',
+        'SERVER_NAME': host, 'SERVER_PORT': '80', 'HTTP_HOST': host, 'SERVER_PROTOCOL': 'HTTP/1.1',
+        'REMOTE_ADDR': '127.0.0.1', 'wsgi.version': (1, 0), 'wsgi.url_scheme': 'http',
+        'wsgi.input': BytesIO(), 'wsgi.errors': sys.stderr, 'wsgi.multithread': False,
+        'wsgi.multiprocess': True, 'wsgi.run_once': False,
+    }
+    if token:
+        environ['HTTP_AUTHORIZATION'] = f'Bearer {token}'
+    statuses = []
+    body = application(environ, lambda status, headers, exc_info=None: statuses.append(status))
+    try:
+        for _chunk in body:
+            pass
+    finally:
+        if hasattr(body, 'close'):
+            body.close()
+    return int(statuses[0].split()[0])
+
+
+def measure(options):
+    """
+    Child side of profile(): boot the app phase by phase and print the timings as JSON.
+
+    ``options`` is the JSON profile() passes on the command line.
+    """
+    options = json.loads(options)
+    phases = {}
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+    from django.apps.config import AppConfig
+
+    ready = {}
+    create = AppConfig.create.__func__
+
+    def timed_create(cls, entry):
+        app_config = create(cls, entry)
+        app_ready = app_config.ready
+
+        def timed_ready():
+            started = time.perf_counter()
+            app_ready()
+            ready[app_config.label] = _ms(started)
+
+        app_config.ready = timed_ready
+        return app_config
+
+    AppConfig.create = classmethod(timed_create)
+
+    started = time.perf_counter()
+    from django.conf import settings
+    settings.INSTALLED_APPS
+    phases['settings'] = _ms(started)
+
+    started = time.perf_counter()
+    import django
+    django.setup(set_prefix=False)
+    phases['apps'] = _ms(started)
+
+    started = time.perf_counter()
+    from django.core.wsgi import get_wsgi_application
+    application = get_wsgi_application()
+    phases['wsgi'] = _ms(started)
+
+    if options['warm_up']:
+        started = time.perf_counter()
+        warm_up()
+        phases['warm_up'] = _ms(started)
+
+    started = time.perf_counter()
+    status = request(application, options['path'], options['token'])
+    phases['first_request'] = _ms(started)
+    cold_start = round((time.time() - options['launched']) * 1000, 1)
+
+    started = time.perf_counter()
+    request(application, options['path'], options['token'])
+    phases['second_request'] = _ms(started)
+
+    print(json.dumps({
+        'cold_start_ms': cold_start, 'status': status, 'phases': phases, 'ready': ready,
+        'loaded': [name for name in LAZY_MODULES if name in sys.modules],
+    }))
+
+
+def parse_importtime(output):
+    """[(module, self ms, cumulative ms), ...] from ``python -X importtime`` output"""
+    modules = []
+    for line in output.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        own, cumulative, name = line[len('import time:'):].split('|')
+        if own.strip().isdigit():  # Skips the header line
+            modules.append((name.strip(), int(own) / 1000, int(cumulative) / 1000))
+    return modules
+
+
+def profile(path='/api/hospitals/', token=None, warm_up=False, env=None):
+    """
+    Boot the app in a fresh interpreter and GET ``path`` twice.
+
+    Returns a dict with ``cold_start_ms`` (from launching the interpreter to
+    the first response), ``status``, ``phases`` and ``ready`` (ms), ``loaded``
+    (members of LAZY_MODULES that got imported) and ``imports``, as returned
+    by parse_importtime(). ``env`` replaces the environment of the child.
+    """
+    options = {'path': path, 'token': token, 'warm_up': warm_up, 'launched': time.time()}
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', CHILD, json.dumps(options)],
+        cwd=BACKEND_DIR, env=env if env is not None else os.environ, capture_output=True, text=True,
+    )
+    errors = [line for line in result.stderr.splitlines() if not line.startswith('import time:')]
+    if result.returncode:
+        raise RuntimeError('Start-up failed:\n' + '\n'.join(errors[-20:]))
+    report = json.loads(result.stdout.splitlines()[-1])
+    report['imports'] = parse_importtime(result.stderr)
+    return report
+
+
+def by_package(imports):
+    """Own import time per top-level package in ms, largest first"""
+    totals = {}
+    for name, own, _cumulative in imports:
+        package = name.split('.')[0]
+        totals[package] = totals.get(package, 0) + own
+    return sorted(totals.items(), key=lambda item: -item[1])
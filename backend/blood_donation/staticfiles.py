@@ -0,0 +1,43 @@
+"""
+Static files served by WhiteNoise, indexed on first use.
+
+WhiteNoise stats every file under STATIC_ROOT (and its compressed variants)
+and looks each one up in the staticfiles manifest when the middleware is
+created, i.e. while the process boots. Nearly all of those files belong to
+the Django admin and DRF's browsable API, which API clients never request,
+so LazyWhiteNoiseMiddleware defers the scan to the first request under
+STATIC_URL.
+"""
+import threading
+
+from whitenoise.middleware import WhiteNoiseMiddleware
+from whitenoise.string_utils import ensure_leading_trailing_slash
+
+
+class LazyWhiteNoiseMiddleware(WhiteNoiseMiddleware):
+    """WhiteNoiseMiddleware that indexes its directories when one of them is first requested"""
+
+    def __init__(self, *args, **kwargs):
+        self.pending = []
+        self.pending_lock = threading.Lock()
+        super().__init__(*args, **kwargs)
+
+    def add_files(self, root, prefix=None):
+        if self.autorefresh:
+            # Looked up per request anyway
+            super().add_files(root, prefix)
+        else:
+            self.pending.append((root, prefix))
+
+    def load_pending(self):
+        with self.pending_lock:
+            while self.pending:
+                root, prefix = self.pending.pop(0)
+                super().add_files(root, prefix)
+
+    def __call__(self, request):
+        if self.pending and any(
+            request.path_info.startswith(ensure_leading_trailing_slash(prefix)) for _root, prefix in self.pending
+        ):
+            self.load_pending()
+        return super().__call__(request)
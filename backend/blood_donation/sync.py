@@ -0,0 +1,396 @@
+"""
+Delta sync for offline devices.
+
+Home-visit staff work without connectivity for hours at a time. Instead of
+downloading the schedule and hospital lists again, a device keeps a cursor
+and asks for the rows changed since then:
+
+* Every synced table has an ``(updated_at, id)`` index. Each kind is read
+  with a keyset range on that pair, so a reconnect after a day offline
+  scans only that day's changes.
+* Deleted rows leave a SyncTombstone through post_delete signals, naming
+  the user the row belonged to or marking it public (hospitals, requests
+  on the board). Tombstones are read by their autoincrement id, and a donor
+  only gets the public ones and their own. Rows moved by archive_old_data
+  still exist, so the move leaves no tombstone.
+* Rows are only served once they are SYNC_SETTLE_SECONDS old. A transaction
+  that commits late with an earlier updated_at is therefore still picked up
+  on the next pull instead of slipping behind the cursor. Sync reads always
+  go to the primary, because a lagging replica would break the same
+  guarantee.
+* The cursor is opaque to the client (base64 JSON holding a position per
+  kind). A cursor older than SYNC_TOMBSTONE_DAYS may have missed purged
+  tombstones, so the device gets ``reset: true`` and a full snapshot.
+* Payloads are columnar: ``{"fields": [...], "rows": [[...], ...]}`` per
+  kind, at most ``limit`` rows per pull, with ``has_more`` until drained.
+
+What a device receives depends on who is signed in. Admins (field staff)
+get home-visit schedules, optionally for one ``hospital``, the donors
+those visits are for, all hospitals and the blood request board. Donors
+get their own schedules and profile, hospitals and the board plus their
+own requests. A first sync only sends live rows (pending visits and open
+requests). Later pulls send every change in scope, so a device learns
+when a visit is done or a request closes.
+
+Offline edits come back through apply_writes(). Each write names the
+``updated_at`` it was based on, and it is only applied if the row has not
+changed since. Otherwise the device gets the current row as a conflict.
+"""
+import base64
+import binascii
+import json
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.db.models.signals import post_delete, post_save
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from . import slots
+from .models import BloodRequest, DonationSchedule, Donor, Hospital, SyncTombstone, User
+
+CURSOR_VERSION = 1
+DEFAULT_LIMIT = 500
+MAX_LIMIT = 2000
+MAX_WRITES = 100
+
+MODELS = {
+    'schedule': DonationSchedule,
+    'donor': Donor,
+    'hospital': Hospital,
+    'blood_request': BloodRequest,
+}
+
+# (name sent to the device, ORM lookup); every kind starts with id and ends with updated_at
+FIELDS = {
+    'schedule': (
+        ('id', 'id'), ('donor_id', 'donor_id'), ('preferred_hospital_id', 'preferred_hospital_id'),
+        ('slot_id', 'slot_id'), ('scheduled_date', 'scheduled_date'), ('donation_type', 'donation_type'),
+        ('status', 'status'), ('updated_at', 'updated_at'),
+    ),
+    'donor': (
+        ('id', 'id'), ('first_name', 'user__first_name'), ('last_name', 'user__last_name'),
+        ('phone', 'phone'), ('location', 'location'), ('latitude', 'latitude'), ('longitude', 'longitude'),
+        ('blood_type', 'blood_type'), ('age', 'age'), ('updated_at', 'updated_at'),
+    ),
+    'hospital': (
+        ('id', 'id'), ('name', 'name'), ('location', 'location'), ('latitude', 'latitude'),
+        ('longitude', 'longitude'), ('updated_at', 'updated_at'),
+    ),
+    'blood_request': (
+        ('id', 'id'), ('requester_id', 'requester_id'), ('patient_name', 'patient_name'),
+        ('blood_type', 'blood_type'), ('hospital_name', 'hospital_name'),
+        ('hospital_location', 'hospital_location'), ('contact_phone', 'contact_phone'),
+        ('urgency', 'urgency'), ('is_fulfilled', 'is_fulfilled'), ('expired_at', 'expired_at'),
+        ('created_at', 'created_at'), ('updated_at', 'updated_at'),
+    ),
+}
+
+# Fields a device may change offline, per kind
+WRITABLE = {
+    'schedule': {'status'},
+    'donor': {'phone', 'location', 'latitude', 'longitude'},
+    'blood_request': {'is_fulfilled'},
+}
+
+
+# Set while rows are deleted that devices should keep, such as archive moves
+_skip_tombstones = ContextVar('skip_tombstones', default=False)
+
+
+class SyncError(Exception):
+    """Bad cursor or write; the message is safe to show to the client"""
+
+
+def encode_cursor(state):
+    return base64.urlsafe_b64encode(json.dumps(state, separators=(',', ':')).encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        state = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        if state['v'] != CURSOR_VERSION:
+            raise ValueError
+        issued = parse_datetime(state['at'])
+        if issued is None:
+            raise ValueError
+        positions = {
+            kind: (parse_datetime(updated_at), int(object_id))
+            for kind, (updated_at, object_id) in state['k'].items() if kind in MODELS
+        }
+        snapshot = parse_datetime(state['s']) if state.get('s') else None
+        return issued, positions, int(state['t']), snapshot
+    except (binascii.Error, ValueError, KeyError, TypeError) as exc:
+        raise SyncError('Invalid sync cursor') from exc
+
+
+def _scopes(user, snapshot, hospital_id=None):
+    """kind -> queryset of rows the device syncs; ``snapshot`` restricts unchanged old rows to live ones"""
+    def live_or_recent(live):
+        # A first sync skips finished history, but anything touched since it started is sent
+        return live | Q(updated_at__gte=snapshot) if snapshot else Q()
+
+    if user.role == 'admin':
+        visits = DonationSchedule.objects.filter(donation_type='home')
+        if hospital_id:
+            visits = visits.filter(preferred_hospital_id=hospital_id)
+        pending = visits.filter(status='pending')
+        return {
+            'schedule': visits.filter(live_or_recent(Q(status='pending'))),
+            'donor': Donor.objects.filter(id__in=pending.values('donor_id')),
+            'hospital': Hospital.objects.all(),
+            'blood_request': BloodRequest.objects.filter(
+                live_or_recent(Q(is_fulfilled=False, expired_at__isnull=True))
+            ),
+        }
+    own_or_open = Q(requester=user) | Q(is_fulfilled=False, expired_at__isnull=True)
+    return {
+        'schedule': DonationSchedule.objects.filter(donor__user=user),
+        'donor': Donor.objects.filter(user=user),
+        'hospital': Hospital.objects.all(),
+        # Other people's requests are only needed until they leave the board
+        'blood_request': BloodRequest.objects.filter(live_or_recent(own_or_open)),
+    }
+
+
+def _after(position):
+    updated_at, object_id = position
+    return Q(updated_at__gt=updated_at) | Q(updated_at=updated_at, id__gt=object_id)
+
+
+def _page(queryset, kind, position, horizon, limit):
+    """Up to ``limit`` rows changed after ``position``, in (updated_at, id) order"""
+    queryset = queryset.filter(updated_at__lt=horizon)
+    if position:
+        queryset = queryset.filter(_after(position))
+    lookups = [lookup for _name, lookup in FIELDS[kind]]
+    return list(queryset.order_by('updated_at', 'id').values_list(*lookups)[:limit])
+
+
+def row_for(kind, object_id):
+    """Current row of one object as sent by pull(), or None"""
+    lookups = [lookup for _name, lookup in FIELDS[kind]]
+    row = MODELS[kind].objects.filter(pk=object_id).values_list(*lookups).first()
+    return list(row) if row else None
+
+
+def pull(user, cursor=None, limit=DEFAULT_LIMIT, hospital_id=None, now=None):
+    """Changes for ``user``'s device since ``cursor``; returns the response payload"""
+    now = now or timezone.now()
+    horizon = now - timedelta(seconds=settings.SYNC_SETTLE_SECONDS)
+    limit = max(1, min(limit, MAX_LIMIT))
+    reset = False
+    if cursor:
+        issued, positions, tombstone_id, snapshot = decode_cursor(cursor)
+        if issued < now - timedelta(days=settings.SYNC_TOMBSTONE_DAYS):
+            cursor, reset = None, True
+    if not cursor:
+        # A full snapshot; deletions before it are irrelevant to the device
+        positions, snapshot = {}, horizon
+        tombstone_id = (
+            SyncTombstone.objects.filter(deleted_at__lt=horizon).order_by('-id')
+            .values_list('id', flat=True).first() or 0
+        )
+
+    scopes = _scopes(user, snapshot, hospital_id)
+    changes, deleted = {}, {}
+    remaining, has_more = limit, False
+    for kind in MODELS:
+        if remaining <= 0:
+            has_more = True
+            break
+        rows = _page(scopes[kind], kind, positions.get(kind), horizon, remaining + 1)
+        if len(rows) > remaining:
+            rows, has_more = rows[:remaining], True
+        if not rows:
+            continue
+        changes[kind] = rows
+        positions[kind] = (rows[-1][-1], rows[-1][0])
+        remaining -= len(rows)
+
+    # Schedules can point at donors the device has never seen (a new visit for a
+    # long-standing donor), so those donor rows come along whether changed or not
+    sent = {row[0] for row in changes.get('donor', ())}
+    missing = {row[1] for row in changes.get('schedule', ())} - sent
+    if missing:
+        changes.setdefault('donor', []).extend(
+            Donor.objects.filter(id__in=missing).order_by('id')
+            .values_list(*[lookup for _name, lookup in FIELDS['donor']])
+        )
+
+    if remaining > 0:
+        tombstones = SyncTombstone.objects.filter(id__gt=tombstone_id, deleted_at__lt=horizon)
+        if user.role != 'admin':
+            tombstones = tombstones.filter(Q(public=True) | Q(owner_id=user.id))
+        tombstones = list(
+            tombstones.order_by('id').values_list('id', 'kind', 'object_id')[:remaining + 1]
+        )
+        if len(tombstones) > remaining:
+            tombstones, has_more = tombstones[:remaining], True
+        for tombstone_id, kind, object_id in tombstones:
+            deleted.setdefault(kind, []).append(object_id)
+    else:
+        has_more = True
+
+    if snapshot and not has_more:
+        # The snapshot is complete: rows it skipped as finished must not come back
+        # on the next pull, so every kind moves at least up to where it started
+        for kind in MODELS:
+            positions[kind] = max(positions.get(kind, (snapshot, 0)), (snapshot, 0))
+
+    state = {
+        'v': CURSOR_VERSION,
+        'at': now.isoformat(),
+        'k': {kind: [updated_at.isoformat(), object_id] for kind, (updated_at, object_id) in positions.items()},
+        't': tombstone_id,
+    }
+    if has_more and snapshot:
+        state['s'] = snapshot.isoformat()
+    return {
+        'cursor': encode_cursor(state),
+        'has_more': has_more,
+        'reset': reset,
+        'changes': {
+            kind: {'fields': [name for name, _lookup in FIELDS[kind]], 'rows': [list(row) for row in rows]}
+            for kind, rows in changes.items()
+        },
+        'deleted': deleted,
+    }
+
+
+def _can_write(user, kind, instance):
+    if user.role == 'admin':
+        return True
+    if kind == 'donor':
+        return instance.user_id == user.id
+    if kind == 'blood_request':
+        return instance.requester_id == user.id
+    return False
+
+
+def _apply(user, write):
+    try:
+        kind, object_id, changes = write['kind'], int(write['id']), write['changes']
+        base_updated_at = parse_datetime(write['base_updated_at'])
+    except (KeyError, TypeError, ValueError) as exc:
+        raise SyncError('Each write needs kind, id, base_updated_at and changes') from exc
+    if kind not in WRITABLE:
+        raise SyncError(f'{kind} cannot be changed offline')
+    if not isinstance(changes, dict) or not changes or not set(changes) <= WRITABLE[kind]:
+        raise SyncError(f'Offline changes to {kind} are limited to {", ".join(sorted(WRITABLE[kind]))}')
+    if base_updated_at is None:
+        raise SyncError('base_updated_at must be an ISO 8601 timestamp')
+
+    instance = MODELS[kind].objects.select_for_update().filter(pk=object_id).first()
+    if instance is None:
+        return {'status': 'not_found'}
+    if not _can_write(user, kind, instance):
+        return {'status': 'forbidden'}
+    if instance.updated_at != base_updated_at:
+        return {'status': 'conflict', 'row': row_for(kind, object_id)}
+
+    if kind == 'schedule':
+        if changes['status'] != 'canceled':
+            raise SyncError('Schedules can only be canceled offline')
+        if instance.status == 'done':
+            raise SyncError('Cannot cancel a completed donation')
+        if instance.status == 'pending':
+            slots.release(instance.slot_id)
+        instance.status = 'canceled'
+        instance.save(update_fields=['status', 'updated_at'])
+    elif kind == 'donor':
+        from .serializers import DonorCreateUpdateSerializer
+
+        serializer = DonorCreateUpdateSerializer(instance, data=changes, partial=True)
+        if not serializer.is_valid():
+            raise SyncError(serializer.errors)
+        serializer.save()
+    elif kind == 'blood_request':
+        if changes['is_fulfilled'] is not True:
+            raise SyncError('Blood requests can only be marked fulfilled offline')
+        instance.is_fulfilled = True
+        instance.save(update_fields=['is_fulfilled', 'updated_at'])
+    return {'status': 'applied', 'row': row_for(kind, object_id)}
+
+
+def apply_writes(user, writes):
+    """Apply a batch of offline writes, each in its own transaction; returns one result per write"""
+    if not isinstance(writes, list) or not writes:
+        raise SyncError('writes must be a non-empty list')
+    if len(writes) > MAX_WRITES:
+        raise SyncError(f'At most {MAX_WRITES} writes per batch')
+    results = []
+    for write in writes:
+        result = {'kind': write.get('kind'), 'id': write.get('id')} if isinstance(write, dict) else {}
+        try:
+            with transaction.atomic():
+                result.update(_apply(user, write))
+        except SyncError as exc:
+            result.update({'status': 'error', 'error': exc.args[0]})
+        results.append(result)
+    return results
+
+
+def purge_tombstones(now=None, batch_size=5000):
+    """Delete tombstones older than SYNC_TOMBSTONE_DAYS in batches; returns the number deleted"""
+    before = (now or timezone.now()) - timedelta(days=settings.SYNC_TOMBSTONE_DAYS)
+    purged = 0
+    while True:
+        ids = list(
+            SyncTombstone.objects.filter(deleted_at__lt=before).order_by('deleted_at')
+            .values_list('id', flat=True)[:batch_size]
+        )
+        if not ids:
+            return purged
+        purged += SyncTombstone.objects.filter(id__in=ids).delete()[0]
+
+
+@contextmanager
+def without_tombstones():
+    """Deletes in this block leave no tombstone, for rows that move rather than go away"""
+    token = _skip_tombstones.set(True)
+    try:
+        yield
+    finally:
+        _skip_tombstones.reset(token)
+
+
+def _owner(kind, instance):
+    """(owner user id, public) of a row being deleted"""
+    if kind == 'schedule':
+        return Donor.objects.filter(pk=instance.donor_id).values_list('user_id', flat=True).first(), False
+    if kind == 'donor':
+        return instance.user_id, False
+    if kind == 'blood_request':
+        return instance.requester_id, not instance.is_fulfilled and instance.expired_at is None
+    return None, True
+
+
+def _tombstone_handler(kind):
+    def handler(sender, instance, **kwargs):
+        if _skip_tombstones.get():
+            return
+        owner_id, public = _owner(kind, instance)
+        SyncTombstone.objects.create(kind=kind, object_id=instance.pk, owner_id=owner_id, public=public)
+    return handler
+
+
+SYNCED_USER_FIELDS = {'first_name', 'last_name'}
+
+
+def _on_user_saved(sender, instance, created, update_fields=None, **kwargs):
+    # Donor rows carry the user's name, so a rename has to reach devices too
+    if created or (update_fields and not SYNCED_USER_FIELDS & set(update_fields)):
+        return
+    Donor.objects.filter(user=instance).update(updated_at=timezone.now())
+
+
+def connect_signals():
+    for kind, model in MODELS.items():
+        post_delete.connect(_tombstone_handler(kind), sender=model, weak=False,
+                            dispatch_uid=f'sync_{kind}_deleted')
+    post_save.connect(_on_user_saved, sender=User, dispatch_uid='sync_user_saved')
@@ -0,0 +1,325 @@
+"""
+Query budgets for every API route.
+
+QueryBudgetTests seeds the test database at a small and a large scale, then
+calls every route in blood_donation/urls.py as a donor and as an admin while
+counting SQL queries. Each call must answer with its status in EXPECTED and
+run exactly its pinned number of queries at both scales: a count that grows
+with the data is an N+1, and any other change means the pin needs a look. A
+failure prints the SQL of the failing call, or a diff of the SQL at the two
+scales when the count grew, so the offending lookup is easy to spot.
+
+Every named route needs an entry in EXPECTED and routes().
+
+    python manage.py test blood_donation
+"""
+import difflib
+import logging
+import re
+import shutil
+import tempfile
+from datetime import datetime, time as dt_time, timedelta
+from decimal import Decimal
+
+from django.db import connection, transaction
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from . import inventory, profiling, rollups, search, urls
+from .models import (
+    ArchivedDonationRecord, ArchivedDonationSchedule, BloodRequest, DonationRecord, DonationSchedule, Donor,
+    Hospital, SlotCapacity, User,
+)
+
+SMALL, LARGE = 3, 30
+
+# url name -> {role: (HTTP status, queries)}. Counts include authentication,
+# pagination COUNT(*) and transaction savepoints.
+EXPECTED = {
+    'register': {'donor': (201, 9), 'admin': (201, 9)},
+    'login': {'donor': (200, 1), 'admin': (200, 1)},
+    'token_refresh': {'donor': (200, 0), 'admin': (200, 0)},
+    'donor-profile': {'donor': (200, 1), 'admin': (403, 0)},
+    'donor-profile-update': {'donor': (200, 6), 'admin': (403, 0)},
+    'donor-dashboard': {'donor': (200, 2), 'admin': (403, 0)},
+    'donor-bootstrap': {'donor': (200, 9), 'admin': (403, 0)},
+    'batch': {'donor': (200, 4), 'admin': (200, 3)},
+    'schedule-donation': {'donor': (201, 14), 'admin': (403, 0)},
+    'list-schedules': {'donor': (200, 3), 'admin': (200, 2)},
+    'list-archived-schedules': {'donor': (200, 3), 'admin': (200, 2)},
+    'list-hospitals': {'donor': (200, 2), 'admin': (200, 2)},
+    'hospital-detail': {'donor': (200, 1), 'admin': (200, 1)},
+    'hospital-slots': {'donor': (200, 2), 'admin': (200, 2)},
+    'hospital-inventory': {'donor': (200, 2), 'admin': (200, 2)},
+    'donors-leaderboard': {'donor': (200, 1), 'admin': (200, 1)},
+    'admin-stats': {'donor': (403, 0), 'admin': (200, 9)},
+    'admin-donation-trends': {'donor': (403, 0), 'admin': (200, 1)},
+    'admin-search': {'donor': (403, 0), 'admin': (200, 2)},
+    # Donors get an empty list rather than a 403
+    'admin-donors': {'donor': (200, 0), 'admin': (200, 2)},
+    'admin-donor-onboard': {'donor': (403, 0), 'admin': (201, 6)},
+    'mark-schedule-done': {'donor': (403, 0), 'admin': (200, 31)},
+    'mark-schedule-cancel': {'donor': (403, 0), 'admin': (200, 8)},
+    'update-lives-saved': {'donor': (403, 0), 'admin': (200, 13)},
+    'dispense-blood': {'donor': (403, 0), 'admin': (200, 8)},
+    'blood-shortages': {'donor': (403, 0), 'admin': (200, 1)},
+    'home-visit-routes': {'donor': (403, 0), 'admin': (200, 2)},
+    'profiling-token': {'donor': (403, 0), 'admin': (200, 0)},
+    'profiling-list': {'donor': (403, 0), 'admin': (200, 0)},
+    'profiling-download': {'donor': (403, 0), 'admin': (200, 0)},
+    'add-hospital': {'donor': (403, 0), 'admin': (201, 7)},
+    'certificate-data': {'donor': (200, 1), 'admin': (200, 1)},
+    'blood-request-list': {'donor': (200, 2), 'admin': (200, 2)},
+    'blood-request-fulfill': {'donor': (200, 6), 'admin': (200, 6)},
+    'blood-request-delete': {'donor': (204, 5), 'admin': (204, 5)},
+    # Tests run with DEBUG off and no METRICS_TOKEN, so scrapes are refused
+    'metrics': {'donor': (403, 0), 'admin': (403, 0)},
+    'admin-blood-requests': {'donor': (403, 0), 'admin': (200, 2)},
+    'admin-hospital-detail': {'donor': (403, 0), 'admin': (200, 6)},
+    'audit-events': {'donor': (403, 0), 'admin': (200, 1)},
+    'sync': {'donor': (200, 6), 'admin': (200, 6)},
+    'sync-writes': {'donor': (200, 9), 'admin': (200, 9)},
+}
+
+
+def seed(start, count, hospitals):
+    """Add ``count`` donors, each with a completed, an archived and a pending donation and a blood request"""
+    now = timezone.now()
+    users = User.objects.bulk_create([
+        User(username=f'seed{i}', email=f'seed{i}@example.com', first_name='Seed', last_name=str(i))
+        for i in range(start, start + count)
+    ])
+    donors = Donor.objects.bulk_create([
+        Donor(user=user, blood_type='O-', phone=f'0911{i:06d}', location='Addis Ababa',
+              latitude=9.0 + i / 1000, longitude=38.7, total_donations=1)
+        for i, user in enumerate(users, start=start)
+    ])
+    for i, donor in enumerate(donors):
+        hospital = hospitals[i % len(hospitals)]
+        done = DonationSchedule.objects.create(
+            donor=donor, preferred_hospital=hospital, scheduled_date=now - timedelta(days=200),
+            donation_type='station', status='done',
+        )
+        record = DonationRecord.objects.create(schedule=done, hospital=hospital, blood_amount=Decimal('1'))
+        inventory.receive(record)
+        # Archived rows keep their original ids; offset them clear of the live ones
+        archived = ArchivedDonationSchedule.objects.create(
+            id=10**6 + start + i, donor=donor, preferred_hospital=hospital, scheduled_date=now - timedelta(days=400),
+            donation_type='station', status='done', created_at=now, updated_at=now,
+        )
+        ArchivedDonationRecord.objects.create(
+            id=archived.id, schedule=archived, hospital=hospital, donation_date=archived.scheduled_date,
+            blood_amount=Decimal('1'),
+        )
+        DonationSchedule.objects.create(
+            donor=donor, preferred_hospital=hospital, scheduled_date=now + timedelta(days=1),
+            donation_type='home',
+        )
+        BloodRequest.objects.create(
+            requester=donor.user, patient_name=f'Patient {i}', blood_type='O-',
+            hospital_name=hospital.name, hospital_location=hospital.location, contact_phone='0911000000',
+        )
+    rollups.rebuild()
+
+
+def build_fixtures():
+    admin = User.objects.create_user('budget-admin', 'admin@example.com', 'Budget-pass-123', role='admin')
+    donor_user = User.objects.create_user('budget-donor', 'donor@example.com', 'Budget-pass-123',
+                                          first_name='Budget', last_name='Donor')
+    donor = Donor.objects.create(user=donor_user, blood_type='O-', phone='0911999999')
+    hospitals = [
+        Hospital.objects.create(name=f'Hospital {i}', location='Addis Ababa', latitude=9.0, longitude=38.7 + i / 100)
+        for i in range(3)
+    ]
+    tomorrow = timezone.localdate() + timedelta(days=1)
+    SlotCapacity.objects.create(hospital=hospitals[0], weekday=tomorrow.weekday(),
+                                start_time=dt_time(8), end_time=dt_time(17), capacity=50)
+    # The pending visit belongs to someone else so the budget donor may still book one
+    other_user = User.objects.create_user('budget-other', 'other@example.com', first_name='Other')
+    other = Donor.objects.create(user=other_user, blood_type='A+', phone='0911999998')
+    pending = DonationSchedule.objects.create(
+        donor=other, preferred_hospital=hospitals[0], scheduled_date=timezone.now() + timedelta(days=1),
+        donation_type='home',
+    )
+    past = DonationSchedule.objects.create(
+        donor=donor, preferred_hospital=hospitals[0], scheduled_date=timezone.now() - timedelta(days=200),
+        donation_type='station', status='done',
+    )
+    record = DonationRecord.objects.create(schedule=past, hospital=hospitals[0], blood_amount=1)
+    # donation_date is auto_now_add; backdate it so the donor is eligible to book again
+    DonationRecord.objects.filter(pk=record.pk).update(donation_date=past.scheduled_date)
+    record.refresh_from_db()
+    inventory.receive(record)
+    archived = ArchivedDonationSchedule.objects.create(
+        id=10**7, donor=donor, preferred_hospital=hospitals[0], scheduled_date=timezone.now() - timedelta(days=400),
+        donation_type='station', status='done', created_at=timezone.now(), updated_at=timezone.now(),
+    )
+    ArchivedDonationRecord.objects.create(
+        id=archived.id, schedule=archived, hospital=hospitals[0], donation_date=archived.scheduled_date,
+        blood_amount=1,
+    )
+    blood_request = BloodRequest.objects.create(
+        requester=donor_user, patient_name='Budget Patient', blood_type='O-', hospital_name='Hospital 0',
+        hospital_location='Addis Ababa', contact_phone='0911000000',
+    )
+
+    # A stored profile so the download route has something to serve
+    client = APIClient()
+    token = profiling.issue_token(admin)
+    profile_name = client.get('/api/metrics/', HTTP_X_PROFILE=token)['X-Profile-Id']
+    search.rebuild()
+
+    return {
+        'admin': admin, 'donor_user': donor_user, 'donor': donor, 'hospitals': hospitals,
+        'pending': pending, 'record': record, 'blood_request': blood_request,
+        'profile_name': profile_name, 'tomorrow': tomorrow,
+    }
+
+
+def routes(fx):
+    """url name -> (method, url kwargs, request data)"""
+    hospital = fx['hospitals'][0]
+    slot_time = timezone.make_aware(datetime.combine(fx['tomorrow'], dt_time(9))).isoformat()
+    return {
+        'register': ('post', {}, {
+            'username': 'budget-new', 'email': 'new@example.com', 'password': 'Budget-pass-123',
+            'password2': 'Budget-pass-123', 'first_name': 'New', 'last_name': 'Donor', 'role': 'donor',
+        }),
+        'login': ('post', {}, {'username': 'budget-donor', 'password': 'Budget-pass-123'}),
+        'token_refresh': ('post', {}, {'refresh': str(RefreshToken.for_user(fx['donor_user']))}),
+        'donor-profile': ('get', {}, None),
+        'donor-profile-update': ('patch', {}, {'location': 'Bole'}),
+        'donor-dashboard': ('get', {}, None),
+        'donor-bootstrap': ('get', {}, {'limit': 5}),
+        'batch': ('get', {}, {'path': ['/api/donor/profile/', '/api/hospitals/', '/api/donors/leaderboard/?limit=5']}),
+        'schedule-donation': ('post', {}, {
+            'scheduled_date': slot_time, 'donation_type': 'station', 'preferred_hospital_id': hospital.id,
+        }),
+        'list-schedules': ('get', {}, None),
+        'list-archived-schedules': ('get', {}, None),
+        'list-hospitals': ('get', {}, None),
+        'hospital-detail': ('get', {'pk': hospital.id}, None),
+        'hospital-slots': ('get', {'pk': hospital.id}, None),
+        'hospital-inventory': ('get', {'pk': hospital.id}, None),
+        'donors-leaderboard': ('get', {}, None),
+        'admin-stats': ('get', {}, None),
+        'admin-donation-trends': ('get', {}, None),
+        'admin-search': ('get', {}, {'q': 'seed'}),
+        'admin-donors': ('get', {}, None),
+        'admin-donor-onboard': ('post', {}, {'issue_tokens': True, 'donors': [{
+            'username': 'budget-drive', 'email': 'drive@example.com', 'first_name': 'Drive', 'last_name': 'Donor',
+            'password': 'Budget-pass-123', 'blood_type': 'A+',
+        }]}),
+        'mark-schedule-done': ('patch', {'pk': fx['pending'].id}, {'hospital_id': hospital.id, 'blood_amount': 1}),
+        'mark-schedule-cancel': ('patch', {'pk': fx['pending'].id}, None),
+        'update-lives-saved': ('patch', {'pk': fx['record'].id}, {'lives_saved': 2}),
+        'dispense-blood': ('post', {'pk': hospital.id}, {'blood_type': 'O-', 'units': 1}),
+        'blood-shortages': ('get', {}, {'blood_type': 'O-', 'threshold': 1000}),
+        'home-visit-routes': ('get', {}, {'date': fx['tomorrow'].isoformat()}),
+        'profiling-token': ('post', {}, None),
+        'profiling-list': ('get', {}, None),
+        'profiling-download': ('get', {'name': fx['profile_name']}, None),
+        'add-hospital': ('post', {}, {'name': 'Budget Hospital', 'location': 'Adama'}),
+        'certificate-data': ('get', {'record_id': fx['record'].id}, None),
+        'blood-request-list': ('get', {}, None),
+        'blood-request-fulfill': ('patch', {'pk': fx['blood_request'].id}, None),
+        'blood-request-delete': ('delete', {'pk': fx['blood_request'].id}, None),
+        'metrics': ('get', {}, None),
+        'admin-blood-requests': ('get', {}, None),
+        'admin-hospital-detail': ('patch', {'pk': hospital.id}, {'location': 'Addis'}),
+        'audit-events': ('get', {}, {'actor': fx['admin'].id}),
+        'sync': ('get', {}, None),
+        'sync-writes': ('post', {}, {'writes': [{
+            'kind': 'blood_request', 'id': fx['blood_request'].id,
+            'base_updated_at': fx['blood_request'].updated_at.isoformat(), 'changes': {'is_fulfilled': True},
+        }]}),
+    }
+
+
+class _Rollback(Exception):
+    pass
+
+
+def measure(table, users):
+    """Run every route as every user inside a rolled-back transaction; returns {(name, role): (status, [sql])}"""
+    captured = {}
+    for name, (method, kwargs, data) in table.items():
+        for role, user in users.items():
+            client = APIClient(raise_request_exception=False)
+            client.force_authenticate(user)
+            url = reverse(name, kwargs=kwargs)
+            try:
+                with transaction.atomic():
+                    with CaptureQueriesContext(connection) as queries:
+                        if method == 'get':
+                            response = client.get(url, data)
+                        else:
+                            response = getattr(client, method)(url, data, format='json')
+                    raise _Rollback
+            except _Rollback:
+                pass
+            captured[(name, role)] = (response.status_code, [query['sql'] for query in queries.captured_queries])
+    return captured
+
+
+def _normalize(sql):
+    # Ids, literals and savepoint names differ between runs; the statement shape is what matters
+    sql = re.sub(r'"s\d+_x\d+"', '"savepoint"', sql)
+    return re.sub(r"\b\d+\b|'[^']*'", '?', sql)
+
+
+def _listing(sql):
+    return '\n'.join(f'    {index:3}. {_normalize(statement)}' for index, statement in enumerate(sql, start=1))
+
+
+class QueryBudgetTests(TestCase):
+    """Status and query count of every route, as a donor and as an admin, at two data sizes"""
+
+    @classmethod
+    def setUpClass(cls):
+        profiles = tempfile.mkdtemp(prefix='query-budgets-')
+        cls.addClassCleanup(shutil.rmtree, profiles, ignore_errors=True)
+        profiling_dir = override_settings(PROFILING_DIR=profiles)
+        profiling_dir.enable()
+        cls.addClassCleanup(profiling_dir.disable)
+        # 403s for the wrong role are expected; keep them out of the output
+        request_logger = logging.getLogger('django.request')
+        cls.addClassCleanup(request_logger.setLevel, request_logger.level)
+        request_logger.setLevel(logging.ERROR)
+        super().setUpClass()
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.fx = build_fixtures()
+
+    def test_every_route_has_a_budget(self):
+        named = {pattern.name for pattern in urls.urlpatterns if pattern.name}
+        self.assertEqual(set(routes(self.fx)), named, 'routes() must cover every named route')
+        self.assertEqual(set(EXPECTED), named, 'EXPECTED must cover every named route')
+
+    def test_query_counts(self):
+        table = routes(self.fx)
+        users = {'donor': self.fx['donor_user'], 'admin': self.fx['admin']}
+        seed(0, SMALL, self.fx['hospitals'])
+        small = measure(table, users)
+        seed(SMALL, LARGE - SMALL, list(Hospital.objects.all()))
+        large = measure(table, users)
+
+        for (name, role), (code, small_sql) in sorted(small.items()):
+            with self.subTest(route=name, role=role):
+                expected_code, budget = EXPECTED.get(name, {}).get(role, (None, 0))
+                large_code, large_sql = large[(name, role)]
+                self.assertEqual((code, large_code), (expected_code, expected_code),
+                                 f'HTTP status at {SMALL} and {LARGE} donors\n{_listing(large_sql)}')
+                if len(large_sql) != len(small_sql):
+                    diff = difflib.unified_diff(
+                        [_normalize(sql) for sql in small_sql], [_normalize(sql) for sql in large_sql],
+                        fromfile=f'{SMALL} donors', tofile=f'{LARGE} donors', lineterm='', n=1,
+                    )
+                    self.fail(f'grew from {len(small_sql)} queries at {SMALL} donors to {len(large_sql)} '
+                              f'at {LARGE}\n' + '\n'.join(f'    {line}' for line in diff))
+                self.assertEqual(len(large_sql), budget, f'queries run, pinned at {budget}\n{_listing(large_sql)}')
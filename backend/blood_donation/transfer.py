@@ -0,0 +1,230 @@
+"""
+Copy the app's data from one database to another, e.g. SQLite to Postgres.
+
+dumpdata/loaddata build every object in memory and save them one at a time.
+copy_database() instead moves raw column values:
+
+* Each table is read in primary-key order, ``chunk_size`` rows at a time
+  (keyset pagination, so memory stays flat however large the table). Each
+  chunk is written in one target transaction, with COPY on Postgres and a
+  batched INSERT elsewhere. No model code or signals run.
+* Tables are copied on a thread pool as soon as every table they reference
+  is complete, so independent tables load in parallel. SQLite targets take a
+  single writer, so they get one thread.
+* Ids are copied as they are. Postgres sequences are moved past them at the
+  end.
+* A rerun resumes. Because each chunk commits on its own and chunks follow
+  the primary key, a table's highest id on the target marks where its copy
+  stopped. A target that holds no copied rows yet (only the content types
+  and permissions that migrate creates) is emptied and filled from scratch.
+
+The copied models are those of blood_donation, auth and contenttypes (which
+permissions point at). Sessions and the admin log are left behind. Both
+databases must be fully migrated, and the source should not be written to
+while it is copied, since rows changed behind the copy are not revisited.
+"""
+import io
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import dj_database_url
+from django.apps import apps
+from django.core.management.color import no_style
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.db.migrations.executor import MigrationExecutor
+from django.db.models import Max
+
+APP_LABELS = ('contenttypes', 'auth', 'blood_donation')
+# Rows migrate creates on the target; a fresh copy replaces them with the source's
+MIGRATE_CREATED = ('contenttypes.contenttype', 'auth.permission')
+DEFAULT_CHUNK_SIZE = 5000
+
+
+class TransferError(Exception):
+    pass
+
+
+def database_alias(value, alias):
+    """``value`` if it is a DATABASES alias, else ``value`` as a database URL registered under ``alias``"""
+    if value in connections.settings:
+        return value
+    if '://' not in value:
+        raise TransferError(f'{value} is neither a configured database alias nor a database URL')
+    configured = connections.configure_settings({
+        DEFAULT_DB_ALIAS: connections.settings[DEFAULT_DB_ALIAS], alias: dj_database_url.parse(value),
+    })
+    connections.settings[alias] = configured[alias]
+    return alias
+
+
+def models_to_copy():
+    return [
+        model
+        for label in APP_LABELS
+        for model in apps.get_app_config(label).get_models(include_auto_created=True)
+        if model._meta.managed and not model._meta.proxy
+    ]
+
+
+def dependencies(models):
+    """{model: models among ``models`` it has foreign keys to}"""
+    chosen = set(models)
+    return {
+        model: {
+            field.related_model for field in model._meta.concrete_fields
+            if field.is_relation and field.related_model in chosen and field.related_model is not model
+        }
+        for model in models
+    }
+
+
+def _rows(model, alias):
+    return model._base_manager.using(alias)
+
+
+def check_migrated(alias):
+    executor = MigrationExecutor(connections[alias])
+    if executor.migration_plan(executor.loader.graph.leaf_nodes()):
+        raise TransferError(f'Database {alias} has unapplied migrations; migrate it first')
+
+
+def read_chunk(model, alias, after, size):
+    rows = _rows(model, alias).order_by('pk')
+    if after is not None:
+        rows = rows.filter(pk__gt=after)
+    return list(rows.values_list(*[field.attname for field in model._meta.concrete_fields])[:size])
+
+
+def _csv_field(value):
+    # COPY's CSV format reads an unquoted empty field as NULL and any quoted field as its text
+    if value is None:
+        return ''
+    return '"' + str(value).replace('"', '""') + '"'
+
+
+def _csv(rows):
+    buffer = io.StringIO()
+    for row in rows:
+        buffer.write(','.join(_csv_field(value) for value in row))
+        buffer.write('\n')
+    buffer.seek(0)
+    return buffer
+
+
+def write_chunk(model, alias, rows):
+    connection = connections[alias]
+    fields = model._meta.concrete_fields
+    quote = connection.ops.quote_name
+    table = quote(model._meta.db_table)
+    columns = ', '.join(quote(field.column) for field in fields)
+    values = [[field.get_db_prep_save(value, connection) for field, value in zip(fields, row)] for row in rows]
+    with transaction.atomic(using=alias), connection.cursor() as cursor:
+        copy_expert = getattr(cursor.cursor, 'copy_expert', None)  # psycopg2
+        if connection.vendor == 'postgresql' and copy_expert:
+            copy_expert(f'COPY {table} ({columns}) FROM STDIN WITH (FORMAT csv)', _csv(values))
+        else:
+            placeholders = ', '.join(['%s'] * len(fields))
+            cursor.executemany(f'INSERT INTO {table} ({columns}) VALUES ({placeholders})', values)
+
+
+def copy_table(model, source, target, chunk_size, stop):
+    """Copy the rows of ``model`` that ``target`` lacks; returns (rows copied, seconds)"""
+    started = time.monotonic()
+    pk_index = [field.attname for field in model._meta.concrete_fields].index(model._meta.pk.attname)
+    try:
+        after = _rows(model, target).aggregate(last=Max('pk'))['last']
+        if after is not None:
+            expected = _rows(model, source).filter(pk__lte=after).count()
+            present = _rows(model, target).count()
+            if present != expected:
+                raise TransferError(
+                    f'{model._meta.db_table}: the target has {present} rows up to id {after} but the source '
+                    f'has {expected}, so they are not from an earlier copy; rerun with --restart'
+                )
+        copied = 0
+        while not stop.is_set():
+            rows = read_chunk(model, source, after, chunk_size)
+            if not rows:
+                break
+            write_chunk(model, target, rows)
+            copied += len(rows)
+            after = rows[-1][pk_index]
+        return copied, time.monotonic() - started
+    finally:
+        # The pool's threads are discarded afterwards; close their connections with them
+        connections[source].close()
+        connections[target].close()
+
+
+def flush(alias, models):
+    """Empty the tables of ``models`` (and, where the backend needs it, tables that reference them)"""
+    connection = connections[alias]
+    tables = [model._meta.db_table for model in models]
+    connection.ops.execute_sql_flush(connection.ops.sql_flush(no_style(), tables, allow_cascade=True))
+
+
+def reset_sequences(alias, models):
+    connection = connections[alias]
+    statements = connection.ops.sequence_reset_sql(no_style(), models)
+    if statements:
+        with transaction.atomic(using=alias), connection.cursor() as cursor:
+            for sql in statements:
+                cursor.execute(sql)
+
+
+def copy_database(source, target, chunk_size=DEFAULT_CHUNK_SIZE, workers=4, restart=False, on_copied=None):
+    """
+    Copy every model of APP_LABELS from database alias ``source`` to ``target``.
+
+    ``restart`` empties the target tables first instead of resuming.
+    ``on_copied(model, rows, seconds)`` is called as each table completes.
+    Returns (rows copied, [(table, source rows, target rows), ...] for
+    tables whose row counts differ afterwards).
+    """
+    source_db, target_db = connections[source].settings_dict, connections[target].settings_dict
+    if all(source_db[key] == target_db[key] for key in ('ENGINE', 'NAME', 'HOST', 'PORT')):
+        raise TransferError('Source and target are the same database')
+    check_migrated(source)
+    check_migrated(target)
+    if connections[target].vendor == 'sqlite':
+        workers = 1
+
+    models = models_to_copy()
+    if restart or not any(
+        _rows(model, target).exists() for model in models if model._meta.label_lower not in MIGRATE_CREATED
+    ):
+        flush(target, models)
+
+    needs = dependencies(models)
+    pending, running, done = set(models), {}, set()
+    total = 0
+    stop = threading.Event()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        try:
+            while pending or running:
+                for model in [model for model in pending if needs[model] <= done]:
+                    pending.discard(model)
+                    running[pool.submit(copy_table, model, source, target, chunk_size, stop)] = model
+                if not running:
+                    raise TransferError(f"Circular foreign keys between {', '.join(m._meta.label for m in pending)}")
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    model = running.pop(future)
+                    rows, seconds = future.result()
+                    done.add(model)
+                    total += rows
+                    if on_copied:
+                        on_copied(model, rows, seconds)
+        except BaseException:
+            # Let running tables stop after their current chunk; a rerun resumes from there
+            stop.set()
+            raise
+
+    reset_sequences(target, models)
+    mismatches = []
+    for model in models:
+        counts = _rows(model, source).count(), _rows(model, target).count()
+        if counts[0] != counts[1]:
+            mismatches.append((model._meta.db_table, *counts))
+    return total, mismatches
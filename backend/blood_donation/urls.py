@@ -1,41 +1,63 @@
 from django.urls import path
 from rest_framework_simplejwt.views import TokenRefreshView
-from . import views
+from . import admission, metrics, views
 
 urlpatterns = [
     # Authentication
     path('auth/register/', views.RegisterView.as_view(), name='register'),
     path('auth/login/', views.login_view, name='login'),
-    path('auth/token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
+    path('auth/token/refresh/', admission.route('auth')(TokenRefreshView.as_view()), name='token_refresh'),
     
     # Donor endpoints
     path('donor/profile/', views.DonorProfileView.as_view(), name='donor-profile'),
     path('donor/profile/update/', views.UpdateDonorProfileView.as_view(), name='donor-profile-update'),
     path('donor/dashboard/', views.DashboardStatsView.as_view(), name='donor-dashboard'),
+    path('donor/bootstrap/', views.DonorBootstrapView.as_view(), name='donor-bootstrap'),
     
     # Donation scheduling
     path('donations/schedule/', views.ScheduleDonationView.as_view(), name='schedule-donation'),
     path('donations/schedules/', views.ListSchedulesView.as_view(), name='list-schedules'),
+    path('donations/schedules/archived/', views.ListArchivedSchedulesView.as_view(), name='list-archived-schedules'),
     
     # Hospitals
     path('hospitals/', views.ListHospitalsView.as_view(), name='list-hospitals'),
     path('hospitals/<int:pk>/', views.HospitalDetailView.as_view(), name='hospital-detail'),
+    path('hospitals/<int:pk>/slots/', views.HospitalSlotsView.as_view(), name='hospital-slots'),
+    path('hospitals/<int:pk>/inventory/', views.HospitalInventoryView.as_view(), name='hospital-inventory'),
+    
+    # Offline devices
+    path('sync/', views.SyncView.as_view(), name='sync'),
+    path('sync/writes/', views.SyncWritesView.as_view(), name='sync-writes'),
+    
+    # Several GETs in one round trip
+    path('batch/', views.BatchView.as_view(), name='batch'),
     
     # Leaderboard (NEW - Additive Feature)
     path('donors/leaderboard/', views.TopDonorsLeaderboardView.as_view(), name='donors-leaderboard'),
     
     # Admin endpoints
     path('admin/stats/', views.AdminStatsView.as_view(), name='admin-stats'),
+    path('admin/stats/trends/', views.DonationTrendsView.as_view(), name='admin-donation-trends'),
+    path('admin/search/', views.AdminSearchView.as_view(), name='admin-search'),
     path('admin/donors/', views.AdminDonorsListView.as_view(), name='admin-donors'),
+    path('admin/donors/onboard/', views.OnboardDonorsView.as_view(), name='admin-donor-onboard'),
     path('admin/schedules/<int:pk>/done/', views.MarkScheduleDoneView.as_view(), name='mark-schedule-done'),
     path('admin/schedules/<int:pk>/cancel/', views.MarkScheduleCanceledView.as_view(), name='mark-schedule-cancel'),
     path('admin/records/<int:pk>/update-lives/', views.UpdateLivesSavedView.as_view(), name='update-lives-saved'),
+    path('admin/hospitals/<int:pk>/inventory/dispense/', views.DispenseBloodView.as_view(), name='dispense-blood'),
+    path('admin/inventory/shortages/', views.BloodShortageView.as_view(), name='blood-shortages'),
+    path('admin/routes/home-visits/', views.HomeVisitRoutesView.as_view(), name='home-visit-routes'),
     path('admin/hospitals/add/', views.AddHospitalView.as_view(), name='add-hospital'),
     path('donations/certificate/<int:record_id>/', views.CertificateDataView.as_view(), name='certificate-data'),
     path('emergency-requests/', views.BloodRequestListCreateView.as_view(), name='blood-request-list'),
     path('emergency-requests/<int:pk>/fulfill/', views.MarkBloodRequestFulfilledView.as_view(), name='blood-request-fulfill'),
     path('emergency-requests/<int:pk>/delete/', views.BloodRequestDeleteView.as_view(), name='blood-request-delete'),
+    path('admin/profiling/token/', views.ProfilingTokenView.as_view(), name='profiling-token'),
+    path('admin/profiling/', views.ProfileArtifactListView.as_view(), name='profiling-list'),
+    path('admin/profiling/<str:name>/', views.ProfileArtifactDownloadView.as_view(), name='profiling-download'),
+    path('metrics/', admission.route('critical')(metrics.metrics_view), name='metrics'),
     path('admin/emergency-requests/', views.AdminBloodRequestsView.as_view(), name='admin-blood-requests'),
     path('admin/hospitals/<int:pk>/', views.HospitalUpdateDeleteView.as_view(), name='admin-hospital-detail'),
+    path('admin/audit/', views.AuditEventListView.as_view(), name='audit-events'),
 ]
 
@@ -1,25 +1,51 @@
 from rest_framework import generics, status, permissions
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import api_view, permission_classes, throttle_classes
 from rest_framework.response import Response
 from rest_framework_simplejwt.tokens import RefreshToken
 from django.contrib.auth import get_user_model
 from django.shortcuts import get_object_or_404
+from django.http import FileResponse, Http404
 from django.db import transaction
+from django.db.models import F
+from django.db.models.functions import Coalesce
 from django.utils import timezone
-from datetime import timedelta
-from .models import Donor, Hospital, DonationSchedule, DonationRecord, BloodRequest
+from django.conf import settings
+from django.utils.dateparse import parse_date
+from django.urls import reverse
+from urllib.parse import urlencode
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+from . import (
+    admission, archive, audit, batch, expiry, idempotency, inventory, onboarding, profiling, rollups, routing, search,
+    slots, sparse, sync,
+)
+from .models import (
+    Donor, Hospital, DonationSchedule, DonationRecord, BloodRequest, SearchDocument, ArchivedDonationSchedule,
+)
 from .serializers import (
     UserRegistrationSerializer, UserSerializer, DonorProfileSerializer,
     DonorCreateUpdateSerializer, HospitalSerializer, DonationScheduleSerializer,
     DonationScheduleCreateSerializer, DonationRecordSerializer, LoginSerializer,
-    BloodRequestSerializer
+    BloodRequestSerializer, DonorOnboardingSerializer, ArchivedDonationScheduleSerializer,
 )
 
 User = get_user_model()
 
 
+def donor_for(request):
+    """The requesting user's donor profile, looked up once per request (and batch)"""
+    cache = batch.request_cache(request)
+    if 'donor' not in cache:
+        donor, created = Donor.objects.get_or_create(user=request.user)
+        donor.user = request.user
+        cache['donor'] = donor
+    return cache['donor']
+
+
 class RegisterView(generics.CreateAPIView):
     """User registration endpoint"""
+    admission_priority = 'auth'
+    throttle_classes = [admission.RegisterThrottle]
     queryset = User.objects.all()
     serializer_class = UserRegistrationSerializer
     permission_classes = [permissions.AllowAny]
@@ -32,7 +58,7 @@ class RegisterView(generics.CreateAPIView):
         # Create donor profile if role is donor
         # Donor profile will be created with default values, user can update later
         if user.role == 'donor':
-            Donor.objects.get_or_create(user=user)
+            Donor.objects.create(user=user)
         
         # Generate JWT tokens
         refresh = RefreshToken.for_user(user)
@@ -46,8 +72,10 @@ class RegisterView(generics.CreateAPIView):
         }, status=status.HTTP_201_CREATED)
 
 
+@admission.route('auth')
 @api_view(['POST'])
 @permission_classes([permissions.AllowAny])
+@throttle_classes([admission.LoginThrottle])
 def login_view(request):
     """User login endpoint"""
     serializer = LoginSerializer(data=request.data)
@@ -76,7 +104,7 @@ class DonorProfileView(generics.RetrieveAPIView):
         if user.role != 'donor':
             return Response({'error': 'User is not a donor'}, 
                           status=status.HTTP_403_FORBIDDEN)
-        donor, created = Donor.objects.get_or_create(user=user)
+        donor = donor_for(self.request)
         serializer = self.get_serializer(donor, context={'request': request})
         return Response(serializer.data)
 
@@ -90,7 +118,7 @@ class UpdateDonorProfileView(generics.UpdateAPIView):
         user = self.request.user
         if user.role != 'donor':
             raise permissions.PermissionDenied('User is not a donor')
-        donor, created = Donor.objects.get_or_create(user=user)
+        donor = donor_for(self.request)
         return donor
     
     def update(self, request, *args, **kwargs):
@@ -112,6 +140,7 @@ class UpdateDonorProfileView(generics.UpdateAPIView):
 
 class DashboardStatsView(generics.RetrieveAPIView):
     """Get donor dashboard stats"""
+    admission_priority = 'low'
     permission_classes = [permissions.IsAuthenticated]
     
     def get(self, request):
@@ -120,7 +149,7 @@ class DashboardStatsView(generics.RetrieveAPIView):
             return Response({'error': 'User is not a donor'}, 
                           status=status.HTTP_403_FORBIDDEN)
         
-        donor, created = Donor.objects.get_or_create(user=user)
+        donor = donor_for(self.request)
         donor_serializer = DonorProfileSerializer(donor, context={'request': request})
         
         # Get pending schedules count
@@ -134,7 +163,58 @@ class DashboardStatsView(generics.RetrieveAPIView):
         })
 
 
-class ScheduleDonationView(generics.CreateAPIView):
+class DonorBootstrapView(generics.GenericAPIView):
+    """Everything the donor dashboard loads on open, in one response"""
+    admission_priority = 'low'
+    batchable = False
+    permission_classes = [permissions.IsAuthenticated]
+    
+    def get(self, request):
+        if request.user.role != 'donor':
+            return Response({'error': 'User is not a donor'}, 
+                          status=status.HTTP_403_FORBIDDEN)
+        
+        limit = request.query_params.get('limit', 10)
+        sections = {
+            'dashboard': reverse('donor-dashboard'),
+            'profile': reverse('donor-profile'),
+            'schedules': reverse('list-schedules'),
+            'archived_schedules': reverse('list-archived-schedules'),
+            'leaderboard': f"{reverse('donors-leaderboard')}?{urlencode({'limit': limit})}",
+            'hospitals': reverse('list-hospitals'),
+        }
+        # Each section is exactly what its own endpoint would return, with that endpoint's status
+        body = {}
+        for name, url in sections.items():
+            code, data = batch.get(request, url)
+            body[name] = {'status': code, 'data': data}
+        return Response(body)
+
+
+class BatchView(generics.GenericAPIView):
+    """Run several GET requests to other API routes in one call (?path=...&path=...)"""
+    admission_priority = 'low'
+    admission_limit = 2
+    batchable = False
+    permission_classes = [permissions.IsAuthenticated]
+    
+    def get(self, request):
+        paths = request.query_params.getlist('path')
+        if not paths:
+            return Response({'error': 'Pass one or more path parameters'}, 
+                          status=status.HTTP_400_BAD_REQUEST)
+        if len(paths) > batch.MAX_SUB_REQUESTS:
+            return Response({'error': f'At most {batch.MAX_SUB_REQUESTS} paths per batch'}, 
+                          status=status.HTTP_400_BAD_REQUEST)
+        
+        responses = []
+        for path in paths:
+            code, data = batch.get(request, path)
+            responses.append({'path': path, 'status': code, 'body': data})
+        return Response({'responses': responses})
+
+
+class ScheduleDonationView(idempotency.IdempotentMixin, generics.CreateAPIView):
     """Schedule a donation"""
     serializer_class = DonationScheduleCreateSerializer
     permission_classes = [permissions.IsAuthenticated]
@@ -145,7 +225,7 @@ class ScheduleDonationView(generics.CreateAPIView):
             return Response({'error': 'User is not a donor'}, 
                           status=status.HTTP_403_FORBIDDEN)
         
-        donor, created = Donor.objects.get_or_create(user=user)
+        donor = donor_for(self.request)
         
         # Check if donor has any pending schedules
         pending_schedule = DonationSchedule.objects.filter(
@@ -185,44 +265,134 @@ class ScheduleDonationView(generics.CreateAPIView):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         
-        schedule = serializer.save(donor=donor)
+        hospital_id = serializer.validated_data.get('preferred_hospital_id')
+        with transaction.atomic():
+            # Station visits to hospitals with slot capacity must fit in a slot
+            slot = None
+            if (hospital_id and serializer.validated_data['donation_type'] == 'station'
+                    and slots.hospital_uses_slots(hospital_id)):
+                try:
+                    slot = slots.reserve(hospital_id, serializer.validated_data['scheduled_date'])
+                except slots.SlotUnavailable as exc:
+                    return Response({'error': str(exc)}, status=status.HTTP_409_CONFLICT)
+            
+            schedule = serializer.save(donor=donor, slot=slot)
         response_serializer = DonationScheduleSerializer(schedule)
         
         return Response(response_serializer.data, status=status.HTTP_201_CREATED)
 
 
-class ListSchedulesView(generics.ListAPIView):
+class ListSchedulesView(sparse.SparseQuerysetMixin, generics.ListAPIView):
     """List donor's schedules"""
+    replica_reads = True
     serializer_class = DonationScheduleSerializer
     permission_classes = [permissions.IsAuthenticated]
     
     def get_queryset(self):
         user = self.request.user
+        schedules = DonationSchedule.objects.select_related(
+            'donor__user', 'preferred_hospital', 'record__hospital'
+        )
         if user.role == 'admin':
-            return DonationSchedule.objects.all()
+            return schedules
         elif user.role == 'donor':
-            donor, created = Donor.objects.get_or_create(user=user)
-            return DonationSchedule.objects.filter(donor=donor)
+            donor = donor_for(self.request)
+            return schedules.filter(donor=donor)
         return DonationSchedule.objects.none()
 
 
-class ListHospitalsView(generics.ListAPIView):
+class ListArchivedSchedulesView(sparse.SparseQuerysetMixin, generics.ListAPIView):
+    """List donor's schedules that archive_old_data moved out of the schedules list"""
+    replica_reads = True
+    serializer_class = ArchivedDonationScheduleSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    
+    def get_queryset(self):
+        user = self.request.user
+        schedules = ArchivedDonationSchedule.objects.select_related('preferred_hospital', 'record__hospital')
+        if user.role == 'admin':
+            donor_id = self.request.query_params.get('donor')
+            return schedules.filter(donor_id=donor_id) if donor_id else schedules
+        elif user.role == 'donor':
+            donor = donor_for(self.request)
+            return schedules.filter(donor=donor)
+        return ArchivedDonationSchedule.objects.none()
+
+
+class ListHospitalsView(sparse.SparseQuerysetMixin, generics.ListAPIView):
     """List all hospitals"""
+    replica_reads = True
     queryset = Hospital.objects.all()
     serializer_class = HospitalSerializer
     permission_classes = [permissions.IsAuthenticated]
 
 
-class HospitalDetailView(generics.RetrieveAPIView):
+class HospitalDetailView(sparse.SparseQuerysetMixin, generics.RetrieveAPIView):
     """Get hospital details"""
+    replica_reads = True
     queryset = Hospital.objects.all()
     serializer_class = HospitalSerializer
     permission_classes = [permissions.IsAuthenticated]
 
 
+class HospitalInventoryView(generics.GenericAPIView):
+    """Get current blood stock of a hospital per blood type"""
+    queryset = Hospital.objects.all()
+    permission_classes = [permissions.IsAuthenticated]
+    
+    def get(self, request, pk):
+        hospital = self.get_object()
+        stock = inventory.stock_for(hospital.id)
+        return Response({
+            'hospital_id': hospital.id,
+            'stock': {blood_type: float(units) for blood_type, units in stock.items()},
+        })
+
+
+class HospitalSlotsView(generics.GenericAPIView):
+    """List open appointment slots of a hospital for a date range"""
+    replica_reads = True
+    permission_classes = [permissions.IsAuthenticated]
+    
+    def get(self, request, pk):
+        try:
+            start = parse_date(request.query_params['start']) if request.query_params.get('start') else timezone.localdate()
+            end = parse_date(request.query_params['end']) if request.query_params.get('end') else start + timedelta(days=7)
+        except ValueError:
+            start = end = None
+        if start is None or end is None or start > end:
+            return Response({'error': 'Invalid date range'}, 
+                          status=status.HTTP_400_BAD_REQUEST)
+        if (end - start).days >= slots.MAX_RANGE_DAYS:
+            return Response({'error': f'Ask for at most {slots.MAX_RANGE_DAYS} days at a time'}, 
+                          status=status.HTTP_400_BAD_REQUEST)
+        
+        range_start = timezone.make_aware(datetime.combine(start, time.min))
+        range_end = timezone.make_aware(datetime.combine(end + timedelta(days=1), time.min))
+        open_slots = slots.open_slots(pk, max(range_start, timezone.now()), range_end)
+        
+        return Response({
+            'hospital_id': pk,
+            'slots': [
+                {
+                    # None until the slot is first booked or generate_slots reaches its day
+                    'id': slot.id,
+                    'starts_at': slot.starts_at,
+                    'ends_at': slot.ends_at,
+                    'capacity': slot.capacity,
+                    'available': slot.capacity - slot.booked,
+                }
+                for slot in open_slots
+            ],
+        })
+
+
 # Admin Views
 class AdminStatsView(generics.RetrieveAPIView):
     """Admin: Get overall statistics"""
+    admission_priority = 'low'
+    admission_limit = 2
+    replica_reads = True
     permission_classes = [permissions.IsAuthenticated]
     
     def get(self, request):
@@ -235,15 +405,18 @@ class AdminStatsView(generics.RetrieveAPIView):
         # Count statistics
         total_donors = Donor.objects.count()
         total_hospitals = Hospital.objects.count()
-        total_donations = DonationSchedule.objects.filter(status='done').count()
+        archived = archive.archived_totals()
+        total_donations = DonationSchedule.objects.filter(status='done').count() + archived['done']
         pending_schedules = DonationSchedule.objects.filter(status='pending').count()
-        canceled_schedules = DonationSchedule.objects.filter(status='canceled').count()
+        canceled_schedules = DonationSchedule.objects.filter(status='canceled').count() + archived['canceled']
         
         # Total lives saved
         total_lives_saved = Donor.objects.aggregate(total=Sum('lives_saved'))['total'] or 0
         
         # Total blood units
-        total_blood_units = DonationRecord.objects.aggregate(total=Sum('blood_amount'))['total'] or 0
+        total_blood_units = (
+            (DonationRecord.objects.aggregate(total=Sum('blood_amount'))['total'] or 0) + archived['blood_amount']
+        )
         
         return Response({
             'total_donors': total_donors,
@@ -256,19 +429,138 @@ class AdminStatsView(generics.RetrieveAPIView):
         })
 
 
-class AdminDonorsListView(generics.ListAPIView):
+class DonationTrendsView(generics.GenericAPIView):
+    """Admin: Donation totals over time from the rollup tables"""
+    admission_priority = 'low'
+    admission_limit = 2
+    replica_reads = True
+    permission_classes = [permissions.IsAuthenticated]
+    
+    def get(self, request):
+        if request.user.role != 'admin':
+            return Response({'error': 'Only admins can access this'}, 
+                          status=status.HTTP_403_FORBIDDEN)
+        
+        params = request.query_params
+        granularity = params.get('granularity', 'day')
+        if granularity not in rollups.GRANULARITIES:
+            return Response({'error': f"granularity must be one of {', '.join(rollups.GRANULARITIES)}"}, 
+                          status=status.HTTP_400_BAD_REQUEST)
+        
+        group_by = params.get('group_by') or None
+        if group_by and group_by not in rollups.DIMENSIONS:
+            return Response({'error': f"group_by must be one of {', '.join(rollups.DIMENSIONS)}"}, 
+                          status=status.HTTP_400_BAD_REQUEST)
+        
+        today = timezone.localdate()
+        try:
+            end = parse_date(params['end']) if params.get('end') else today
+            start = parse_date(params['start']) if params.get('start') else end - timedelta(days=30)
+            hospital_id = int(params['hospital']) if params.get('hospital') else None
+        except ValueError:
+            start = end = None
+        if start is None or end is None or start > end:
+            return Response({'error': 'Invalid date range or hospital id'}, 
+                          status=status.HTTP_400_BAD_REQUEST)
+        
+        series = rollups.query(
+            granularity, start, end,
+            hospital_id=hospital_id,
+            blood_type=params.get('blood_type'),
+            donation_type=params.get('donation_type'),
+            group_by=group_by,
+        )
+        
+        return Response({
+            'granularity': granularity,
+            'start': start.isoformat(),
+            'end': end.isoformat(),
+            'series': series,
+        })
+
+
+class AdminSearchView(generics.GenericAPIView):
+    """Admin: Ranked search across donors, hospitals and blood requests"""
+    admission_priority = 'low'
+    admission_limit = 2
+    replica_reads = True
+    permission_classes = [permissions.IsAuthenticated]
+    
+    def get(self, request):
+        if request.user.role != 'admin':
+            return Response({'error': 'Only admins can access this'}, 
+                          status=status.HTTP_403_FORBIDDEN)
+        
+        query = request.query_params.get('q', '').strip()
+        kind = request.query_params.get('kind') or None
+        if kind and kind not in dict(SearchDocument.KIND_CHOICES):
+            return Response({'error': 'kind must be one of donor, hospital, blood_request'}, 
+                          status=status.HTTP_400_BAD_REQUEST)
+        try:
+            page = max(int(request.query_params.get('page', 1)), 1)
+            page_size = min(max(int(request.query_params.get('page_size', 20)), 1), 100)
+        except ValueError:
+            page, page_size = 1, 20
+        
+        count, results = search.search(query, kind=kind, limit=page_size, offset=(page - 1) * page_size)
+        return Response({
+            'count': count,
+            'page': page,
+            'page_size': page_size,
+            'results': results,
+        })
+
+
+class AdminDonorsListView(sparse.SparseQuerysetMixin, generics.ListAPIView):
     """Admin: List all donors"""
+    admission_priority = 'low'
+    admission_limit = 2
+    replica_reads = True
     serializer_class = DonorProfileSerializer
     permission_classes = [permissions.IsAuthenticated]
     
     def get_queryset(self):
         if self.request.user.role != 'admin':
             return Donor.objects.none()
-        return Donor.objects.all().select_related('user')
+        return Donor.objects.all().select_related('user').order_by('-created_at')
 
 
-class MarkScheduleDoneView(generics.UpdateAPIView):
+class OnboardDonorsView(idempotency.IdempotentMixin, generics.GenericAPIView):
+    """Admin: Register a blood drive's donors in one transaction, optionally with JWT pairs"""
+    admission_priority = 'low'
+    admission_limit = 1
+    serializer_class = DonorOnboardingSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    
+    def post(self, request):
+        if request.user.role != 'admin':
+            return Response({'error': 'Only admins can perform this action'}, 
+                          status=status.HTTP_403_FORBIDDEN)
+        
+        entries = request.data.get('donors')
+        if not isinstance(entries, list) or not 1 <= len(entries) <= onboarding.HTTP_MAX_BATCH:
+            return Response({'error': f'Send between 1 and {onboarding.HTTP_MAX_BATCH} donors; '
+                                      'register larger drives with the onboard_donors command'}, 
+                          status=status.HTTP_400_BAD_REQUEST)
+        serializer = self.get_serializer(data=entries, many=True)
+        serializer.is_valid(raise_exception=True)
+        
+        donors = onboarding.create_donors(serializer.validated_data)
+        audit.record_many(request.user, 'donor.onboard', 'donor', [donor.id for donor in donors])
+        users = [donor.user for donor in donors]
+        tokens = onboarding.issue_tokens(users) if request.data.get('issue_tokens') else [None] * len(users)
+        return Response({
+            'created': len(donors),
+            'donors': [
+                {'id': donor.id, 'user': UserSerializer(user).data, **({'tokens': pair} if pair else {})}
+                for donor, user, pair in zip(donors, users, tokens)
+            ],
+        }, status=status.HTTP_201_CREATED)
+
+
+class MarkScheduleDoneView(idempotency.IdempotentMixin, generics.UpdateAPIView):
     """Admin: Mark schedule as done"""
+    admission_priority = 'critical'
     queryset = DonationSchedule.objects.all()
     serializer_class = DonationScheduleSerializer
     permission_classes = [permissions.IsAuthenticated]
@@ -301,16 +593,17 @@ class MarkScheduleDoneView(generics.UpdateAPIView):
                 hospital=hospital,
                 blood_amount=blood_amount
             )
+            rollups.record_donation(record)
+            inventory.receive(record)
+            audit.record(request.user, 'schedule.done', 'schedule', schedule.id, record_id=record.id,
+                         hospital_id=hospital.id if hospital else None, blood_amount=blood_amount)
             
-            # Update donor stats
-            donor = schedule.donor
-            donor.total_donations += 1
-            donor.save()
-            
-            # Update hospital stats if hospital is provided
+            # Update donor and hospital stats in SQL so concurrent updates are not lost
+            Donor.objects.filter(pk=schedule.donor_id).update(total_donations=F('total_donations') + 1)
             if hospital:
-                hospital.total_blood_received += 1
-                hospital.save()
+                Hospital.objects.filter(pk=hospital.pk).update(
+                    total_blood_received=F('total_blood_received') + Decimal(str(blood_amount))
+                )
         
         response_serializer = DonationScheduleSerializer(schedule)
         return Response(response_serializer.data)
@@ -333,8 +626,12 @@ class MarkScheduleCanceledView(generics.UpdateAPIView):
             return Response({'error': 'Cannot cancel a completed donation'}, 
                           status=status.HTTP_400_BAD_REQUEST)
         
-        schedule.status = 'canceled'
-        schedule.save()
+        with transaction.atomic():
+            if schedule.status == 'pending':
+                slots.release(schedule.slot_id)
+            audit.record(request.user, 'schedule.cancel', 'schedule', schedule.id, previous_status=schedule.status)
+            schedule.status = 'canceled'
+            schedule.save()
         
         response_serializer = DonationScheduleSerializer(schedule)
         return Response(response_serializer.data)
@@ -359,20 +656,162 @@ class UpdateLivesSavedView(generics.UpdateAPIView):
                           status=status.HTTP_400_BAD_REQUEST)
         
         with transaction.atomic():
-            # Update donor's lives saved
-            donor = record.schedule.donor
-            donor.lives_saved += lives_saved
-            donor.save()
+            # Records from before per-record counting hold NULL, and NULL + n would stay NULL
+            DonationRecord.objects.filter(pk=record.pk).update(lives_saved=Coalesce(F('lives_saved'), 0) + lives_saved)
+            record.refresh_from_db(fields=['lives_saved'])
+            rollups.record_lives_saved(record, lives_saved)
+            audit.record(request.user, 'donation_record.lives_saved', 'donation_record', record.id,
+                         added=lives_saved, lives_saved=record.lives_saved)
             
-            # Update hospital's lives saved if hospital exists
-            if record.hospital:
-                record.hospital.total_lives_saved += lives_saved
-                record.hospital.save()
+            # Update donor's and hospital's lives saved
+            Donor.objects.filter(pk=record.schedule.donor_id).update(lives_saved=F('lives_saved') + lives_saved)
+            if record.hospital_id:
+                Hospital.objects.filter(pk=record.hospital_id).update(
+                    total_lives_saved=F('total_lives_saved') + lives_saved
+                )
         
         response_serializer = DonationRecordSerializer(record)
         return Response(response_serializer.data)
 
 
+class DispenseBloodView(generics.GenericAPIView):
+    """Admin: Record blood units used by a hospital"""
+    admission_priority = 'critical'
+    queryset = Hospital.objects.all()
+    permission_classes = [permissions.IsAuthenticated]
+    
+    def post(self, request, pk):
+        if request.user.role != 'admin':
+            return Response({'error': 'Only admins can perform this action'}, 
+                          status=status.HTTP_403_FORBIDDEN)
+        
+        hospital = self.get_object()
+        blood_type = request.data.get('blood_type')
+        try:
+            units = float(request.data.get('units', 0))
+        except (TypeError, ValueError):
+            units = 0
+        
+        if blood_type not in dict(Donor.BLOOD_TYPE_CHOICES) or units <= 0:
+            return Response({'error': 'A valid blood_type and a positive number of units are required'}, 
+                          status=status.HTTP_400_BAD_REQUEST)
+        
+        try:
+            inventory.dispense(hospital.id, blood_type, units, note=request.data.get('note', ''))
+        except inventory.InsufficientStock as exc:
+            return Response({'error': str(exc)}, status=status.HTTP_409_CONFLICT)
+        audit.record(request.user, 'hospital.dispense', 'hospital', hospital.id, blood_type=blood_type, units=units)
+        
+        stock = inventory.stock_for(hospital.id)
+        return Response({
+            'hospital_id': hospital.id,
+            'stock': {blood_type: float(units) for blood_type, units in stock.items()},
+        })
+
+
+class BloodShortageView(generics.GenericAPIView):
+    """Admin: Hospitals below a stock threshold for a blood type"""
+    permission_classes = [permissions.IsAuthenticated]
+    
+    def get(self, request):
+        if request.user.role != 'admin':
+            return Response({'error': 'Only admins can access this'}, 
+                          status=status.HTTP_403_FORBIDDEN)
+        
+        blood_type = request.query_params.get('blood_type')
+        try:
+            threshold = float(request.query_params.get('threshold', 5))
+        except ValueError:
+            threshold = None
+        
+        if blood_type not in dict(Donor.BLOOD_TYPE_CHOICES) or threshold is None:
+            return Response({'error': 'A valid blood_type and numeric threshold are required'}, 
+                          status=status.HTTP_400_BAD_REQUEST)
+        
+        hospitals = inventory.shortages(blood_type, threshold)
+        return Response({
+            'blood_type': blood_type,
+            'threshold': threshold,
+            'hospitals': [
+                {'id': h.id, 'name': h.name, 'location': h.location, 'units': float(h.units)}
+                for h in hospitals
+            ],
+        })
+
+
+class HomeVisitRoutesView(generics.GenericAPIView):
+    """Admin: Plan nurse team routes for a day's home-visit donations"""
+    permission_classes = [permissions.IsAuthenticated]
+    
+    def get(self, request):
+        if request.user.role != 'admin':
+            return Response({'error': 'Only admins can access this'}, 
+                          status=status.HTTP_403_FORBIDDEN)
+        
+        try:
+            day = parse_date(request.query_params['date']) if request.query_params.get('date') else timezone.localdate()
+            teams = int(request.query_params.get('teams', 1))
+        except ValueError:
+            day, teams = None, 0
+        if day is None or not 1 <= teams <= 50:
+            return Response({'error': 'Provide a valid date and between 1 and 50 teams per region'}, 
+                          status=status.HTTP_400_BAD_REQUEST)
+        
+        return Response(routing.plan_routes(day, teams_per_region=teams))
+
+
+class ProfilingTokenView(generics.GenericAPIView):
+    """Admin: Issue a short-lived token that turns on profiling for a request"""
+    permission_classes = [permissions.IsAuthenticated]
+    
+    def post(self, request):
+        if request.user.role != 'admin':
+            return Response({'error': 'Only admins can perform this action'}, 
+                          status=status.HTTP_403_FORBIDDEN)
+        
+        return Response({
+            'token': profiling.issue_token(request.user),
+            'header': profiling.HEADER,
+            'expires_in': settings.PROFILING_TOKEN_SECONDS,
+        })
+
+
+class ProfileArtifactListView(generics.GenericAPIView):
+    """Admin: List stored request profiles"""
+    permission_classes = [permissions.IsAuthenticated]
+    
+    def get(self, request):
+        if request.user.role != 'admin':
+            return Response({'error': 'Only admins can access this'}, 
+                          status=status.HTTP_403_FORBIDDEN)
+        
+        return Response({
+            'profiles': [
+                {'name': name, 'size': size, 'created_at': created_at}
+                for name, size, created_at in profiling.list_artifacts()
+            ],
+        })
+
+
+class ProfileArtifactDownloadView(generics.GenericAPIView):
+    """Admin: Download a stored request profile"""
+    admission_priority = 'low'
+    admission_limit = 1
+    # A FileResponse has no data for a batch to return
+    batchable = False
+    permission_classes = [permissions.IsAuthenticated]
+    
+    def get(self, request, name):
+        if request.user.role != 'admin':
+            return Response({'error': 'Only admins can access this'}, 
+                          status=status.HTTP_403_FORBIDDEN)
+        
+        path = profiling.artifact_path(name)
+        if path is None:
+            raise Http404('Profile not found')
+        return FileResponse(open(path, 'rb'), as_attachment=True, filename=name)
+
+
 class AddHospitalView(generics.CreateAPIView):
     """Admin: Add a new hospital"""
     queryset = Hospital.objects.all()
@@ -385,6 +824,11 @@ class AddHospitalView(generics.CreateAPIView):
                           status=status.HTTP_403_FORBIDDEN)
         
         return super().create(request, *args, **kwargs)
+    
+    def perform_create(self, serializer):
+        super().perform_create(serializer)
+        audit.record(self.request.user, 'hospital.create', 'hospital', serializer.instance.id,
+                     name=serializer.instance.name)
 
 
 # ============================================
@@ -395,6 +839,9 @@ class TopDonorsLeaderboardView(generics.ListAPIView):
     Get top donors ranked by total donations.
     Returns donors sorted in descending order by total_donations.
     """
+    admission_priority = 'low'
+    admission_limit = 2
+    replica_reads = True
     permission_classes = [permissions.IsAuthenticated]
     
     def get(self, request):
@@ -434,7 +881,10 @@ class CertificateDataView(generics.RetrieveAPIView):
     permission_classes = [permissions.IsAuthenticated]
     
     def get(self, request, record_id):
-        record = get_object_or_404(DonationRecord, id=record_id)
+        # Old records live in the archive under the same id
+        record = archive.find_record(record_id)
+        if record is None:
+            raise Http404
         
         # Security check: only the donor or an admin can see the certificate
         if request.user.role != 'admin' and record.schedule.donor.user != request.user:
@@ -476,20 +926,39 @@ class HospitalUpdateDeleteView(generics.RetrieveUpdateDestroyAPIView):
             return Response({'error': 'Only admins can perform this action'}, 
                           status=status.HTTP_403_FORBIDDEN)
         return super().destroy(request, *args, **kwargs)
+    
+    def perform_update(self, serializer):
+        super().perform_update(serializer)
+        audit.record(self.request.user, 'hospital.update', 'hospital', serializer.instance.id,
+                     changes=serializer.validated_data)
+    
+    def perform_destroy(self, instance):
+        hospital_id = instance.id
+        super().perform_destroy(instance)
+        audit.record(self.request.user, 'hospital.delete', 'hospital', hospital_id, name=instance.name)
+
 
-class BloodRequestListCreateView(generics.ListCreateAPIView):
-    """List and create blood requests"""
-    queryset = BloodRequest.objects.filter(is_fulfilled=False)
+class BloodRequestListCreateView(idempotency.IdempotentMixin, sparse.SparseQuerysetMixin, generics.ListCreateAPIView):
+    """List open blood requests (optionally one ``urgency``) and create new ones"""
+    admission_priority = 'critical'
     serializer_class = BloodRequestSerializer
     permission_classes = [permissions.IsAuthenticated]
     
+    def get_queryset(self):
+        queryset = expiry.open_requests().select_related('requester')
+        urgency = self.request.query_params.get('urgency')
+        if urgency:
+            queryset = queryset.filter(urgency=urgency)
+        return queryset
+    
     def perform_create(self, serializer):
         serializer.save(requester=self.request.user)
 
 
 class MarkBloodRequestFulfilledView(generics.UpdateAPIView):
     """Mark a blood request as fulfilled"""
-    queryset = BloodRequest.objects.all()
+    admission_priority = 'critical'
+    queryset = BloodRequest.objects.select_related('requester')
     serializer_class = BloodRequestSerializer
     permission_classes = [permissions.IsAuthenticated]
     
@@ -506,7 +975,7 @@ class MarkBloodRequestFulfilledView(generics.UpdateAPIView):
 
 class BloodRequestDeleteView(generics.DestroyAPIView):
     """Delete a blood request (Admin or Owner)"""
-    queryset = BloodRequest.objects.all()
+    queryset = BloodRequest.objects.select_related('requester')
     serializer_class = BloodRequestSerializer
     permission_classes = [permissions.IsAuthenticated]
     
@@ -516,11 +985,20 @@ class BloodRequestDeleteView(generics.DestroyAPIView):
             return Response({'error': 'You do not have permission to delete this request'}, 
                           status=status.HTTP_403_FORBIDDEN)
         return super().destroy(request, *args, **kwargs)
+    
+    def perform_destroy(self, instance):
+        request_id = instance.id
+        super().perform_destroy(instance)
+        audit.record(self.request.user, 'blood_request.delete', 'blood_request', request_id,
+                     requester_id=instance.requester_id, blood_type=instance.blood_type, urgency=instance.urgency)
 
 
-class AdminBloodRequestsView(generics.ListAPIView):
+class AdminBloodRequestsView(sparse.SparseQuerysetMixin, generics.ListAPIView):
     """Admin: View all blood requests including fulfilled ones"""
-    queryset = BloodRequest.objects.all()
+    admission_priority = 'low'
+    admission_limit = 2
+    replica_reads = True
+    queryset = BloodRequest.objects.select_related('requester')
     serializer_class = BloodRequestSerializer
     permission_classes = [permissions.IsAuthenticated]
     
@@ -529,3 +1007,69 @@ class AdminBloodRequestsView(generics.ListAPIView):
             return Response({'error': 'Only admins can access this'}, 
                           status=status.HTTP_403_FORBIDDEN)
         return super().list(request, *args, **kwargs)
+
+
+class AuditEventListView(generics.GenericAPIView):
+    """Admin: Audit log by actor, object and time range, newest first (see blood_donation/audit.py)"""
+    admission_priority = 'low'
+    replica_reads = True
+    permission_classes = [permissions.IsAuthenticated]
+    
+    def get(self, request):
+        if request.user.role != 'admin':
+            return Response({'error': 'Only admins can access this'}, 
+                          status=status.HTTP_403_FORBIDDEN)
+        
+        params = request.query_params
+        try:
+            limit = int(params.get('limit', audit.DEFAULT_LIMIT))
+            actor_id = int(params['actor']) if params.get('actor') else None
+            object_id = int(params['object_id']) if params.get('object_id') else None
+        except ValueError:
+            return Response({'error': 'limit, actor and object_id must be integers'}, 
+                          status=status.HTTP_400_BAD_REQUEST)
+        
+        try:
+            payload = audit.query(
+                actor_id=actor_id, object_type=params.get('object_type'), object_id=object_id,
+                since=params.get('since'), until=params.get('until'), cursor=params.get('cursor'), limit=limit,
+            )
+        except audit.AuditError as exc:
+            return Response({'error': str(exc)}, 
+                          status=status.HTTP_400_BAD_REQUEST)
+        return Response(payload)
+
+
+class SyncView(generics.GenericAPIView):
+    """Rows changed since ``cursor`` for an offline device (see blood_donation/sync.py)"""
+    admission_priority = 'low'
+    batchable = False
+    permission_classes = [permissions.IsAuthenticated]
+    
+    def get(self, request):
+        try:
+            limit = int(request.query_params.get('limit', sync.DEFAULT_LIMIT))
+            hospital_id = int(request.query_params['hospital']) if request.query_params.get('hospital') else None
+        except ValueError:
+            return Response({'error': 'limit and hospital must be integers'}, 
+                          status=status.HTTP_400_BAD_REQUEST)
+        
+        try:
+            payload = sync.pull(request.user, request.query_params.get('cursor'), limit, hospital_id)
+        except sync.SyncError as exc:
+            return Response({'error': str(exc)}, 
+                          status=status.HTTP_400_BAD_REQUEST)
+        return Response(payload)
+
+
+class SyncWritesView(idempotency.IdempotentMixin, generics.GenericAPIView):
+    """Apply a batch of offline writes; each is checked against the row's updated_at"""
+    permission_classes = [permissions.IsAuthenticated]
+    
+    def post(self, request):
+        try:
+            results = sync.apply_writes(request.user, request.data.get('writes'))
+        except sync.SyncError as exc:
+            return Response({'error': str(exc)}, 
+                          status=status.HTTP_400_BAD_REQUEST)
+        return Response({'results': results})
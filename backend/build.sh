@@ -5,6 +5,9 @@ set -o errexit
 # Modify this line as needed for your package manager (pip, poetry, etc.)
 pip install -r requirements.txt
 
+# Compile bytecode now, so the first boot after a spin-down does not compile every module
+python -m compileall -q .
+
 # Convert static asset files
 python manage.py collectstatic --no-input
 
@@ -0,0 +1,12 @@
+"""
+Django admin URLs.
+
+config/urls.py refers to this module by name, so Django imports it, and with
+it every admin module, only when a request first resolves under /admin/ or
+reverse() first builds its map of all URLs.
+"""
+from django.contrib import admin
+
+admin.autodiscover()
+
+urlpatterns = admin.site.get_urls()
@@ -0,0 +1,27 @@
+"""
+App configs for the project itself.
+"""
+from django.contrib.admin.apps import SimpleAdminConfig
+from django.contrib.admin.checks import check_admin_app, check_dependencies
+from django.core import checks
+
+
+def check_registered_admins(app_configs, **kwargs):
+    # The admin modules are normally imported with the admin URLs; import them so their ModelAdmins get checked
+    from django.contrib import admin
+    admin.autodiscover()
+    return check_admin_app(app_configs, **kwargs)
+
+
+class LazyAdminConfig(SimpleAdminConfig):
+    """
+    The Django admin without autodiscovery at start-up.
+
+    API requests never need the admin's ModelAdmins, so the admin modules
+    are only imported with config/admin_urls.py: on the first /admin/
+    request, or the first reverse(), which maps every URL.
+    """
+
+    def ready(self):
+        checks.register(check_dependencies, checks.Tags.admin)
+        checks.register(check_registered_admins, checks.Tags.admin)
@@ -0,0 +1,154 @@
+"""
+Read-replica routing.
+
+Views that set ``replica_reads = True`` have their GET/HEAD queries sent to a
+replica configured through DATABASE_REPLICA_URLS. Everything else, and every
+write, goes to the primary.
+
+Two safeguards keep replica reads from looking stale:
+
+* Read-your-writes: after a signed-in user sends a write, the cache entry
+  ``pin:<user_id>`` holds the time of that write, and for
+  REPLICA_PIN_SECONDS that user's reads stay on the primary. The SPA sends
+  its JWT in a header rather than a cookie, so the pin is looked up once DRF
+  has authenticated the request; queries made before that, such as the
+  authentication's own user lookup, go to the primary. The cache must be
+  shared by the workers (REDIS_URL) for a pin to follow the user from one
+  worker to the next.
+* Lag fallback: each replica's replication delay is probed at most every
+  REPLICA_LAG_CHECK_SECONDS per process. Replicas that lag more than
+  REPLICA_MAX_LAG_SECONDS, or fail the probe, are skipped until the next probe.
+
+Locally, point DATABASE_REPLICA_URLS at a second SQLite file (for example a
+copy of db.sqlite3) to exercise the routing.
+"""
+import itertools
+import logging
+import time
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DatabaseError, connections
+from django.utils.functional import SimpleLazyObject
+
+logger = logging.getLogger(__name__)
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+# The request of a view that allows replica reads, until it is decided whether they apply
+_replica_request = ContextVar('replica_request', default=None)
+_use_replica = ContextVar('use_replica', default=None)
+_lag_checks = {}
+_round_robin = itertools.count()
+
+
+def replica_aliases():
+    return [alias for alias in settings.DATABASES if alias.startswith('replica_')]
+
+
+def replication_lag(alias):
+    """Seconds the replica is behind the primary; 0 where it cannot be measured"""
+    connection = connections[alias]
+    if connection.vendor != 'postgresql':
+        return 0.0
+    with connection.cursor() as cursor:
+        # NULL when the server is not replaying WAL, i.e. it is not a standby
+        cursor.execute(
+            "SELECT COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)"
+        )
+        return float(cursor.fetchone()[0])
+
+
+def pin_key(user_id):
+    return f'pin:{user_id}'
+
+
+def is_pinned(user):
+    pinned_at = cache.get(pin_key(user.pk))
+    return pinned_at is not None and time.time() - pinned_at < settings.REPLICA_PIN_SECONDS
+
+
+def reads_from_replica():
+    """Whether the current request's reads may go to a replica; decided once its user is known"""
+    decided = _use_replica.get()
+    if decided is not None:
+        return decided
+    request = _replica_request.get()
+    if request is None:
+        return False
+    # DRF puts the user it authenticated on the Django request; until then it is the lazy session user
+    user = request.__dict__.get('user')
+    if user is None or type(user) is SimpleLazyObject:
+        return False
+    decided = not (user.is_authenticated and is_pinned(user))
+    _use_replica.set(decided)
+    return decided
+
+
+def is_healthy(alias):
+    now = time.monotonic()
+    checked_at, healthy = _lag_checks.get(alias, (None, False))
+    if checked_at is not None and now - checked_at < settings.REPLICA_LAG_CHECK_SECONDS:
+        return healthy
+    try:
+        lag = replication_lag(alias)
+        healthy = lag <= settings.REPLICA_MAX_LAG_SECONDS
+        if not healthy:
+            logger.warning('Replica %s is %.1fs behind, reading from primary', alias, lag)
+    except DatabaseError:
+        logger.warning('Replica %s failed its lag probe, reading from primary', alias, exc_info=True)
+        healthy = False
+    _lag_checks[alias] = (now, healthy)
+    return healthy
+
+
+class PrimaryReplicaRouter:
+    """Send reads to a healthy replica when the current request allows it"""
+
+    def db_for_read(self, model, **hints):
+        if not reads_from_replica():
+            return 'default'
+        healthy = [alias for alias in replica_aliases() if is_healthy(alias)]
+        if not healthy:
+            return 'default'
+        return healthy[next(_round_robin) % len(healthy)]
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same data as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == 'default'
+
+
+class ReplicaRoutingMiddleware:
+    """Decide per request whether reads may use a replica, and pin writers to the primary"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request_token = _replica_request.set(None)
+        decision_token = _use_replica.set(None)
+        try:
+            response = self.get_response(request)
+        finally:
+            _use_replica.reset(decision_token)
+            _replica_request.reset(request_token)
+
+        if request.method not in SAFE_METHODS and replica_aliases():
+            # By now DRF has replaced the session user with the one it authenticated
+            user = getattr(request, 'user', None)
+            if user is not None and user.is_authenticated:
+                cache.set(pin_key(user.pk), time.time(), settings.REPLICA_PIN_SECONDS)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        view_class = getattr(view_func, 'cls', None) or getattr(view_func, 'view_class', None)
+        if request.method in SAFE_METHODS and getattr(view_class, 'replica_reads', False) and replica_aliases():
+            _replica_request.set(request)
+        return None
@@ -0,0 +1,230 @@
+"""
+gunicorn settings for the API.
+
+    gunicorn -c config/gunicorn_conf.py config.wsgi:application
+
+Worker and thread counts are derived from the CPUs and memory the container
+may actually use (cgroup limits first, then the host). Every value can be
+overridden through the environment:
+
+* GUNICORN_WORKER_CLASS: ``gthread`` (default), ``sync``, ``gevent`` or
+  ``eventlet``. With gthread, a slow request ties up one thread, not the
+  whole worker, and admission control (ADMISSION_MAX_CONCURRENCY) has
+  threads to meter. The async classes need their package installed, and
+  on Postgres also ``psycogreen``; without it every query blocks the
+  worker's event loop.
+* WEB_CONCURRENCY: workers. Defaults to CPUs + 1 for gthread and async
+  classes, 2 x CPUs + 1 for sync. Capped by memory at
+  GUNICORN_WORKER_MEMORY_MB (default 150) per worker.
+* GUNICORN_THREADS: threads per gthread worker; defaults to
+  ADMISSION_MAX_CONCURRENCY (8). Requests beyond the threads wait in
+  gunicorn before Django sees them, so a worker never has more than
+  ``threads`` requests in flight. ADMISSION_MAX_CONCURRENCY is set to the
+  thread count (or GUNICORN_WORKER_CONNECTIONS for async classes) unless it
+  is given, so the admission shares are fractions of what the worker can
+  actually run. Each thread may hold a database connection: keep
+  workers x threads below the database's connection limit.
+* GUNICORN_PRELOAD: load Django once in the master (default True), so
+  workers share its pages copy-on-write and start faster.
+* GUNICORN_MAX_REQUESTS / GUNICORN_MAX_REQUESTS_JITTER: recycle a worker
+  after about this many requests (default 1000 +- 100), which bounds slow
+  leaks. The jitter keeps workers from restarting all at once. See
+  pre_request for the one thing this file does outside gunicorn's settings.
+* WARMUP_ON_START: import the views and open database connections (one
+  per request thread) before a worker accepts its first request. With
+  preload, the imports happen once in the master. Default False.
+* GUNICORN_TIMEOUT, GUNICORN_KEEPALIVE, PORT.
+
+With several workers, metrics need a shared PROMETHEUS_MULTIPROC_DIR. One
+is created if it is not set, and it is emptied on start.
+"""
+import glob
+import os
+import tempfile
+import threading
+import time
+
+import gunicorn
+
+WORKER_CLASSES = {'sync', 'gthread', 'gevent', 'eventlet'}
+ASYNC_CLASSES = {'gevent', 'eventlet'}
+# Resident memory the master keeps for itself
+MASTER_MEMORY_MB = 100
+WARMUP_ON_START = os.environ.get('WARMUP_ON_START', 'False') == 'True'
+
+
+def _env_int(name, default):
+    value = os.environ.get(name)
+    return int(value) if value else default
+
+
+def available_cpus():
+    """CPUs this process may use, honouring a cgroup v2/v1 quota"""
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+    quota = None
+    try:
+        with open('/sys/fs/cgroup/cpu.max') as handle:
+            limit, period = handle.read().split()
+            if limit != 'max':
+                quota = int(limit) / int(period)
+    except (OSError, ValueError):
+        try:
+            with open('/sys/fs/cgroup/cpu/cpu.cfs_quota_us') as limit, \
+                    open('/sys/fs/cgroup/cpu/cpu.cfs_period_us') as period:
+                value = int(limit.read())
+                if value > 0:
+                    quota = value / int(period.read())
+        except (OSError, ValueError):
+            pass
+    if quota:
+        cpus = min(cpus, max(1, round(quota)))
+    return max(1, cpus)
+
+
+def available_memory_mb():
+    """Memory limit of the container, or the host's total memory, or None"""
+    for path in ('/sys/fs/cgroup/memory.max', '/sys/fs/cgroup/memory/memory.limit_in_bytes'):
+        try:
+            with open(path) as handle:
+                value = handle.read().strip()
+            # cgroup v1 reports "no limit" as a huge number
+            if value != 'max' and int(value) < 1 << 60:
+                return int(value) // (1024 * 1024)
+        except (OSError, ValueError):
+            continue
+    try:
+        with open('/proc/meminfo') as handle:
+            for line in handle:
+                if line.startswith('MemTotal:'):
+                    return int(line.split()[1]) // 1024
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+def default_workers(worker_class, cpus, memory_mb, worker_memory_mb):
+    workers = 2 * cpus + 1 if worker_class == 'sync' else cpus + 1
+    if memory_mb:
+        workers = min(workers, (memory_mb - MASTER_MEMORY_MB) // worker_memory_mb)
+    return max(1, workers)
+
+
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gthread')
+if worker_class not in WORKER_CLASSES:
+    raise RuntimeError(f"GUNICORN_WORKER_CLASS must be one of {', '.join(sorted(WORKER_CLASSES))}")
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+workers = _env_int('WEB_CONCURRENCY', 0) or default_workers(
+    worker_class, available_cpus(), available_memory_mb(), _env_int('GUNICORN_WORKER_MEMORY_MB', 150),
+)
+# gunicorn quietly turns sync workers into gthread when threads > 1
+threads = (_env_int('GUNICORN_THREADS', 0) or _env_int('ADMISSION_MAX_CONCURRENCY', 8)) if worker_class == 'gthread' else 1
+if worker_class in ASYNC_CLASSES:
+    # Greenlets per worker; each may hold a database connection
+    worker_connections = _env_int('GUNICORN_WORKER_CONNECTIONS', 50)
+# Admission shares are fractions of this; read by Django settings, which preload imports after this file
+os.environ.setdefault(
+    'ADMISSION_MAX_CONCURRENCY', str(worker_connections if worker_class in ASYNC_CLASSES else threads),
+)
+
+preload_app = os.environ.get('GUNICORN_PRELOAD', 'True') == 'True'
+max_requests = _env_int('GUNICORN_MAX_REQUESTS', 1000)
+max_requests_jitter = _env_int('GUNICORN_MAX_REQUESTS_JITTER', max_requests // 10)
+timeout = _env_int('GUNICORN_TIMEOUT', 60)
+graceful_timeout = _env_int('GUNICORN_GRACEFUL_TIMEOUT', 30)
+keepalive = _env_int('GUNICORN_KEEPALIVE', 5)
+# Worker heartbeats on tmpfs, so a slow disk cannot make healthy workers look dead
+worker_tmp_dir = '/dev/shm' if os.path.isdir('/dev/shm') else None
+forwarded_allow_ips = os.environ.get('FORWARDED_ALLOW_IPS', '*')
+accesslog = os.environ.get('GUNICORN_ACCESS_LOG') or None
+errorlog = '-'
+
+# Must be in place before prometheus_client is imported, which preload does in the master
+if workers > 1 and not os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+    os.environ['PROMETHEUS_MULTIPROC_DIR'] = tempfile.mkdtemp(prefix='prometheus-multiproc-')
+
+
+def on_starting(server):
+    multiproc_dir = os.environ.get('PROMETHEUS_MULTIPROC_DIR')
+    if multiproc_dir:
+        os.makedirs(multiproc_dir, exist_ok=True)
+        # Files of a previous run would be merged into this run's counters
+        for path in glob.glob(os.path.join(multiproc_dir, '*.db')):
+            os.remove(path)
+    server.log.info(
+        'Using %s worker(s) of class %s%s, preload=%s, max_requests=%s+-%s',
+        workers, worker_class, f' with {threads} threads' if worker_class == 'gthread' else '',
+        preload_app, max_requests, max_requests_jitter,
+    )
+
+
+def when_ready(server):
+    if WARMUP_ON_START and preload_app:
+        # Imported before forking, so the workers share these pages too
+        from blood_donation import startup
+        server.log.info('Warmed up the master: %s', startup.warm_up(connect=False))
+
+
+def pre_fork(server, worker):
+    # A connection opened while preloading must not be inherited and shared by the workers
+    if preload_app:
+        from django.db import connections
+        connections.close_all()
+
+
+def post_fork(server, worker):
+    if worker_class == 'gevent':
+        try:
+            from psycogreen.gevent import patch_psycopg
+            patch_psycopg()
+        except ImportError:
+            server.log.warning('psycogreen is not installed; Postgres queries will block the gevent loop')
+
+
+def post_worker_init(worker):
+    if not WARMUP_ON_START:
+        return
+    from blood_donation import startup
+    started = time.perf_counter()
+    timings = startup.warm_up(connect=worker_class != 'gthread')
+    if worker_class == 'gthread':
+        # Database connections belong to a thread, so open them on each thread of the request pool
+        connecting = time.perf_counter()
+        barrier = threading.Barrier(threads, timeout=10)
+        calls = [worker.tpool.submit(startup.connect_databases, barrier) for _ in range(threads)]
+        try:
+            for call in calls:
+                call.result()
+        except threading.BrokenBarrierError:
+            worker.log.warning('Not all request threads started; their connections open on first use')
+        timings['databases'] = round((time.perf_counter() - connecting) * 1000, 1)
+    worker.log.info('Warmed up in %.0f ms: %s', (time.perf_counter() - started) * 1000, timings)
+
+
+# A gthread worker keeps accepting connections while its last request before
+# max_requests runs, then exits and drops them unanswered: benchmarks/server_models.py
+# counts one or two failed requests per run without the workaround below, none with it.
+# gunicorn has no setting for this, so pre_request stops the worker listening through
+# its internals (worker.nr, worker.poller). That is why requirements.txt pins gunicorn;
+# on any other version the workaround is skipped and workers rely on max_requests alone.
+UNLISTEN_BEFORE_RECYCLE = worker_class == 'gthread' and gunicorn.version_info[:2] == (21, 2)
+
+
+def pre_request(worker, req):
+    worker.log.debug('%s %s', req.method, req.path)
+    if UNLISTEN_BEFORE_RECYCLE and worker.nr + 1 >= worker.max_requests:
+        for sock in worker.sockets:
+            try:
+                worker.poller.unregister(sock)
+            except (KeyError, ValueError):
+                pass
+
+
+def child_exit(server, worker):
+    # Drop the live gauges of a worker that exited; no Django imports, which a master without preload cannot do
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(worker.pid)
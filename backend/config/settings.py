@@ -29,7 +29,7 @@ if not ALLOWED_HOSTS:
 # Application definition
 
 INSTALLED_APPS = [
-    'django.contrib.admin',
+    'config.apps.LazyAdminConfig',  # django.contrib.admin, loaded with its first request
     'django.contrib.auth',
     'django.contrib.contenttypes',
     'django.contrib.sessions',
@@ -42,13 +42,17 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'blood_donation.metrics.MetricsMiddleware',  # Outermost so it times the whole stack
+    'blood_donation.admission.AdmissionControlMiddleware',  # Sheds load before any other work
+    'blood_donation.profiling.ProfilingMiddleware',
     'django.middleware.security.SecurityMiddleware',
-    'whitenoise.middleware.WhiteNoiseMiddleware',  # Added for static files
+    'blood_donation.staticfiles.LazyWhiteNoiseMiddleware',  # WhiteNoise, indexing static files on first use
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',  # Must be before CommonMiddleware
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'config.db_router.ReplicaRoutingMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -84,6 +88,38 @@ DATABASES = {
     )
 }
 
+# Read replicas, comma separated. Views marked with replica_reads send GETs here.
+for index, replica_url in enumerate(filter(None, os.environ.get('DATABASE_REPLICA_URLS', '').split(','))):
+    DATABASES[f'replica_{index}'] = dj_database_url.parse(replica_url.strip(), conn_max_age=600)
+    DATABASES[f'replica_{index}']['TEST'] = {'MIRROR': 'default'}
+
+DATABASE_ROUTERS = ['config.db_router.PrimaryReplicaRouter']
+
+# SQLite databases use the tuned backend (WAL, busy timeout, BEGIN IMMEDIATE)
+# unless SQLITE_TUNING=False. Individual PRAGMAs can be overridden through
+# DATABASES[alias]['OPTIONS']['pragmas'].
+if os.environ.get('SQLITE_TUNING', 'True') == 'True':
+    for database in DATABASES.values():
+        if database['ENGINE'] == 'django.db.backends.sqlite3':
+            database['ENGINE'] = 'config.sqlite_backend'
+
+# Replicas further behind than this are skipped until they catch up
+REPLICA_MAX_LAG_SECONDS = float(os.environ.get('REPLICA_MAX_LAG_SECONDS', 5))
+REPLICA_LAG_CHECK_SECONDS = float(os.environ.get('REPLICA_LAG_CHECK_SECONDS', 5))
+# After a write, the same client reads from the primary for this long
+REPLICA_PIN_SECONDS = int(os.environ.get('REPLICA_PIN_SECONDS', 10))
+
+# Set REDIS_URL so every worker shares the cache holding read-your-writes pins
+# and the login/registration token buckets. Without it each worker process
+# keeps its own in-memory cache, and both apply per worker.
+if os.environ.get('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ['REDIS_URL'],
+        }
+    }
+
 
 # Custom User Model
 AUTH_USER_MODEL = 'blood_donation.User'
@@ -143,10 +179,67 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
+    'DEFAULT_RENDERER_CLASSES': [
+        'blood_donation.metrics.TimedJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
-    'PAGE_SIZE': 10
+    'PAGE_SIZE': 10,
+    # Token buckets per client IP, see blood_donation/admission.py
+    'DEFAULT_THROTTLE_RATES': {
+        'login': os.environ.get('LOGIN_THROTTLE_RATE', '10/min'),
+        'register': os.environ.get('REGISTER_THROTTLE_RATE', '20/hour'),
+    },
+}
+
+# Admission control: requests in flight per worker process before lower priority classes get 503.
+# Should equal the worker's request threads; config/gunicorn_conf.py sets it to them when unset
+ADMISSION_CONTROL = os.environ.get('ADMISSION_CONTROL', 'True') == 'True'
+ADMISSION_MAX_CONCURRENCY = int(os.environ.get('ADMISSION_MAX_CONCURRENCY', 8))
+ADMISSION_RETRY_AFTER = int(os.environ.get('ADMISSION_RETRY_AFTER', 1))
+
+# Blood inventory
+# Red cells keep for 42 days in storage; adjust for the products a hospital actually holds
+BLOOD_SHELF_LIFE_DAYS = int(os.environ.get('BLOOD_SHELF_LIFE_DAYS', 42))
+
+# Open blood requests are closed as expired this many hours after creation, per urgency
+BLOOD_REQUEST_EXPIRY_HOURS = {
+    'emergency': int(os.environ.get('EMERGENCY_REQUEST_EXPIRY_HOURS', 24)),
+    'urgent': int(os.environ.get('URGENT_REQUEST_EXPIRY_HOURS', 72)),
+    'normal': int(os.environ.get('NORMAL_REQUEST_EXPIRY_HOURS', 14 * 24)),
 }
 
+# Writes sent with an Idempotency-Key header are replayed for this long; a duplicate
+# arriving while the first is still running waits up to IDEMPOTENCY_WAIT_SECONDS
+IDEMPOTENCY_KEY_TTL_HOURS = int(os.environ.get('IDEMPOTENCY_KEY_TTL_HOURS', 24))
+IDEMPOTENCY_WAIT_SECONDS = float(os.environ.get('IDEMPOTENCY_WAIT_SECONDS', 5))
+
+# Offline sync: rows are served once this old, so late commits are not skipped; cursors older
+# than SYNC_TOMBSTONE_DAYS (when purge_sync_tombstones drops deletions) get a full resync
+SYNC_SETTLE_SECONDS = int(os.environ.get('SYNC_SETTLE_SECONDS', 5))
+SYNC_TOMBSTONE_DAYS = int(os.environ.get('SYNC_TOMBSTONE_DAYS', 30))
+
+# Finished schedules/records and fulfilled blood requests older than this move to archive tables
+ARCHIVE_AFTER_DAYS = int(os.environ.get('ARCHIVE_AFTER_DAYS', 365))
+
+# Audit log of admin actions (see blood_donation/audit.py). Events are inserted in batches every
+# AUDIT_FLUSH_SECONDS, or once AUDIT_BATCH_SIZE are waiting. AUDIT_DURABILITY is memory, spill
+# (events also go to a file in AUDIT_SPILL_DIR until inserted) or fsync (that file is synced first)
+AUDIT_DURABILITY = os.environ.get('AUDIT_DURABILITY', 'spill')
+AUDIT_FLUSH_SECONDS = float(os.environ.get('AUDIT_FLUSH_SECONDS', 1))
+AUDIT_BATCH_SIZE = int(os.environ.get('AUDIT_BATCH_SIZE', 500))
+AUDIT_SPILL_DIR = os.environ.get('AUDIT_SPILL_DIR', str(BASE_DIR / 'audit-spill'))
+
+# Bearer token for the Prometheus scrape endpoint (/api/metrics/); without one it only answers in DEBUG
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+
+# On-demand profiling (see blood_donation/profiling.py)
+PROFILING_DIR = os.environ.get('PROFILING_DIR', str(BASE_DIR / 'profiles'))
+PROFILING_SAMPLE_RATE = float(os.environ.get('PROFILING_SAMPLE_RATE', 0))
+PROFILING_TOKEN_SECONDS = int(os.environ.get('PROFILING_TOKEN_SECONDS', 900))
+PROFILING_MAX_FILES = int(os.environ.get('PROFILING_MAX_FILES', 200))
+PROFILING_MAX_BYTES = int(os.environ.get('PROFILING_MAX_BYTES', 100 * 1024 * 1024))
+
 # JWT Settings
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(hours=24),
@@ -195,6 +288,14 @@ CORS_ALLOW_HEADERS = [
     'user-agent',
     'x-csrftoken',
     'x-requested-with',
+    'x-profile',
+    'idempotency-key',
+]
+
+CORS_EXPOSE_HEADERS = [
+    'server-timing',
+    'x-profile-id',
+    'idempotent-replayed',
 ]
 
 # For development only - allows all origins (remove in production)
@@ -1,13 +1,13 @@
 """
 URL configuration for blood donation project.
 """
-from django.contrib import admin
 from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
 
 urlpatterns = [
-    path('admin/', admin.site.urls),
+    # (urlconf, app_name, namespace) with the urlconf as a module name is only imported on first use
+    path('admin/', ('config.admin_urls', 'admin', 'admin')),
     path('api/', include('blood_donation.urls')),
 ]
 
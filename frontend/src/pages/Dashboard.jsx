@@ -2,7 +2,7 @@ import { useEffect, useState } from 'react';
 import { useNavigate } from 'react-router-dom';
 import Navbar from '../components/Navbar';
 import { useAuth } from '../context/AuthContext';
-import { donorAPI, donationAPI } from '../services/api';
+import { donorAPI } from '../services/api';
 import './Dashboard.css';
 
 const Dashboard = () => {
@@ -24,19 +24,38 @@ const Dashboard = () => {
       return;
     }
 
-    fetchDashboardData();
-    fetchLeaderboard();
-    fetchSchedules();
+    fetchBootstrap();
   }, [isDonor, navigate]);
 
-  const fetchSchedules = async () => {
+  // One round trip for everything the dashboard shows on open
+  const fetchBootstrap = async () => {
     try {
-      const response = await donationAPI.getSchedules();
-      setSchedules(response.data.results || response.data);
+      const response = await donorAPI.getBootstrap(5); // Top 5 donors
+      // Each section is {status, data}; a failed one leaves only its part of the page empty
+      const section = (name) => {
+        const { status, data } = response.data[name] || {};
+        return status >= 200 && status < 300 ? data : null;
+      };
+      const dashboard = section('dashboard');
+      if (!dashboard) {
+        throw new Error(`Dashboard section failed with status ${response.data.dashboard?.status}`);
+      }
+      const scheduleData = section('schedules');
+      const archivedData = section('archived_schedules');
+      setDashboardData(dashboard);
+      // Archived schedules are older than any live one, so they follow them in the history
+      setSchedules([
+        ...(scheduleData?.results || scheduleData || []),
+        ...(archivedData?.results || archivedData || []),
+      ]);
+      setLeaderboard(section('leaderboard')?.leaderboard || []);
     } catch (err) {
-      console.error('Failed to load schedules:', err);
+      setError('Failed to load dashboard data');
+      console.error(err);
     } finally {
+      setLoading(false);
       setSchedulesLoading(false);
+      setLeaderboardLoading(false);
     }
   };
 
@@ -51,31 +70,6 @@ const Dashboard = () => {
     }
   }, [dashboardData, navigate]);
 
-  const fetchDashboardData = async () => {
-    try {
-      const response = await donorAPI.getDashboard();
-      setDashboardData(response.data);
-    } catch (err) {
-      setError('Failed to load dashboard data');
-      console.error(err);
-    } finally {
-      setLoading(false);
-    }
-  };
-
-  // NEW: Fetch leaderboard data (additive feature)
-  const fetchLeaderboard = async () => {
-    try {
-      const response = await donorAPI.getLeaderboard(5); // Top 5 donors
-      setLeaderboard(response.data.leaderboard || []);
-    } catch (err) {
-      console.error('Failed to load leaderboard:', err);
-      // Don't set error - leaderboard is optional feature
-    } finally {
-      setLeaderboardLoading(false);
-    }
-  };
-
   if (loading) {
     return (
       <div>
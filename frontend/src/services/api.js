@@ -91,6 +91,8 @@ export const donorAPI = {
     });
   },
   getDashboard: () => api.get('/donor/dashboard/'),
+  // Dashboard, profile, schedules, leaderboard and hospitals in one request
+  getBootstrap: (limit = 10) => api.get(`/donor/bootstrap/?limit=${limit}`),
   getLeaderboard: (limit = 10) => api.get(`/donors/leaderboard/?limit=${limit}`),
 };
 
@@ -98,6 +100,7 @@ export const donorAPI = {
 export const donationAPI = {
   schedule: (data) => api.post('/donations/schedule/', data),
   getSchedules: () => api.get('/donations/schedules/'),
+  getArchivedSchedules: () => api.get('/donations/schedules/archived/'),
   getCertificate: (recordId) => api.get(`/donations/certificate/${recordId}/`),
 };
 